@@ -0,0 +1,197 @@
+"""
+CPU benchmarks for the identify, validate and parse hot paths.
+
+Times package construction (which identifies the carrier), each carrier's
+validation and checksum, ``xml_to_dict``, each interface's
+``_parse_response`` (with and without building the events) and the
+``TrackingInfo.last_event`` and ``delivery_date`` properties, on small
+responses and on very long event histories.  Responses come from
+``packagetracker.testing.responses``, so no carrier is contacted.
+
+Results can be saved as JSON, and compared with a saved baseline::
+
+    python benchmarks/hotpaths.py --save benchmarks/baseline.json
+    python benchmarks/hotpaths.py --compare benchmarks/baseline.json
+
+Comparing exits with status 1 if any benchmark is slower than the baseline
+by more than ``--threshold``.  Timings only compare well on the same
+machine.
+"""
+import argparse
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from configparser import ConfigParser
+
+from packagetracker                        import PackageTracker
+from packagetracker.service                import fedex_interface, ups_interface, usps_interface
+from packagetracker.testing.responses      import fedex_response, ups_response, usps_response
+from packagetracker.xml_dict               import xml_to_dict
+
+# event history sizes
+SIZES = {'small': 3, 'large': 5000}
+
+NUMBERS = {
+    'UPS':      '1Z12345E0205271688',
+    'USPS':     '9400100000000000000000',
+    'FedEx':    '122816215025810',
+}
+
+
+def benchmarks():
+    """
+    Returns:
+        dict: name -> function to time
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.cfg', delete=False) as f:
+        config_file = f.name
+    tracker = PackageTracker(config_file)
+    os.unlink(config_file)
+
+    config = ConfigParser()
+    ups = ups_interface.UPSInterface(config)
+    usps = usps_interface.USPSInterface(config)
+    fedex = fedex_interface.FedexInterface(config)
+
+    cases = {
+        'package.UPS':              lambda: tracker.package(NUMBERS['UPS']),
+        'package.USPS':             lambda: tracker.package(NUMBERS['USPS']),
+        'package.FedEx':            lambda: tracker.package(NUMBERS['FedEx']),
+        'validate.UPS':             lambda: ups.validate(NUMBERS['UPS']),
+        'validate.USPS':            lambda: usps.validate(NUMBERS['USPS']),
+        'validate.FedEx.express':   lambda: fedex.validate('568838414941'),
+        'validate.FedEx.ground96':  lambda: fedex.validate(NUMBERS['FedEx']),
+        'checksum.UPS':             lambda: ups_interface.calculate_checksum(NUMBERS['UPS']),
+        'checksum.USPS':            lambda: usps_interface.calculate_checksum(NUMBERS['USPS']),
+    }
+
+    for size, events in SIZES.items():
+        ups_rsp = ups_response(NUMBERS['UPS'], events=events)
+        usps_rsp = usps_response(NUMBERS['USPS'], events=events)
+        fedex_rsp = fedex_response(NUMBERS['FedEx'], events=events)
+        parsers = {
+            'UPS':      lambda rsp=ups_rsp: ups._parse_response(rsp, NUMBERS['UPS']),
+            'USPS':     lambda rsp=usps_rsp: usps._parse_response(rsp, NUMBERS['USPS']),
+            'FedEx':    lambda rsp=fedex_rsp: fedex._parse_response(rsp, NUMBERS['FedEx']),
+        }
+
+        cases['xml_to_dict.' + size] = lambda rsp=usps_rsp: xml_to_dict(rsp)
+        for carrier, parse in parsers.items():
+            cases['parse.%s.%s' % (carrier, size)] = parse
+            cases['parse_events.%s.%s' % (carrier, size)] = lambda parse=parse: parse().events
+
+        # the property benchmarks use a result with its events built
+        info = parsers['UPS']()
+        info.events
+        cases['last_event.' + size] = lambda info=info: info.last_event
+
+        # with no delivery date, it comes from the last event
+        undated = parsers['USPS']()
+        undated.delivery_date = None
+        undated.events
+        cases['delivery_date.' + size] = lambda info=undated: info.delivery_date
+
+    return cases
+
+
+def measure(func, repeat, min_time):
+    """
+    Time a function.
+
+    Args:
+        func (callable)
+        repeat (int): how many timings to take
+        min_time (float): seconds each timing should take at least
+
+    Returns:
+        dict: ``loops`` per timing, and the ``best`` and ``median`` seconds
+        per call
+    """
+    timer = timeit.Timer(func)
+    loops = 1
+    while True:
+        if timer.timeit(loops) >= min_time:
+            break
+        loops *= 2
+
+    times = sorted(t / loops for t in timer.repeat(repeat, loops))
+    return {'loops': loops, 'best': times[0], 'median': times[len(times) // 2]}
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each result against the baseline.
+
+    Returns:
+        list: names of the benchmarks slower than the threshold
+    """
+    slower = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print("%-28s %12.3fus  (new)" % (name, result['best'] * 1e6))
+            continue
+
+        ratio = result['best'] / base['best']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  SLOWER'
+            slower.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print("%-28s %12.3fus  %12.3fus  %5.2fx%s" % (
+            name, base['best'] * 1e6, result['best'] * 1e6, ratio, flag))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--filter', default='*', help="only benchmarks matching this glob")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help="seconds per timing")
+    parser.add_argument('--save', metavar='FILE', help="save the results as a baseline")
+    parser.add_argument('--compare', metavar='FILE', help="compare with a saved baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="slowdown to report as a regression, default 0.25 (25%%)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in sorted(benchmarks().items()):
+        if fnmatch.fnmatch(name, args.filter):
+            results[name] = measure(func, args.repeat, args.min_time)
+
+    slower = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("%-28s %14s  %14s" % ('', 'baseline', 'now'))
+        slower = compare(results, baseline['results'], args.threshold)
+    else:
+        for name, result in results.items():
+            print("%-28s %12.3fus" % (name, result['best'] * 1e6))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created':      datetime.datetime.now().replace(microsecond=0).isoformat(),
+                'python':       platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'machine':      platform.machine(),
+                'sizes':        SIZES,
+                'results':      results,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if slower:
+        print("\n%d benchmarks slower than the baseline" % len(slower))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
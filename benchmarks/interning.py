@@ -0,0 +1,66 @@
+"""
+Memory benchmark for string interning.
+
+Parses a synthetic fleet of UPS responses, each with a long event history
+drawn from a realistic number of distinct cities and statuses, and reports
+how much memory the resulting TrackingInfo objects hold, with and without
+the string pool.
+
+    python benchmarks/interning.py [--packages N] [--events N]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from configparser import ConfigParser
+from unittest import mock
+
+from packagetracker import interning
+from packagetracker.interning import StringPool
+from packagetracker.service.ups_interface import UPSInterface
+from packagetracker.testing.responses import ups_response
+
+
+def measure(pool, packages, events):
+    """Returns the bytes held by the parsed fleet, using the given pool."""
+    iface = UPSInterface(ConfigParser(), testing=True)
+    # round-trip through JSON so each response has its own strings, as a
+    # decoded HTTP body would
+    responses = [json.dumps(ups_response('1Z%016d' % num, events=events, seed=num))
+                 for num in range(packages)]
+
+    with mock.patch.multiple(interning, intern=pool.intern, join=pool.join):
+        gc.collect()
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+
+        fleet = []
+        for num, text in enumerate(responses):
+            info = iface._parse_response(json.loads(text), '1Z%016d' % num)
+            info.events
+            fleet.append(info)
+
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--packages', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=30)
+    args = parser.parse_args()
+
+    plain = measure(StringPool(max_size=0), args.packages, args.events)
+    pooled = measure(StringPool(), args.packages, args.events)
+    total = args.packages * args.events
+
+    print("%d packages, %d events" % (args.packages, total))
+    print("without pool: %10d bytes (%.1f per event)" % (plain, plain / total))
+    print("with pool:    %10d bytes (%.1f per event)" % (pooled, pooled / total))
+    print("saved:        %9.1f%%" % (100.0 * (plain - pooled) / plain))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Load test ``PackageTracker.track_many()`` against stand-in carriers.
+
+Starts the ``packagetracker.testing.servers`` fakes with the given latency
+and fault rates, points a tracker at them, tracks a batch of valid made-up
+tracking numbers from ``packagetracker.testing.numbers`` with a thread
+pool, and reports throughput, latency percentiles and errors by type::
+
+    python benchmarks/load.py --numbers 2000 --workers 32 --latency 0.08
+    python benchmarks/load.py --error-rate 0.05 --throttle-rate 0.05 --retries 3 \
+        --throttle-seconds 0 --no-breaker
+
+Throttled accounts are out of rotation for ``--throttle-seconds``, and
+failures open the circuit breakers unless ``--no-breaker`` is given.
+
+Latency is per ``track()`` call, retries included.  FedEx is only loaded
+if the fedex library's suds client is installed.
+"""
+import argparse
+import collections
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from packagetracker                        import PackageTracker
+from packagetracker.retry                  import RetryPolicy
+from packagetracker.testing                import numbers
+from packagetracker.testing.servers        import (FakeFedEx, FakeUPS, FakeUSPS, Profile,
+                                                   constant, lognormal, write_config)
+
+try:
+    import suds
+except ImportError:
+    suds = None
+
+
+def parse_mix(text):
+    """
+    Args:
+        text (str): i.e. 'ups=3,usps=3,express=1'
+
+    Returns:
+        dict: kind -> weight
+    """
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def tracking_numbers(count, mix, seed):
+    """
+    Returns:
+        list: ``count`` valid tracking numbers, of the kinds in the mix
+    """
+    if numbers.np is not None:
+        return numbers.generate_batch(count, mix, seed=seed)
+    return list(numbers.generate(mix, count=count, seed=seed))
+
+
+def percentile(values, pct):
+    """
+    Args:
+        values (list): sorted
+        pct (float): 0-100
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def run(args):
+    """
+    Run a load test.
+
+    Returns:
+        dict: ``seconds`` taken, ``latencies`` sorted, ``errors`` by
+        exception name, and the servers' ``stats`` by carrier
+    """
+    latency = constant(0.0)
+    if args.latency:
+        latency = lognormal(args.latency, args.sigma)
+    profile = Profile(latency        = latency,
+                      error_rate     = args.error_rate,
+                      throttle_rate  = args.throttle_rate,
+                      not_found_rate = args.not_found_rate,
+                      events         = (args.min_events, args.max_events),
+                      seed           = args.seed)
+
+    servers = [FakeUPS(profile), FakeUSPS(profile)]
+    if suds is not None and args.fedex:
+        servers.append(FakeFedEx(profile))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmpdir, 'packagetrack')
+        write_config(config_file, *servers, throttle_seconds=args.throttle_seconds)
+        for server in servers:
+            server.start()
+
+        policy = RetryPolicy(max_attempts=args.retries, base_delay=args.retry_delay)
+        breaker_options = {}
+        if not args.breaker:
+            breaker_options['error_rate'] = 1.1
+        tracker = PackageTracker(config_file, retry_policy=policy,
+                                 breaker_options=breaker_options)
+
+        latencies = []
+        errors = collections.Counter()
+        lock = threading.Lock()
+
+        def response(carrier, num, info, seconds):
+            with lock:
+                latencies.append(seconds)
+
+        def error(carrier, num, exc, seconds):
+            with lock:
+                latencies.append(seconds)
+                errors[type(exc).__name__] += 1
+
+        tracker.metrics.on_response.append(response)
+        tracker.metrics.on_error.append(error)
+
+        if args.mix:
+            mix = parse_mix(args.mix)
+        else:
+            # every kind each server tracks, the same share for each carrier
+            mix = {kind: 1.0 / len(server.kinds) for server in servers for kind in server.kinds}
+        carriers = set(server.section for server in servers)
+        mix = {kind: weight for kind, weight in mix.items()
+               if numbers.KINDS.get(kind) in carriers}
+        nums = tracking_numbers(args.numbers, mix, args.seed)
+
+        start = time.perf_counter()
+        tracker.track_many(nums, workers=args.workers,
+                           detail='summary' if args.summary else 'full')
+        seconds = time.perf_counter() - start
+    finally:
+        for server in servers:
+            server.stop()
+        shutil.rmtree(tmpdir)
+
+    return {
+        'seconds':      seconds,
+        'latencies':    sorted(latencies),
+        'errors':       errors,
+        'stats':        {server.section: server.stats for server in servers},
+    }
+
+
+def report(result):
+    latencies = result['latencies']
+    print("%d requests in %.2fs, %.1f/s" % (
+        len(latencies), result['seconds'], len(latencies) / result['seconds']))
+    print("latency   p50 %7.1fms   p90 %7.1fms   p99 %7.1fms   max %7.1fms" % tuple(
+        percentile(latencies, pct) * 1000 for pct in (50, 90, 99, 100)))
+
+    for carrier, stats in sorted(result['stats'].items()):
+        if stats:
+            print("%-6s %s" % (carrier, ', '.join('%s %d' % item
+                                                  for item in sorted(stats.items()))))
+    if result['errors']:
+        print("errors " + ', '.join('%s %d' % item for item in result['errors'].most_common()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--numbers', type=int, default=1000, help="tracking numbers to track")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="median server latency in seconds, 0 for none")
+    parser.add_argument('--sigma', type=float, default=0.5, help="spread of the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of 503s")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of 429s")
+    parser.add_argument('--not-found-rate', type=float, default=0.05)
+    parser.add_argument('--min-events', type=int, default=3)
+    parser.add_argument('--max-events', type=int, default=30)
+    parser.add_argument('--retries', type=int, default=1, help="attempts per request")
+    parser.add_argument('--retry-delay', type=float, default=0.05)
+    parser.add_argument('--throttle-seconds', type=float, default=1.0,
+                        help="how long a throttled account is out of rotation")
+    parser.add_argument('--no-breaker', dest='breaker', action='store_false',
+                        help="don't let errors open the circuit breakers")
+    parser.add_argument('--mix', help="tracking number kinds and weights, "
+                        "i.e. ups=3,usps=3,express=1,ground96=1,ssc18=1")
+    parser.add_argument('--summary', action='store_true', help="track with detail='summary'")
+    parser.add_argument('--no-fedex', dest='fedex', action='store_false')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="log warnings")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.verbose else logging.CRITICAL)
+    report(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Memory report for the parse paths.
+
+Parses responses with long event histories from each carrier, and reports
+the peak and retained memory per event for each ``_parse_response`` (with
+the events built) and for ``xml_to_dict``, then a breakdown by object type
+of what a parsed UPS result holds.  ``tests/test_memory.py`` asserts
+budgets for the same measurements.
+
+    python benchmarks/memory.py [--events N]
+"""
+import argparse
+from configparser import ConfigParser
+
+from packagetracker.service.fedex_interface import FedexInterface
+from packagetracker.service.ups_interface   import UPSInterface
+from packagetracker.service.usps_interface  import USPSInterface
+from packagetracker.testing.memory          import footprint, measure
+from packagetracker.testing.responses       import fedex_response, ups_response, usps_response
+from packagetracker.xml_dict                import xml_to_dict
+
+
+def parse_all(iface, rsp):
+    info = iface._parse_response(rsp, 'X')
+    info.events
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=5000)
+    args = parser.parse_args()
+    events = args.events
+
+    config = ConfigParser()
+    cases = (
+        ('UPS', UPSInterface(config), ups_response),
+        ('USPS', USPSInterface(config), usps_response),
+        ('FedEx', FedexInterface(config), fedex_response),
+    )
+
+    print("%d events, bytes per event" % events)
+    print("%-20s %10s %10s" % ('', 'peak', 'retained'))
+
+    results = {}
+    for carrier, iface, response in cases:
+        # the first parse fills the string pool
+        parse_all(iface, response(events=events))
+
+        rsp = response(events=events)
+        usage = measure(lambda: parse_all(iface, rsp))
+        results[carrier] = usage.result
+        print("%-20s %10.0f %10.0f" % ('parse.' + carrier, usage.peak / events,
+                                       usage.retained / events))
+
+    rsp = usps_response(events=events)
+    usage = measure(lambda: xml_to_dict(rsp))
+    print("%-20s %10.0f %10.0f" % ('xml_to_dict', usage.peak / events, usage.retained / events))
+
+    print("\nparsed UPS result, by type")
+    print("%-20s %10s %10s %10s" % ('', 'objects', 'bytes', 'per event'))
+    for name, (count, size) in footprint(results['UPS']).items():
+        print("%-20s %10d %10d %10.1f" % (name, count, size, size / events))
+
+
+if __name__ == '__main__':
+    main()
@@ -51,19 +51,32 @@ The default location for this file is ~/.config/packagetrack.
 """
 import logging
 import os.path
+import threading
+import time
 from pkg_resources            import get_distribution, DistributionNotFound
+from concurrent.futures       import ThreadPoolExecutor
 from configparser             import ConfigParser
 
 from .service.fedex_interface import FedexInterface
 from .service.ups_interface   import UPSInterface
 from .service.usps_interface  import USPSInterface
+from .breaker                 import CircuitBreaker, OPEN
+from .data                    import FULL
+from .metrics                 import Metrics
+from .watcher                 import Watcher
 from .exceptions              import (InvalidTrackingNumber,
                                       UnsupportedShipper,
-                                      TrackFailed)
+                                      TrackFailed,
+                                      TrackingNotFound,
+                                      CircuitOpen,
+                                      QuotaExceeded)
 
 __all__         = ['InvalidTrackingNumber',
                    'UnsupportedShipper',
-                   'TrackFailed']
+                   'TrackFailed',
+                   'TrackingNotFound',
+                   'CircuitOpen',
+                   'QuotaExceeded']
 
 __authors__     = 'Michael Stella'
 __license__     = 'GPL'
@@ -75,7 +88,7 @@ try:
 except DistributionNotFound:
     __version__ = '0.1.0.dev1'
 
-log = logging.getLogger()
+log = logging.getLogger(__name__)
 
 
 
@@ -83,12 +96,38 @@ class PackageTracker:
     """
     The main package tracking interface object.
 
+    One tracker can be shared by any number of threads, i.e. in a web
+    server: ``track()``, ``track_many()`` and ``package()`` are safe to call
+    concurrently.  Each thread gets its own HTTP connections, and the shared
+    state (accounts, breakers, caches, quotas) is locked.  Register
+    interfaces before sharing the tracker.
+
     Args:
         config_file (str): path to a valid config file
         testing (bool): True to enable test-only mode.
+        retry_policy (RetryPolicy): how to retry and hedge carrier requests,
+            see :mod:`packagetracker.retry`
+        breaker_options (dict): arguments for each carrier's
+            :class:`~packagetracker.breaker.CircuitBreaker`
+        negative_cache (NegativeCache): if given, remembers invalid and
+            unknown tracking numbers, see :mod:`packagetracker.cache`
+        cache (TrackingCache): if given, caches tracking results, see
+            :mod:`packagetracker.cache`
+        quota (QuotaLedger): if given, counts requests against each
+            carrier's ``daily_budget``, see :mod:`packagetracker.quota`
+        store (ShipmentStore): if given, results fetched from the carriers
+            are saved to it, see :mod:`packagetracker.store`
+        metrics (Metrics): records calls, errors, retries, latencies and
+            cache hits, and holds the ``on_request``, ``on_response`` and
+            ``on_error`` hooks; one is created if not given.  See
+            :mod:`packagetracker.metrics`
+        payload_log (PayloadLog): if given, keeps a sample of carrier
+            requests and responses, see :mod:`packagetracker.logs`
     """
 
-    def __init__(self, config_file='~/.config/packagetrack', testing=False):
+    def __init__(self, config_file='~/.config/packagetrack', testing=False,
+                 retry_policy=None, breaker_options=None, negative_cache=None,
+                 cache=None, quota=None, store=None, metrics=None, payload_log=None):
         self.config_file = os.path.expanduser(config_file)
         self.testing = testing
 
@@ -98,12 +137,26 @@ class PackageTracker:
         # read the config file
         self.config = ConfigParser()
         self.config.read(self.config_file)
+        self.negative_cache = negative_cache
+        self.cache = cache
+        self.quota = quota
+        self.store = store
+        self.metrics = metrics or Metrics()
+        self.payload_log = payload_log
+        self.metrics.add_collector(self._collect_metrics)
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
 
         # register the interfaces
+        self.breaker_options = breaker_options or {}
         self._interfaces = {}
-        self.register_interface('UPS', UPSInterface(config=self.config, testing=testing))
-        self.register_interface('USPS', USPSInterface(config=self.config, testing=testing))
-        self.register_interface('FedEx', FedexInterface(config=self.config, testing=testing))
+        self._breakers = {}
+        self.register_interface('UPS', UPSInterface(config=self.config, testing=testing,
+                                                    retry_policy=retry_policy))
+        self.register_interface('USPS', USPSInterface(config=self.config, testing=testing,
+                                                      retry_policy=retry_policy))
+        self.register_interface('FedEx', FedexInterface(config=self.config, testing=testing,
+                                                        retry_policy=retry_policy))
 
 
     def register_interface(self, shipper, interface):
@@ -115,6 +168,16 @@ class PackageTracker:
 
         log.debug("Registered interface %s", shipper)
         self._interfaces[shipper] = interface
+        self._breakers[shipper] = CircuitBreaker(shipper, **self.breaker_options)
+        interface.metrics = self.metrics
+        interface.payload_log = self.payload_log
+        interface.carrier = shipper
+
+        if self.quota is not None and interface.accounts is not None:
+            interface.accounts.ledger = self.quota
+            if (shipper not in self.quota.budgets and
+                    self.config.has_option(shipper, 'daily_budget')):
+                self.quota.set_budget(shipper, self.config.getint(shipper, 'daily_budget'))
 
 
     def package(self, tracking_number):
@@ -131,6 +194,218 @@ class PackageTracker:
         return Package(self, tracking_number)
 
 
+    def track(self, package, priority='normal', detail=FULL):
+        """
+        Track a package, through the cache if there is one, and through
+        its carrier's circuit breaker.
+
+        If the carrier's breaker is open, a cached result of any age
+        is returned rather than failing.
+
+        Args:
+            package (Package)
+            priority (str): 'normal', or 'low' for background polling,
+                which is slowed down when the carrier is using its daily
+                budget too quickly
+            detail (str): 'full' for the event history, or 'summary' for
+                just the current status and delivery date
+
+        Returns:
+            TrackingInfo
+
+        Raises:
+            CircuitOpen: if the carrier is failing, and we're not trying it
+            InvalidTrackingNumber
+            QuotaExceeded: if this is a low priority call, and the carrier's
+                budget is spent
+            TrackingNotFound
+            TrackFailed
+        """
+        info, fetched = self._track_package(package, priority, detail)
+        if fetched and self.store is not None:
+            self.store.save(package.shipper, info)
+        return info
+
+
+    def _track_package(self, package, priority, detail):
+        # track a package through the cache.  Returns (info, fetched),
+        # fetched is False if info came from the cache, and needn't be
+        # stored again.
+        key = (package.shipper, package.tracking_number)
+        if self.cache is None:
+            return self._track(package, key, priority, detail), True
+
+        caller = threading.get_ident()
+        fetched = []
+
+        def fetch():
+            info = self._track(package, key, priority, detail)
+            if threading.get_ident() == caller:
+                fetched.append(info)
+            elif self.store is not None:
+                # a background refresh of a stale entry, the caller has
+                # already gone with the cached result
+                self.store.save(package.shipper, info)
+            return info
+
+        # summaries are cached separately, they're not full results
+        cache_key = key if detail == FULL else key + (detail,)
+        try:
+            info = self.cache.get(cache_key, fetch)
+        except CircuitOpen:
+            info = self.cache.peek(cache_key)
+            if info is None:
+                raise
+            log.warning("%s: %s is unavailable, returning cached result",
+                        package.tracking_number, package.shipper)
+            return info, False
+        return info, bool(fetched)
+
+
+    def _track(self, package, key, priority, detail):
+        # actually track a package
+
+        if self.negative_cache is not None:
+            self.negative_cache.check(key)
+
+        if self.quota is not None:
+            self.quota.throttle(package.shipper, priority)
+
+        shipper, num = key
+        metrics = self.metrics
+
+        def send():
+            # only calls the breaker lets through are requests to the carrier
+            metrics.inc('packagetracker_requests_total', carrier=shipper)
+            metrics.fire(metrics.on_request, shipper, num)
+            return package.iface.track(package.tracking_number, detail=detail)
+
+        breaker = self._breakers[package.shipper]
+        start = time.perf_counter()
+        try:
+            info = breaker.call(send)
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            if not isinstance(e, CircuitOpen):
+                metrics.observe('packagetracker_request_seconds', seconds, carrier=shipper)
+            metrics.inc('packagetracker_errors_total', carrier=shipper, error=type(e).__name__)
+            metrics.fire(metrics.on_error, shipper, num, e, seconds)
+            if self.negative_cache is not None and isinstance(
+                    e, (InvalidTrackingNumber, TrackingNotFound)):
+                self.negative_cache.record(key, e)
+            raise
+
+        seconds = time.perf_counter() - start
+        metrics.observe('packagetracker_request_seconds', seconds, carrier=shipper)
+        metrics.fire(metrics.on_response, shipper, num, info, seconds)
+
+        if self.negative_cache is not None:
+            self.negative_cache.forget(key)
+        return info
+
+
+    def track_many(self, tracking_numbers, priority='normal', detail=FULL, workers=1):
+        """
+        Track many packages.
+
+        Failures don't stop the others, the exception is returned as that
+        number's result instead.  If there's a store, the results fetched
+        from the carriers are saved to it in one transaction.
+
+        Args:
+            tracking_numbers (iterable): tracking numbers
+            priority (str): 'normal' or 'low', see track()
+            detail (str): 'full' or 'summary', see track()
+            workers (int): number of threads to track with
+
+        Returns:
+            dict: tracking number -> TrackingInfo, or the exception
+            raised while tracking it.
+        """
+
+        def track_one(num):
+            try:
+                package = self.package(num)
+                return (package.shipper,) + self._track_package(package, priority, detail)
+            except (UnsupportedShipper, InvalidTrackingNumber, TrackFailed) as e:
+                return None, e, False
+            except Exception as e:
+                # i.e. a reply the parser didn't expect, which mustn't
+                # stop the rest of the batch
+                log.exception("%s: tracking failed", num)
+                return None, e, False
+
+        tracking_numbers = list(tracking_numbers)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(track_one, tracking_numbers))
+        else:
+            results = [track_one(num) for num in tracking_numbers]
+
+        if self.store is not None:
+            self.store.save_many((shipper, info) for shipper, info, fetched in results
+                                 if fetched)
+
+        return dict(zip(tracking_numbers, (info for _, info, _ in results)))
+
+
+    def close(self):
+        """
+        Stop the watcher, if it was started, and save the quota ledger's
+        counts.
+        """
+        if self._watcher is not None:
+            self._watcher.stop()
+        if self.quota is not None:
+            self.quota.close()
+
+
+    @property
+    def watcher(self):
+        """
+        The tracker's Watcher, created with default settings on first use.
+        Assign a :class:`~packagetracker.watcher.Watcher` to change them.
+        """
+        if self._watcher is None:
+            with self._watcher_lock:
+                if self._watcher is None:
+                    self._watcher = Watcher(self)
+        return self._watcher
+
+    @watcher.setter
+    def watcher(self, watcher):
+        self._watcher = watcher
+
+
+    def watch(self, tracking_number, callback):
+        """
+        Call back when a package's tracking changes, until it's delivered.
+        Starts the watcher's background loop if it isn't running.
+
+        Args:
+            tracking_number (str)
+            callback (callable): called as ``callback(tracking_number, old, new)``
+                with the previous TrackingInfo (None the first time) and
+                the new one, see :mod:`packagetracker.watcher`
+
+        Raises:
+            UnsupportedShipper
+        """
+        self.watcher.watch(tracking_number, callback)
+        self.watcher.start()
+
+
+    def unwatch(self, tracking_number, callback=None):
+        """
+        Stop watching a package.
+
+        Args:
+            tracking_number (str)
+            callback (callable): remove just this callback, default all
+        """
+        self.watcher.unwatch(tracking_number, callback)
+
+
     @property
     def interfaces(self):
         return self._interfaces.items()
@@ -138,6 +413,31 @@ class PackageTracker:
     def interface(self, key):
         return self._interfaces.get(key)
 
+    def breaker(self, key):
+        return self._breakers.get(key)
+
+    def breaker_states(self):
+        """
+        Returns:
+            dict: circuit breaker statistics for each shipper, for monitoring.
+        """
+        return {shipper: breaker.stats() for shipper, breaker in self._breakers.items()}
+
+
+    def _collect_metrics(self):
+        # cache and breaker statistics, for Metrics.render()
+        if self.cache is not None:
+            stats = self.cache.stats()
+            for result in ('hits', 'stale_hits', 'misses'):
+                yield ('packagetracker_cache_total', 'counter',
+                       {'cache': 'tracking', 'result': result}, stats[result])
+        if self.negative_cache is not None:
+            yield ('packagetracker_cache_total', 'counter',
+                   {'cache': 'negative', 'result': 'hits'}, self.negative_cache.stats()['hits'])
+        for shipper, breaker in list(self._breakers.items()):
+            yield ('packagetracker_breaker_open', 'gauge',
+                   {'carrier': shipper}, int(breaker.state == OPEN))
+
 
 class Package:
     """
@@ -154,6 +454,7 @@ class Package:
 
     def __init__(self, parent, tracking_number):
         self.tracking_number = tracking_number.upper().replace(' ', '')
+        self.tracker = parent
         self.shipper = None
         self.iface = None
 
@@ -171,9 +472,9 @@ class Package:
         log.debug("%s: shipper is %s", tracking_number, self.shipper)
 
 
-    def track(self):
+    def track(self, priority='normal', detail=FULL):
         """Tracks the package, returning a TrackingInfo object"""
-        return self.iface.track(self.tracking_number)
+        return self.tracker.track(self, priority=priority, detail=detail)
 
 
     def url(self):
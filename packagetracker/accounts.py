@@ -0,0 +1,265 @@
+"""
+Pools of carrier API accounts.
+
+Carrier rate limits apply per account, so to scale beyond one account's
+quota you can configure several credential sets for a carrier, in numbered
+sections::
+
+    [UPS]
+    requests_per_second = 5
+
+    [UPS:1]
+    license_number = XXXXXXXXXXXXXXXX
+    user_id = XXXX
+    password = XXXX
+
+    [UPS:2]
+    license_number = YYYYYYYYYYYYYYYY
+    user_id = YYYY
+    password = YYYY
+
+Options not found in a numbered section are read from the plain carrier
+section.  If there are no numbered sections, the plain section is the only
+account, just as before.
+
+Requests are spread round-robin across the accounts.  Each account can have
+a ``requests_per_second`` limit, and an account the carrier is throttling is
+taken out of rotation for ``throttle_seconds`` (default 60).
+"""
+import logging
+import threading
+import time
+
+from .exceptions import Throttled, TrackFailed
+
+log = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    A token bucket.
+
+    Args:
+        rate (float): tokens per second
+        burst (float): bucket size, defaults to one second's worth
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = None
+
+
+    def delay(self, now):
+        """
+        Args:
+            now (float): the current time
+
+        Returns:
+            float: seconds until a token is available, 0 if one is
+            available now.
+        """
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+    def take(self):
+        """Take a token; call only after ``delay()`` returned 0."""
+        self._tokens -= 1
+
+
+class Account:
+    """
+    One set of carrier credentials.
+
+    Args:
+        config: ConfigParser object
+        section (str): config section for this account
+        base_section (str): config section with defaults for this carrier
+    """
+
+    def __init__(self, config, section, base_section):
+        self.config = config
+        self.name = section
+        self.section = section
+        self.base_section = base_section
+        self.throttled_until = 0.0
+        self.limiter = None
+
+        if self.has_option('requests_per_second'):
+            self.limiter = RateLimiter(float(self.get('requests_per_second')))
+
+
+    def __repr__(self):
+        return '<Account(%r)>' % self.name
+
+
+    def _section_for(self, option):
+        if self.config.has_option(self.section, option):
+            return self.section
+        return self.base_section
+
+
+    def has_option(self, option):
+        """
+        Returns:
+            bool: True if this account, or the carrier section, has the option.
+        """
+        return (self.config.has_option(self.section, option) or
+                self.config.has_option(self.base_section, option))
+
+
+    def get(self, option):
+        """
+        Returns:
+            str: the value of a config option for this account.
+        """
+        return self.config.get(self._section_for(option), option)
+
+
+    def getboolean(self, option):
+        """
+        Returns:
+            bool: the value of a boolean config option for this account.
+        """
+        return self.config.getboolean(self._section_for(option), option)
+
+
+class AccountPool:
+    """
+    The configured accounts for one carrier.
+
+    Args:
+        config: ConfigParser object
+        section (str): the carrier's config section, i.e. 'UPS'
+        clock (callable): time source, for testing
+        sleep (callable): sleep function, for testing
+    """
+
+    def __init__(self, config, section, clock=time.monotonic, sleep=time.sleep):
+        self.config = config
+        self.section = section
+        self.clock = clock
+        self.sleep = sleep
+
+        numbered = sorted((s for s in config.sections() if s.startswith(section + ':')),
+                          key=_section_sort_key)
+        if not numbered and config.has_section(section):
+            numbered = [section]
+
+        self.accounts = [Account(config, s, section) for s in numbered]
+        # a QuotaLedger, if requests should be counted
+        self.ledger = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self.accounts)
+
+
+    def __iter__(self):
+        return iter(self.accounts)
+
+
+    def get(self, option):
+        """
+        Returns:
+            str: a carrier-wide config option.
+        """
+        return self.config.get(self.section, option)
+
+
+    def has_option(self, option):
+        """
+        Returns:
+            bool: True if the carrier-wide config section has the option.
+        """
+        return self.config.has_option(self.section, option)
+
+
+    def acquire(self):
+        """
+        Pick the next account to use, waiting for its rate limit if needed.
+
+        Returns:
+            Account
+
+        Raises:
+            TrackFailed: if there are no accounts configured, which
+                retrying won't fix
+            Throttled: if every account is being throttled by the carrier
+        """
+        if not self.accounts:
+            raise TrackFailed("No {} accounts configured".format(self.section))
+
+        while True:
+            wait = self._try_acquire()
+            if isinstance(wait, Account):
+                if self.ledger is not None:
+                    self.ledger.record(self.section, wait.name)
+                return wait
+
+            if wait is None:
+                raise Throttled("All {} accounts are being throttled".format(self.section))
+
+            self.sleep(wait)
+
+
+    def _try_acquire(self):
+        # returns an account, or how long to wait for one, or None if
+        # they're all throttled
+
+        with self._lock:
+            now = self.clock()
+            count = len(self.accounts)
+            wait = None
+
+            for ii in range(count):
+                account = self.accounts[(self._next + ii) % count]
+                if account.throttled_until > now:
+                    continue
+
+                delay = account.limiter.delay(now) if account.limiter else 0.0
+                if delay == 0:
+                    if account.limiter:
+                        account.limiter.take()
+                    self._next = (self._next + ii + 1) % count
+                    return account
+
+                if wait is None or delay < wait:
+                    wait = delay
+
+            return wait
+
+
+    def throttle(self, account, seconds=None):
+        """
+        Take an account out of rotation for a while.
+
+        Args:
+            account (Account): the throttled account
+            seconds (float): how long, defaults to the account's
+                ``throttle_seconds`` option, or 60
+        """
+        if seconds is None:
+            if account.has_option('throttle_seconds'):
+                seconds = float(account.get('throttle_seconds'))
+            else:
+                seconds = 60.0
+
+        log.warning("%s is being throttled, out of rotation for %ss", account.name, seconds)
+        with self._lock:
+            account.throttled_until = self.clock() + seconds
+
+
+def _section_sort_key(section):
+    # sort UPS:2 before UPS:10
+    suffix = section.split(':', 1)[1]
+    return (0, int(suffix), '') if suffix.isdigit() else (1, 0, suffix)
@@ -0,0 +1,218 @@
+"""
+Per-carrier circuit breakers.
+
+When a carrier's API is degraded, there's no point making every caller
+wait for it to time out.  A :class:`CircuitBreaker` watches the outcome
+and latency of recent calls, and once too many of them fail (or are too
+slow) it *opens*: calls fail immediately with
+:class:`~packagetracker.exceptions.CircuitOpen` instead of going to the
+carrier.  After ``reset_timeout`` seconds it goes *half-open* and lets a
+few trial calls through; if they succeed it closes again, otherwise it
+re-opens.
+
+Only :class:`~packagetracker.exceptions.TransientError` counts as a
+failure.  A carrier that answers "no such package" is working fine, and
+so is one that's :class:`~packagetracker.exceptions.Throttled` us.
+
+Each call is counted in the state it was let through in.  A call that
+started before the breaker last changed state doesn't count, so a slow
+call from before the breaker opened can't close it again.
+"""
+import collections
+import logging
+import threading
+import time
+
+from .exceptions import CircuitOpen, Throttled, TransientError
+
+log = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for one carrier.
+
+    Args:
+        name (str): name for logging, usually the shipper
+        window (int): number of recent calls to consider
+        min_calls (int): calls needed in the window before it can open
+        error_rate (float): open when this fraction of calls failed
+        slow_call_rate (float): open when this fraction of calls were slow
+        slow_call_duration (float): calls slower than this many seconds
+            are slow
+        reset_timeout (float): seconds to stay open before trying again
+        half_open_calls (int): trial calls allowed while half-open
+        clock (callable): time source, for testing
+    """
+
+    def __init__(self,
+                 name,
+                 window=20,
+                 min_calls=10,
+                 error_rate=0.5,
+                 slow_call_rate=0.8,
+                 slow_call_duration=10.0,
+                 reset_timeout=30.0,
+                 half_open_calls=1,
+                 clock=time.monotonic):
+
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_duration = slow_call_duration
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+
+        # (failed, slow) for each recent call
+        self._calls = collections.deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = None
+        self._trials = 0
+        self._rejected = 0
+        # bumped on every state change, calls are tagged with it
+        self._generation = 0
+        self._lock = threading.Lock()
+
+
+    @property
+    def state(self):
+        """
+        Returns:
+            str: one of 'closed', 'open', 'half-open'
+        """
+        with self._lock:
+            self._check_reset()
+            return self._state
+
+
+    def stats(self):
+        """
+        Returns:
+            dict: the breaker state and recent call statistics, for monitoring.
+        """
+        with self._lock:
+            self._check_reset()
+            calls = len(self._calls)
+            return {
+                'state':            self._state,
+                'calls':            calls,
+                'error_rate':       self._rate(0),
+                'slow_call_rate':   self._rate(1),
+                'rejected':         self._rejected,
+                'opened_at':        self._opened_at,
+            }
+
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call ``func(*args, **kwargs)`` through the breaker.
+
+        Raises:
+            CircuitOpen: if the breaker is open
+        """
+        generation = self._before_call()
+
+        start = self.clock()
+        try:
+            result = func(*args, **kwargs)
+        except Throttled:
+            # the carrier's up, it's just telling us to slow down
+            self._after_call(generation, failed=False, duration=self.clock() - start)
+            raise
+        except TransientError:
+            self._after_call(generation, failed=True, duration=self.clock() - start)
+            raise
+        except Exception:
+            # the carrier answered, it just didn't like the question
+            self._after_call(generation, failed=False, duration=self.clock() - start)
+            raise
+
+        self._after_call(generation, failed=False, duration=self.clock() - start)
+        return result
+
+
+    def reset(self):
+        """Force the breaker closed, forgetting all history."""
+        with self._lock:
+            self._close()
+
+
+    def _before_call(self):
+        # returns the generation the call was let through in
+        with self._lock:
+            self._check_reset()
+
+            if self._state == OPEN:
+                self._rejected += 1
+                raise CircuitOpen("{} circuit breaker is open".format(self.name))
+
+            if self._state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self._rejected += 1
+                    raise CircuitOpen("{} circuit breaker is half-open, trial in progress"
+                                      .format(self.name))
+                self._trials += 1
+
+            return self._generation
+
+
+    def _after_call(self, generation, failed, duration):
+        slow = duration >= self.slow_call_duration
+
+        with self._lock:
+            if generation != self._generation:
+                # let through before the last state change, i.e. a closed
+                # call finishing after the breaker opened
+                return
+
+            if self._state == HALF_OPEN:
+                self._trials -= 1
+                if failed or slow:
+                    self._open()
+                else:
+                    log.info("%s circuit breaker closed", self.name)
+                    self._close()
+                return
+
+            self._calls.append((failed, slow))
+            if self._state == CLOSED and len(self._calls) >= self.min_calls:
+                if (self._rate(0) >= self.error_rate or
+                        self._rate(1) >= self.slow_call_rate):
+                    self._open()
+
+
+    def _rate(self, index):
+        # fraction of recent calls with the given flag set
+        if not self._calls:
+            return 0.0
+        return sum(1 for call in self._calls if call[index]) / len(self._calls)
+
+
+    def _check_reset(self):
+        # move from open to half-open once the timeout expires
+        if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            log.info("%s circuit breaker half-open", self.name)
+            self._state = HALF_OPEN
+            self._trials = 0
+            self._generation += 1
+
+
+    def _open(self):
+        log.warning("%s circuit breaker opened", self.name)
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._generation += 1
+
+
+    def _close(self):
+        self._state = CLOSED
+        self._opened_at = None
+        self._trials = 0
+        self._calls.clear()
+        self._generation += 1
@@ -0,0 +1,340 @@
+"""
+Caching of tracking results.
+
+:class:`NegativeCache` remembers tracking numbers the carrier told us are
+invalid or unknown, so re-submitting the same bad number doesn't cost
+another carrier round trip.  Each repeated failure doubles the time before
+the number is checked again, up to ``max_interval``, so a label that
+becomes active later is still picked up eventually.
+
+:class:`TrackingCache` caches successful results with two lifetimes.
+Until ``soft_ttl`` an entry is simply returned.  Between ``soft_ttl`` and
+``hard_ttl`` it's still returned immediately, but a refresh is scheduled
+in the background (stale-while-revalidate), so interactive callers only
+wait for the carrier when an entry is older than ``hard_ttl`` or missing.
+Results in a terminal state (i.e. delivered) won't change, so they never
+go stale.  Only one fetch per key is in flight at a time: concurrent
+callers for a missing or expired entry wait for the first one's.
+"""
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class NegativeCache:
+    """
+    Remembers failed lookups, with an exponentially growing re-check
+    interval.
+
+    Args:
+        base_interval (float): seconds to remember the first failure
+        max_interval (float): longest re-check interval, in seconds
+        max_entries (int): the oldest entries are dropped past this size
+        clock (callable): time source, for testing
+    """
+
+    def __init__(self,
+                 base_interval=3600.0,
+                 max_interval=7 * 86400.0,
+                 max_entries=100000,
+                 clock=time.time):
+
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.max_entries = max_entries
+        self.clock = clock
+
+        # key -> (exception class, exception args, failures, recheck time)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def stats(self):
+        """
+        Returns:
+            dict: the number of ``entries``, and ``hits`` (lookups answered
+            from the cache), for monitoring
+        """
+        return {'entries': len(self._entries), 'hits': self.hits}
+
+
+    def check(self, key):
+        """
+        Raise the remembered exception if ``key`` failed recently.
+
+        Args:
+            key: cache key, usually (shipper, tracking number)
+
+        Raises:
+            the exception recorded for this key, if it's not yet due
+            for a re-check
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            return
+
+        exc_class, args, failures, recheck = entry
+        if self.clock() < recheck:
+            log.debug("%s: negative cache hit (%d failures)", key, failures)
+            with self._lock:
+                self.hits += 1
+            raise exc_class(*args)
+
+
+    def record(self, key, exc):
+        """
+        Remember a failed lookup.
+
+        Args:
+            key: cache key
+            exc (Exception): the exception the lookup raised
+        """
+        with self._lock:
+            failures = 1
+            if key in self._entries:
+                failures = self._entries.pop(key)[2] + 1
+
+            interval = min(self.max_interval, self.base_interval * (2 ** (failures - 1)))
+            self._entries[key] = (type(exc), exc.args, failures, self.clock() + interval)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+    def forget(self, key):
+        """
+        Forget a key, i.e. after a successful lookup.
+
+        Args:
+            key: cache key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+    def clear(self):
+        """Forget everything."""
+        with self._lock:
+            self._entries.clear()
+
+
+class TrackingCache:
+    """
+    A stale-while-revalidate cache of TrackingInfo objects.
+
+    Args:
+        soft_ttl (float): seconds before an entry is refreshed in the background
+        hard_ttl (float): seconds before an entry is too old to return
+        workers (int): background refresh threads
+        max_entries (int): the least recently stored entries are dropped
+            past this size
+        clock (callable): time source, for testing
+    """
+
+    def __init__(self,
+                 soft_ttl=300.0,
+                 hard_ttl=3600.0,
+                 workers=4,
+                 max_entries=100000,
+                 clock=time.time):
+
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.workers = workers
+        self.max_entries = max_entries
+        self.clock = clock
+
+        # key -> (TrackingInfo, time stored)
+        self._entries = collections.OrderedDict()
+        # key -> Future, for fetches and refreshes in progress
+        self._refreshing = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # lookup counts, see stats()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def stats(self):
+        """
+        Returns:
+            dict: the number of ``entries``, fresh ``hits``, ``stale_hits``
+            (returned while refreshing) and ``misses``, for monitoring
+        """
+        return {
+            'entries':      len(self._entries),
+            'hits':         self.hits,
+            'stale_hits':   self.stale_hits,
+            'misses':       self.misses,
+        }
+
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+    def get(self, key, fetch):
+        """
+        Returns the cached value for ``key``, calling ``fetch()`` to get
+        a fresh one if needed.
+
+        Args:
+            key: cache key, usually (shipper, tracking number)
+            fetch (callable): returns a fresh TrackingInfo
+
+        Returns:
+            TrackingInfo
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            info, stored = entry
+            age = self.clock() - stored
+            if age < self.soft_ttl or getattr(info, 'is_terminal', False):
+                self._count('hits')
+                return info
+
+            if age < self.hard_ttl:
+                log.debug("%s: stale cache hit, refreshing", key)
+                self._count('stale_hits')
+                self.refresh(key, fetch)
+                return info
+
+        self._count('misses')
+        while True:
+            with self._lock:
+                future = self._refreshing.get(key)
+                if future is None:
+                    future = self._refreshing[key] = Future()
+                    break
+
+            # someone else is fetching it already
+            info = future.result()
+            if info is not None:
+                return info
+            # a background refresh that failed, try again
+
+        try:
+            info = fetch()
+            self.put(key, info)
+        except BaseException as e:
+            self._fetched(key, future)
+            future.set_exception(e)
+            raise
+
+        self._fetched(key, future)
+        future.set_result(info)
+        return info
+
+
+    def _fetched(self, key, future):
+        with self._lock:
+            if self._refreshing.get(key) is future:
+                del self._refreshing[key]
+
+
+    def peek(self, key):
+        """
+        Returns the cached value for ``key`` regardless of age, or None.
+
+        Args:
+            key: cache key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+
+    def put(self, key, info):
+        """
+        Store a value.
+
+        Args:
+            key: cache key
+            info (TrackingInfo): value to store
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (info, self.clock())
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+    def forget(self, key):
+        """
+        Drop a key from the cache.
+
+        Args:
+            key: cache key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+    def refresh(self, key, fetch):
+        """
+        Schedule a background refresh of ``key``, unless one is already
+        in progress.
+
+        Args:
+            key: cache key
+            fetch (callable): returns a fresh TrackingInfo
+
+        Returns:
+            concurrent.futures.Future: the refresh
+        """
+        with self._lock:
+            future = self._refreshing.get(key)
+            if future is not None:
+                return future
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='packagetracker-refresh')
+
+            future = self._executor.submit(self._refresh, key, fetch)
+            self._refreshing[key] = future
+            return future
+
+
+    def close(self):
+        """Wait for background refreshes to finish, and stop the workers."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+    def _refresh(self, key, fetch):
+        # returns the fresh value, or None if it failed
+        try:
+            info = fetch()
+            self.put(key, info)
+            return info
+        except Exception as e:
+            # keep serving the stale entry until the hard TTL
+            log.warning("%s: background refresh failed: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
@@ -0,0 +1,349 @@
+"""
+Columnar export of tracking results, for analytics.
+
+Computing transit times by looping over millions of
+:class:`~packagetracker.data.TrackingInfo` objects is slow.
+:func:`to_columns` turns them into NumPy arrays once, and the helpers here
+work on whole columns at a time::
+
+    >>> table = to_columns(results.values(), shippers={num: 'UPS', ...})
+    >>> transit = time_to_delivery(table)
+    >>> table.service_names, np.bincount(table.service)
+    >>> mean_dwell_by_location(table)
+    >>> on_time_stats(table, expected_dates(table, in_transit))
+
+where ``in_transit`` is a table exported earlier, while the packages were
+still on their way and their delivery dates were the carriers' estimates.
+
+Times are in local time where the event happened, see
+:mod:`packagetracker.dates`; NumPy would convert aware datetimes to UTC, so
+their offsets are dropped first.
+
+This needs NumPy, which isn't installed with packagetracker; install the
+``analytics`` extra.
+"""
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .data   import TrackingInfo
+from .dates  import local_time
+from .status import Status
+
+log = logging.getLogger(__name__)
+
+# code for a missing location, service, or shipper
+MISSING = -1
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("packagetracker.columnar needs numpy, "
+                          "install packagetracker[analytics]")
+
+
+class Vocabulary:
+    """
+    Assigns small integer codes to strings.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+
+    def code(self, name):
+        """
+        Args:
+            name (str): or None
+
+        Returns:
+            int: the code for name, MISSING if it's None
+        """
+        if name is None:
+            return MISSING
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class EventColumns:
+    """
+    Tracking results as columns.
+
+    Per package (index ``i`` is ``tracking_numbers[i]``):
+
+    - ``tracking_numbers``: the tracking numbers
+    - ``shipper``: codes into ``shipper_names``
+    - ``service``: codes into ``service_names``
+    - ``status``: Status codes
+    - ``delivery_date``: datetime64, NaT if there isn't one
+
+    Per event, sorted by package and then time:
+
+    - ``package``: index of the package
+    - ``time``: datetime64, NaT if the event had no date
+    - ``location``: codes into ``location_names``
+    - ``event_status``: Status codes
+
+    Missing names are coded as ``MISSING`` (-1).
+    """
+
+    def __init__(self, tracking_numbers, shipper, shipper_names, service, service_names,
+                 status, delivery_date, package, time, location, location_names, event_status):
+        self.tracking_numbers = tracking_numbers
+        self.shipper = shipper
+        self.shipper_names = shipper_names
+        self.service = service
+        self.service_names = service_names
+        self.status = status
+        self.delivery_date = delivery_date
+        self.package = package
+        self.time = time
+        self.location = location
+        self.location_names = location_names
+        self.event_status = event_status
+
+
+    def __len__(self):
+        return len(self.tracking_numbers)
+
+
+def to_columns(infos, shippers=None):
+    """
+    Export tracking results to columns.
+
+    Args:
+        infos (iterable): of TrackingInfo.  Anything else, i.e. the
+            exceptions in a ``track_many()`` result, is skipped.
+        shippers (dict): tracking number -> shipper name, if known
+
+    Returns:
+        EventColumns
+    """
+    _require_numpy()
+    shippers = shippers or {}
+
+    shipper_vocab = Vocabulary()
+    service_vocab = Vocabulary()
+    location_vocab = Vocabulary()
+
+    numbers = []
+    shipper = []
+    service = []
+    status = []
+    delivery_date = []
+
+    package = []
+    times = []
+    location = []
+    event_status = []
+
+    for info in infos:
+        if not isinstance(info, TrackingInfo):
+            continue
+
+        i = len(numbers)
+        numbers.append(info.tracking_number)
+        shipper.append(shipper_vocab.code(shippers.get(info.tracking_number)))
+        service.append(service_vocab.code(info.service))
+        status.append(info.status_code)
+        delivery_date.append(local_time(info.raw_delivery_date))
+
+        for e in info.events:
+            package.append(i)
+            times.append(local_time(e.date))
+            location.append(location_vocab.code(e.location))
+            event_status.append(e.status_code)
+
+    package = np.array(package, dtype=np.int32)
+    times = np.array(times, dtype='datetime64[us]')
+
+    # carriers list events newest first, put each package's in time order
+    order = np.lexsort((times, package))
+
+    log.debug("Exported %d packages, %d events", len(numbers), len(package))
+    return EventColumns(
+        tracking_numbers    = np.array(numbers, dtype=object),
+        shipper             = np.array(shipper, dtype=np.int32),
+        shipper_names       = shipper_vocab.names,
+        service             = np.array(service, dtype=np.int32),
+        service_names       = service_vocab.names,
+        status              = np.array(status, dtype=np.int8),
+        delivery_date       = np.array(delivery_date, dtype='datetime64[us]'),
+        package             = package[order],
+        time                = times[order],
+        location            = np.array(location, dtype=np.int32)[order],
+        location_names      = location_vocab.names,
+        event_status        = np.array(event_status, dtype=np.int8)[order],
+    )
+
+
+def _first_per_package(table, mask):
+    # index of the first event per package among events where mask is set,
+    # or -1 if there isn't one
+    _require_numpy()
+    first = np.full(len(table), -1, dtype=np.int64)
+    selected = np.flatnonzero(mask)
+    packages, idx = np.unique(table.package[selected], return_index=True)
+    first[packages] = selected[idx]
+    return first
+
+
+def _pick(values, idx, fill):
+    out = np.full(len(idx), fill, dtype=values.dtype)
+    found = idx >= 0
+    out[found] = values[idx[found]]
+    return out
+
+
+def delivered_time(table):
+    """
+    Args:
+        table (EventColumns)
+
+    Returns:
+        numpy.ndarray: per package, the time of the first delivered
+        event, NaT if there isn't one
+    """
+    idx = _first_per_package(table, table.event_status == Status.DELIVERED)
+    return _pick(table.time, idx, np.datetime64('NaT', 'us'))
+
+
+def time_to_delivery(table):
+    """
+    Transit times, from each package's first event to its delivery.
+
+    Args:
+        table (EventColumns)
+
+    Returns:
+        numpy.ndarray: timedelta64 per package, NaT if it hasn't been
+        delivered
+    """
+    first = _first_per_package(table, ~np.isnat(table.time))
+    start = _pick(table.time, first, np.datetime64('NaT', 'us'))
+    return delivered_time(table) - start
+
+
+def lanes(table):
+    """
+    Each package's lane: where it started, and where it was delivered.
+
+    Args:
+        table (EventColumns)
+
+    Returns:
+        tuple: arrays of origin and destination location codes, MISSING if
+        unknown
+    """
+    has_location = table.location != MISSING
+    origin = _first_per_package(table, has_location)
+    destination = _first_per_package(table, has_location & (table.event_status == Status.DELIVERED))
+    return _pick(table.location, origin, MISSING), _pick(table.location, destination, MISSING)
+
+
+def dwell_times(table):
+    """
+    How long packages sat at each location: the time from an event to the
+    package's next event.
+
+    Args:
+        table (EventColumns)
+
+    Returns:
+        tuple: arrays of location codes and the timedelta64 dwell times
+    """
+    _require_numpy()
+    same = table.package[1:] == table.package[:-1]
+    dwell = table.time[1:] - table.time[:-1]
+    keep = same & ~np.isnat(dwell) & (table.location[:-1] != MISSING)
+    return table.location[:-1][keep], dwell[keep]
+
+
+def mean_dwell_by_location(table):
+    """
+    Args:
+        table (EventColumns)
+
+    Returns:
+        dict: location name -> mean dwell time, as a timedelta64
+    """
+    codes, dwell = dwell_times(table)
+    seconds = dwell / np.timedelta64(1, 's')
+    n = len(table.location_names)
+    counts = np.bincount(codes, minlength=n)
+    totals = np.bincount(codes, weights=seconds, minlength=n)
+    return {
+        table.location_names[code]: np.timedelta64(int(totals[code] / counts[code] * 1e6), 'us')
+        for code in np.flatnonzero(counts)
+    }
+
+
+def expected_dates(table, earlier):
+    """
+    The delivery dates from an earlier table, i.e. the carriers' estimates
+    while the packages were in transit.  Once a package is delivered its
+    ``delivery_date`` is the actual date, which is no use as the expected
+    one.
+
+    Args:
+        table (EventColumns)
+        earlier (EventColumns)
+
+    Returns:
+        numpy.ndarray: datetime64 per package in ``table``, NaT if it isn't
+        in ``earlier`` or had no delivery date there
+    """
+    dates = dict(zip(earlier.tracking_numbers, earlier.delivery_date))
+    nat = np.datetime64('NaT', 'us')
+    return np.array([dates.get(num, nat) for num in table.tracking_numbers],
+                    dtype='datetime64[us]')
+
+
+def lateness(table, expected):
+    """
+    How late each package was delivered, in days.
+
+    Args:
+        table (EventColumns)
+        expected (numpy.ndarray): expected delivery dates per package, see
+            expected_dates()
+
+    Returns:
+        numpy.ndarray: timedelta64 days late per package (negative if
+        early), NaT if it wasn't delivered or there's no expected date
+    """
+    return (delivered_time(table).astype('datetime64[D]') -
+            expected.astype('datetime64[D]'))
+
+
+def on_time_stats(table, expected):
+    """
+    On-time delivery statistics.
+
+    Args:
+        table (EventColumns)
+        expected (numpy.ndarray): expected delivery dates, see lateness()
+
+    Returns:
+        dict: counts of ``delivered`` packages (with an expected date),
+        ``early``, ``on_time`` (on the expected day) and ``late``, and the
+        ``on_time_rate`` (early or on time), None if nothing was delivered
+    """
+    days = lateness(table, expected)
+    days = days[~np.isnat(days)].astype(np.int64)
+    delivered = len(days)
+    late = int(np.count_nonzero(days > 0))
+    return {
+        'delivered': delivered,
+        'early': int(np.count_nonzero(days < 0)),
+        'on_time': int(np.count_nonzero(days == 0)),
+        'late': late,
+        'on_time_rate': (delivered - late) / delivered if delivered else None,
+    }
@@ -1,8 +1,15 @@
 import datetime
 import typing
 
+from .        import interning
+from .status  import Status
+
 DATE_FORMAT = "%Y-%m-%d %H:%M"
 
+# levels of detail for a tracking request
+FULL = 'full'           # status and the full event history
+SUMMARY = 'summary'     # current status and delivery date only, no events
+
 
 class TrackingInfo(dict):
     """
@@ -17,6 +24,8 @@ class TrackingInfo(dict):
         delivery_datail:    details about the delivery
         service:            description of the carrier's service used
         link:               a link to the carrier's detail page
+        detail:             FULL, or SUMMARY if events weren't requested
+        status_code:        normalized status, see packagetracker.status
     """
 
     def __init__(self,
@@ -27,13 +36,21 @@ class TrackingInfo(dict):
                  location:          typing.Optional[str] = None,
                  delivery_detail:   typing.Optional[str] = None,
                  service:           typing.Optional[str] = None,
-                 link:              typing.Optional[str] = None):
+                 link:              typing.Optional[str] = None,
+                 detail:            str = FULL,
+                 status_code:       Status = Status.UNKNOWN):
+
+        self._events = []
 
-        self.events = []
+        # raw event records and the function to build TrackingEvents
+        # from them, see set_event_source().  One attribute, so threads
+        # sharing this object always see both or neither.
+        self._event_source = None
 
         self.tracking_number = tracking_number
         self._delivery_date = delivery_date
         self.status = status
+        self.status_code = status_code
         self.last_update = last_update
         self.link = link
 
@@ -46,6 +63,9 @@ class TrackingInfo(dict):
         # service type, i.e. FedEx Ground, UPS Basic, etc.
         self.service = service
 
+        # was the event history requested?
+        self.detail = detail
+
 
     def __repr__(self):
         ddate = ldate = None
@@ -55,7 +75,7 @@ class TrackingInfo(dict):
             ldate = self.last_update.strftime(DATE_FORMAT)
 
         # return slightly different info if it's delivered
-        if self.status == 'DELIVERED':
+        if self.status_code == Status.DELIVERED:
             return ('<TrackingInfo(service=%r, num=%r, delivery_date=%r, status=%r, location=%r, detail=%r)>' %
                     (
                         self.service,
@@ -77,7 +97,53 @@ class TrackingInfo(dict):
                     ))
 
 
-    def add_event(self, date, location, detail):
+    def __getstate__(self):
+        # build any pending events, the builder may not be picklable
+        state = self.__dict__.copy()
+        state['_events'] = self.events
+        state['_event_source'] = None
+        return state
+
+
+    @property
+    def events(self):
+        """
+        The tracking events, built from the raw records on first access
+        if there's an event source.
+
+        Returns:
+            list: of TrackingEvent objects
+        """
+        source = self._event_source
+        if source is not None:
+            # another thread may be building them too, which is harmless
+            records, build = source
+            self._events = [build(record) for record in records]
+            self._event_source = None
+        return self._events
+
+
+    @events.setter
+    def events(self, events):
+        self._event_source = None
+        self._events = events
+
+
+    def set_event_source(self, records, build):
+        """
+        Set the raw event records, which will be turned into events only
+        if the events are actually used.  Parsing dates and such for every
+        event is a lot of work for callers that only want the status.
+
+        Args:
+            records (list): raw event records from the carrier
+            build (callable): makes a TrackingEvent from a record
+        """
+        self._events = []
+        self._event_source = (records, build)
+
+
+    def add_event(self, date, location, detail, status_code=Status.UNKNOWN):
         """
         Add an event.
 
@@ -85,15 +151,27 @@ class TrackingInfo(dict):
             date (datetime.datetime): event timestamp
             location (str): location text
             detail (str): event detail
+            status_code (Status): normalized status
 
         Returns:
             TrackingEvent: the event added
         """
-        e = TrackingEvent(date, location, detail)
+        e = TrackingEvent(date, interning.intern(location), interning.intern(detail),
+                          status_code)
         self.events.append(e)
         return e
 
 
+    @property
+    def is_terminal(self):
+        """
+        Returns:
+            bool: True if this package's status won't change any more,
+            i.e. it's been delivered.
+        """
+        return self.status_code.is_terminal
+
+
     @property
     def last_event(self):
         """
@@ -119,13 +197,32 @@ class TrackingInfo(dict):
             return self.last_event.date
 
 
+    @delivery_date.setter
+    def delivery_date(self, delivery_date):
+        self._delivery_date = delivery_date
+
+
+    @property
+    def raw_delivery_date(self):
+        """
+        The delivery date (or estimate) the carrier gave, without
+        delivery_date's fallback to the last event.  This is what to
+        store or copy.
+
+        Returns:
+            datetime.datetime: or None
+        """
+        return self._delivery_date
+
+
 class TrackingEvent(dict):
     """An individual tracking event, i.e. a status change"""
 
-    def __init__(self, date, location, detail):
+    def __init__(self, date, location, detail, status_code=Status.UNKNOWN):
         self.date = date
         self.location = location
         self.detail = detail
+        self.status_code = status_code
 
 
     def __repr__(self):
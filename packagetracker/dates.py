@@ -0,0 +1,159 @@
+"""
+Fast parsing of carrier dates and times.
+
+``datetime.strptime`` is slow, and carriers send the same few date strings
+over and over in a response's event history.  These functions slice the
+fixed-width formats directly, and memoize their results.  Anything that
+doesn't look like the expected format is handed to ``strptime``, so the
+results (and errors) are always the same as ``strptime``'s.
+
+Every date packagetracker hands out is naive, in local time where the
+event happened, as UPS and USPS send them.  FedEx sends offsets; they're
+dropped, not applied, so a 10:15 scan in Memphis is 10:15 whichever
+carrier it came from.  See :func:`local_time`.
+"""
+import datetime
+import functools
+
+MONTHS = {
+    name.lower(): number
+    for number, name in enumerate(
+        ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+         'August', 'September', 'October', 'November', 'December'), 1)
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_ymd(s):
+    """
+    Parse a ``YYYYMMDD`` date, as UPS sends them.
+
+    Args:
+        s (str): date string
+
+    Returns:
+        datetime.date
+    """
+    if len(s) == 8 and s.isdecimal():
+        try:
+            return datetime.date(int(s[0:4]), int(s[4:6]), int(s[6:8]))
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(s, "%Y%m%d").date()
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_hms(s):
+    """
+    Parse a ``HHMMSS`` time, as UPS sends them.
+
+    Args:
+        s (str): time string
+
+    Returns:
+        datetime.time
+    """
+    if len(s) == 6 and s.isdecimal():
+        try:
+            return datetime.time(int(s[0:2]), int(s[2:4]), int(s[4:6]))
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(s, "%H%M%S").time()
+
+
+def parse_ymd_hms(date, time):
+    """
+    Parse a ``YYYYMMDD`` date and ``HHMMSS`` time.
+
+    Args:
+        date (str): date string
+        time (str): time string
+
+    Returns:
+        datetime.datetime
+    """
+    return datetime.datetime.combine(parse_ymd(date), parse_hms(time))
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_month_day_year(s):
+    """
+    Parse a ``June 19, 2010`` date, as USPS sends them.
+
+    Args:
+        s (str): date string
+
+    Returns:
+        datetime.date
+    """
+    parts = s.split(' ')
+    if len(parts) == 3 and parts[1].endswith(','):
+        month = MONTHS.get(parts[0].lower())
+        day = parts[1][:-1]
+        year = parts[2]
+        if (month and day.isdecimal() and len(day) <= 2 and
+                year.isdecimal() and len(year) == 4):
+            try:
+                return datetime.date(int(year), month, int(day))
+            except ValueError:
+                pass
+    return datetime.datetime.strptime(s, '%B %d, %Y').date()
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_clock_time(s):
+    """
+    Parse a ``9:05 pm`` time, as USPS sends them.
+
+    Args:
+        s (str): time string
+
+    Returns:
+        datetime.time
+    """
+    parts = s.split(' ')
+    if len(parts) == 2:
+        hm = parts[0].split(':')
+        ampm = parts[1].lower()
+        if (len(hm) == 2 and ampm in ('am', 'pm') and
+                hm[0].isdecimal() and len(hm[0]) <= 2 and
+                hm[1].isdecimal() and len(hm[1]) <= 2):
+            hour = int(hm[0])
+            minute = int(hm[1])
+            if 1 <= hour <= 12 and minute <= 59:
+                hour = hour % 12
+                if ampm == 'pm':
+                    hour += 12
+                return datetime.time(hour, minute)
+    return datetime.datetime.strptime(s, '%I:%M %p').time()
+
+
+def local_time(value):
+    """
+    A date or time as packagetracker keeps them: an aware datetime's
+    offset is dropped, keeping its wall time.
+
+    Args:
+        value (datetime.datetime): or a date, or None
+
+    Returns:
+        the value, naive
+    """
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_iso_local(s):
+    """
+    Parse a ``2020-06-05T10:15:00-04:00`` timestamp, as FedEx sends them,
+    in local time (the offset is dropped).
+
+    Args:
+        s (str): timestamp string
+
+    Returns:
+        datetime.datetime
+    """
+    return datetime.datetime.strptime(s[:19], '%Y-%m-%dT%H:%M:%S')
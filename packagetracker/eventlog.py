@@ -0,0 +1,372 @@
+"""
+An append-only log of every tracking event seen.
+
+For audit and analytics, :class:`EventLog` keeps every
+:class:`~packagetracker.data.TrackingEvent` for every package in a compact
+binary file.  Appends are cheap buffered writes, and reads go through a
+memory map of the file, so scans don't copy the log into memory and the
+history of one package is a handful of seeks::
+
+    >>> events = EventLog('~/.cache/packagetrack.events')
+    >>> events.record(tracker.package(num).track())
+    >>> events.history(num)
+    >>> for rec in events.scan():
+    ...     rec.tracking_number, rec.date, rec.status_code
+
+Tracking the same package again logs its events again, so the log grows
+duplicates; :meth:`EventLog.compact` rewrites it without them.
+
+The offset index (tracking number -> record offsets) is kept in memory, and
+rebuilt from the record headers when the log is opened.  A partly written
+record at the end of the file, i.e. after a crash, is truncated away.
+
+Dates are stored to the microsecond, without a timezone.  Locations and
+details are cut to 65535 bytes of UTF-8.
+"""
+import collections
+import datetime
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from .data   import TrackingEvent
+from .status import Status
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'PTEVLOG1'
+
+# record length, date (microseconds since the epoch), date kind,
+# status code, and the lengths of the tracking number, location and detail
+HEADER = struct.Struct('<IqBBHHH')
+
+# the most bytes of tracking number, location or detail in a record
+MAX_FIELD = 0xFFFF
+
+# date kinds
+NO_DATE = 0
+DATE = 1
+DATETIME = 2
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+EventRecord = collections.namedtuple('EventRecord', (
+    'tracking_number', 'date', 'location', 'detail', 'status_code'))
+
+
+def encode_date(value):
+    """
+    Returns:
+        tuple: (kind, microseconds since the epoch)
+    """
+    if value is None:
+        return NO_DATE, 0
+    if isinstance(value, datetime.datetime):
+        return DATETIME, (value.replace(tzinfo=None) - EPOCH) // MICROSECOND
+    return DATE, (datetime.datetime.combine(value, datetime.time()) - EPOCH) // MICROSECOND
+
+
+def decode_date(kind, micros):
+    if kind == NO_DATE:
+        return None
+    value = EPOCH + micros * MICROSECOND
+    return value.date() if kind == DATE else value
+
+
+def _field(text):
+    # UTF-8, cut on a character boundary to fit the header
+    raw = (text or '').encode('utf-8')
+    if len(raw) > MAX_FIELD:
+        raw = raw[:MAX_FIELD].decode('utf-8', 'ignore').encode('utf-8')
+    return raw
+
+
+def encode(tracking_number, date, location, detail, status_code):
+    """
+    Locations and details longer than MAX_FIELD bytes are truncated.
+
+    Args:
+        tracking_number (str)
+        date (datetime.datetime): event time, a date, or None
+        location (str): or None
+        detail (str): or None
+        status_code (Status)
+
+    Returns:
+        bytes: a log record
+
+    Raises:
+        ValueError: if the tracking number is longer than MAX_FIELD bytes
+    """
+    num = tracking_number.encode('utf-8')
+    if len(num) > MAX_FIELD:
+        raise ValueError("Tracking number is too long for the event log: %d bytes" % len(num))
+    loc = _field(location)
+    det = _field(detail)
+    kind, micros = encode_date(date)
+    length = HEADER.size + len(num) + len(loc) + len(det)
+    return HEADER.pack(length, micros, kind, int(status_code),
+                       len(num), len(loc), len(det)) + num + loc + det
+
+
+class EventLog:
+    """
+    An append-only, memory-mapped log of tracking events.
+
+    Args:
+        path (str): the log file, created if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.RLock()
+
+        # id(map) -> the number of scans reading it, and maps that have
+        # been replaced but are still being scanned.  A map is closed
+        # when it's been replaced and its last scan is done.
+        self._scans = {}
+        self._retired = {}
+        self._open()
+
+
+    def _open(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+
+        self._file = open(self.path, 'r+b')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError("%s is not an event log" % self.path)
+
+        self._map = None
+        self._mapped = 0
+
+        # tracking number -> record offsets
+        self._index = collections.defaultdict(list)
+        self._count = 0
+        self._size = self._build_index()
+
+        # drop a torn write at the end
+        if self._size < os.path.getsize(self.path):
+            log.warning("%s: truncating partial record at %d", self.path, self._size)
+            self._unmap()
+            self._file.truncate(self._size)
+
+        self._file.seek(self._size)
+
+
+    def _build_index(self):
+        # scan the record headers, returns the end of the last whole record
+        size = os.path.getsize(self.path)
+        self._remap(size)
+        offset = len(MAGIC)
+        while offset + HEADER.size <= size:
+            length, _, _, _, nlen, _, _ = HEADER.unpack_from(self._map, offset)
+            if length < HEADER.size or offset + length > size:
+                break
+            start = offset + HEADER.size
+            num = self._map[start:start + nlen].decode('utf-8')
+            self._index[num].append(offset)
+            self._count += 1
+            offset += length
+        return offset
+
+
+    def _remap(self, size):
+        # map the file up to size, if it's grown
+        if size <= self._mapped:
+            return
+        if size > 0:
+            old = self._map
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+            self._mapped = size
+            if old is not None:
+                self._retire(old)
+
+
+    def _unmap(self):
+        if self._map is not None:
+            self._retire(self._map)
+        self._map = None
+        self._mapped = 0
+
+
+    def _retire(self, view):
+        # close a replaced map, or leave that to the last scan reading it
+        if self._scans.get(id(view)):
+            self._retired[id(view)] = view
+        else:
+            view.close()
+
+
+    def _end_scan(self, view):
+        with self._lock:
+            key = id(view)
+            self._scans[key] -= 1
+            if not self._scans[key]:
+                del self._scans[key]
+                retired = self._retired.pop(key, None)
+                if retired is not None:
+                    retired.close()
+
+
+    def _view(self):
+        # a map of everything written so far
+        self._file.flush()
+        self._remap(self._size)
+        return self._map
+
+
+    def __len__(self):
+        return self._count
+
+
+    def __contains__(self, tracking_number):
+        return tracking_number in self._index
+
+
+    def close(self):
+        """
+        Flush and close the log.  Scans already started read on to their
+        end.
+        """
+        with self._lock:
+            self._unmap()
+            self._file.close()
+
+
+    def flush(self):
+        """Flush appended records to the file."""
+        with self._lock:
+            self._file.flush()
+
+
+    def append(self, tracking_number, events):
+        """
+        Append events for a package.
+
+        Args:
+            tracking_number (str)
+            events (iterable): of TrackingEvent
+
+        Returns:
+            int: the number of records appended
+        """
+        with self._lock:
+            offsets = []
+            for e in events:
+                record = encode(tracking_number, e.date, e.location, e.detail, e.status_code)
+                self._file.write(record)
+                offsets.append(self._size)
+                self._size += len(record)
+
+            if offsets:
+                self._index[tracking_number].extend(offsets)
+                self._count += len(offsets)
+            return len(offsets)
+
+
+    def record(self, info):
+        """
+        Append a tracking result's events.
+
+        Args:
+            info (TrackingInfo)
+
+        Returns:
+            int: the number of records appended
+        """
+        return self.append(info.tracking_number, info.events)
+
+
+    def _decode(self, view, offset):
+        length, micros, kind, code, nlen, llen, dlen = HEADER.unpack_from(view, offset)
+        start = offset + HEADER.size
+        num = view[start:start + nlen].decode('utf-8')
+        start += nlen
+        location = view[start:start + llen].decode('utf-8') or None
+        start += llen
+        detail = view[start:start + dlen].decode('utf-8') or None
+        return length, EventRecord(num, decode_date(kind, micros), location, detail, Status(code))
+
+
+    def history(self, tracking_number):
+        """
+        Every event logged for a package, in the order they were logged.
+
+        Args:
+            tracking_number (str)
+
+        Returns:
+            list: of TrackingEvent
+        """
+        with self._lock:
+            view = self._view()
+            records = [self._decode(view, offset)[1]
+                       for offset in self._index.get(tracking_number, ())]
+
+        return [TrackingEvent(r.date, r.location, r.detail, r.status_code) for r in records]
+
+
+    def scan(self):
+        """
+        Read the whole log, in order.  Records are decoded straight from
+        the memory map, one at a time.
+
+        Records appended during a scan may or may not be seen.  A scan
+        started before :meth:`compact` reads the log as it was.
+
+        Yields:
+            EventRecord
+        """
+        with self._lock:
+            view = self._view()
+            end = self._size
+            self._scans[id(view)] = self._scans.get(id(view), 0) + 1
+
+        try:
+            offset = len(MAGIC)
+            while offset < end:
+                length, record = self._decode(view, offset)
+                yield record
+                offset += length
+        finally:
+            self._end_scan(view)
+
+
+    def compact(self):
+        """
+        Rewrite the log without duplicate events, grouping each package's
+        events together.
+
+        Returns:
+            int: the number of records dropped
+        """
+        with self._lock:
+            view = self._view()
+            before = self._count
+            tmp = self.path + '.compact'
+            with open(tmp, 'wb') as f:
+                f.write(MAGIC)
+                for offsets in self._index.values():
+                    seen = set()
+                    for offset in offsets:
+                        length = HEADER.unpack_from(view, offset)[0]
+                        raw = view[offset:offset + length]
+                        if raw not in seen:
+                            seen.add(raw)
+                            f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.close()
+            os.replace(tmp, self.path)
+            self._open()
+
+            dropped = before - self._count
+            log.info("%s: compacted, dropped %d of %d records", self.path, dropped, before)
+            return dropped
@@ -9,3 +9,29 @@ class InvalidTrackingNumber(Exception):
 
 class UnsupportedShipper(Exception):
     pass
+
+
+class TransientError(TrackFailed):
+    """A carrier request failed in a way that is safe to retry, such as a
+    connection error or a 5xx response."""
+    pass
+
+
+class CircuitOpen(TrackFailed):
+    """The carrier's circuit breaker is open, so the request wasn't sent."""
+    pass
+
+
+class TrackingNotFound(TrackFailed):
+    """The carrier has no record of this tracking number (yet)."""
+    pass
+
+
+class Throttled(TransientError):
+    """The carrier is rate-limiting us, or every account is out of rotation."""
+    pass
+
+
+class QuotaExceeded(TrackFailed):
+    """The carrier's daily request budget is spent."""
+    pass
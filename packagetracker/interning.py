@@ -0,0 +1,87 @@
+"""
+Sharing of repeated strings.
+
+Across a large fleet, the same few thousand strings turn up in millions of
+events: locations like "MEMPHIS,TN,US", statuses like "In Transit", service
+names.  The interfaces pass these through a :class:`StringPool`, so every
+event with the same location refers to the same string object rather than
+its own copy.
+
+Lookups are plain dict operations, which are atomic, so the pool is safe to
+share between threads without a lock.
+"""
+
+
+class StringPool:
+    """
+    A pool of shared strings.
+
+    Args:
+        max_size (int): once the pool holds this many strings, new ones are
+            returned as-is rather than added, so it can't grow forever
+    """
+
+    def __init__(self, max_size=200000):
+        self.max_size = max_size
+        self._strings = {}
+        self._joined = {}
+
+
+    def __len__(self):
+        return len(self._strings)
+
+
+    def intern(self, s):
+        """
+        Args:
+            s (str): a string, or None
+
+        Returns:
+            str: the pooled copy of ``s``
+        """
+        if s is None:
+            return None
+
+        pooled = self._strings.get(s)
+        if pooled is not None:
+            return pooled
+
+        if len(self._strings) >= self.max_size:
+            return s
+        return self._strings.setdefault(s, s)
+
+
+    def join(self, parts, sep=','):
+        """
+        Join strings, i.e. the parts of a location, returning the pooled
+        result without building a new string if it's been seen before.
+
+        Args:
+            parts (tuple): strings to join
+            sep (str): separator
+
+        Returns:
+            str: the pooled, joined string
+        """
+        key = (sep, parts)
+        joined = self._joined.get(key)
+        if joined is not None:
+            return joined
+
+        joined = self.intern(sep.join(parts))
+        if len(self._joined) < self.max_size:
+            self._joined[key] = joined
+        return joined
+
+
+    def clear(self):
+        """Empty the pool."""
+        self._strings.clear()
+        self._joined.clear()
+
+
+# the pool used by the interfaces
+pool = StringPool()
+
+intern = pool.intern
+join = pool.join
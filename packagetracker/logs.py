@@ -0,0 +1,154 @@
+"""
+Low-overhead logging of carrier payloads.
+
+Each module logs to its own logger (``packagetracker.service.ups_interface``
+and so on), so carrier payloads can be turned on without the rest::
+
+    >>> logging.getLogger('packagetracker.service').setLevel(logging.DEBUG)
+
+Payloads are passed to the logger as arguments, not formatted strings, so
+they're only serialized when the logger is enabled.  Payload log records
+carry ``carrier`` and ``tracking_number`` attributes, which
+:class:`JSONFormatter` writes as fields.
+
+Logging every payload is too much for a busy tracker, but the odd one is
+useful when a carrier starts sending something unexpected.  A
+:class:`PayloadLog` keeps a sample of recent requests and responses in a
+ring buffer, as the objects the interfaces already have, and only formats
+them when they're dumped::
+
+    >>> tracker = PackageTracker(payload_log=PayloadLog(size=200, sample_rate=0.05))
+    >>> ...
+    >>> tracker.payload_log.dump(sys.stderr)
+"""
+import collections
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+
+Payload = collections.namedtuple('Payload', ('time', 'carrier', 'tracking_number',
+                                             'request', 'response'))
+
+
+def _jsonable(value):
+    # payloads are whatever the interface had: dicts, text, or SOAP objects
+    if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+        return value
+    return str(value)
+
+
+class PayloadLog:
+    """
+    A sampled ring buffer of recent carrier payloads.
+
+    Args:
+        size (int): how many payloads to keep
+        sample_rate (float): fraction of requests to keep, 0 to 1
+        random (callable): returns a float in [0, 1), for testing
+    """
+
+    def __init__(self, size=100, sample_rate=0.01, random=random.random):
+        self.size = size
+        self.sample_rate = sample_rate
+        self.random = random
+
+        self._payloads = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._payloads)
+
+
+    def sample(self):
+        """
+        Decide whether to keep the current request, call this before
+        doing any work to record it.
+
+        Returns:
+            bool
+        """
+        return self.random() < self.sample_rate
+
+
+    def record(self, carrier, tracking_number, request, response):
+        """
+        Keep a payload.  Nothing is copied or formatted, so don't change
+        the objects afterwards.
+
+        Args:
+            carrier (str): the carrier's name
+            tracking_number (str)
+            request: what was sent, without credentials
+            response: the decoded response
+        """
+        with self._lock:
+            self._payloads.append(Payload(time.time(), carrier, tracking_number,
+                                          request, response))
+
+
+    def payloads(self):
+        """
+        Returns:
+            list: the kept Payloads, oldest first
+        """
+        with self._lock:
+            return list(self._payloads)
+
+
+    def dump(self, file=None):
+        """
+        Format the kept payloads as JSON, one per line.
+
+        Args:
+            file: a text file to write them to
+
+        Returns:
+            list: of the JSON lines, if no file was given
+        """
+        lines = [json.dumps({
+            'time':             datetime.datetime.fromtimestamp(p.time).isoformat(),
+            'carrier':          p.carrier,
+            'tracking_number':  p.tracking_number,
+            'request':          _jsonable(p.request),
+            'response':         _jsonable(p.response),
+        }, default=str) for p in self.payloads()]
+
+        if file is None:
+            return lines
+        for line in lines:
+            file.write(line + '\n')
+
+
+    def clear(self):
+        """Drop the kept payloads."""
+        with self._lock:
+            self._payloads.clear()
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats log records as JSON objects, with any ``carrier`` and
+    ``tracking_number`` as fields::
+
+        >>> handler.setFormatter(JSONFormatter())
+    """
+
+    FIELDS = ('carrier', 'tracking_number')
+
+    def format(self, record):
+        entry = {
+            'time':     self.formatTime(record),
+            'level':    record.levelname,
+            'logger':   record.name,
+            'message':  record.getMessage(),
+        }
+        for field in self.FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
@@ -0,0 +1,318 @@
+"""
+Instrumentation: hooks, counters and latency histograms.
+
+Every :class:`~packagetracker.PackageTracker` has a :class:`Metrics`, shared
+with its interfaces, which records:
+
+- ``packagetracker_requests_total{carrier}``: tracking calls sent to a carrier
+- ``packagetracker_errors_total{carrier,error}``: failed calls, by exception.
+  Calls an open circuit breaker turned away are ``error="CircuitOpen"``,
+  and aren't counted as requests.
+- ``packagetracker_retries_total{carrier}``: retried requests
+- ``packagetracker_request_seconds{carrier}``: call latency, retries and all
+- ``packagetracker_stage_seconds{carrier,stage}``: time in each stage of a
+  request: ``build``, ``network``, ``decode`` and ``parse``.  A stage's
+  time includes any stage inside it; USPS decodes its XML while parsing.
+- ``packagetracker_cache_total{cache,result}``: cache hits and misses
+- ``packagetracker_breaker_open{carrier}``: 1 while a circuit breaker is open
+
+Callbacks can be added to ``on_request``, ``on_response`` and ``on_error``.
+``on_error`` also hears of calls an open circuit breaker turned away, which
+never got to ``on_request``::
+
+    >>> tracker.metrics.on_error.append(
+    ...     lambda carrier, num, exc, seconds: alert(carrier, exc))
+
+and :meth:`Metrics.serve` exports everything in the Prometheus text format::
+
+    >>> tracker.metrics.serve(9464)
+"""
+import bisect
+import collections
+import contextlib
+import logging
+import threading
+import socketserver
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+log = logging.getLogger(__name__)
+
+# histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'packagetracker_requests_total':    'Tracking calls sent to the carrier.',
+    'packagetracker_errors_total':      'Failed tracking calls.',
+    'packagetracker_retries_total':     'Retried carrier requests.',
+    'packagetracker_request_seconds':   'Tracking call latency.',
+    'packagetracker_stage_seconds':     'Time in each stage of a carrier request.',
+    'packagetracker_cache_total':       'Cache lookups.',
+    'packagetracker_breaker_open':      'Whether the circuit breaker is open.',
+}
+
+
+class Histogram:
+    """
+    Counts observations into buckets.
+
+    Args:
+        buckets (tuple): upper bounds of the buckets, ascending
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value):
+        """
+        Args:
+            value (float): the observation
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+    def cumulative(self):
+        """
+        Returns:
+            list: (upper bound, count of observations <= it) pairs, ending
+            with infinity
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _labels(labels):
+    # labels as a hashable, ordered key
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('%s="%s"' % (k, _escape(v)) for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Counters, histograms and hooks for a tracker.
+
+    Args:
+        buckets (tuple): histogram bucket bounds, in seconds
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+
+        # callback lists, see the module docs
+        self.on_request = []
+        self.on_response = []
+        self.on_error = []
+
+        # (name, labels) -> value or Histogram
+        self._counters = collections.OrderedDict()
+        self._histograms = collections.OrderedDict()
+        self._collectors = []
+        self._lock = threading.Lock()
+
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increment a counter.
+
+        Args:
+            name (str): metric name
+            value (int): amount
+            labels: metric labels
+        """
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+
+    def observe(self, name, value, **labels):
+        """
+        Add an observation to a histogram.
+
+        Args:
+            name (str): metric name
+            value (float): i.e. seconds
+            labels: metric labels
+        """
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """
+        Time a block into a histogram, whether or not it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+
+    def stage(self, carrier, stage):
+        """
+        Time a stage of a carrier request.
+
+        Args:
+            carrier (str): carrier name
+            stage (str): 'build', 'network', 'decode' or 'parse'
+        """
+        return self.timer('packagetracker_stage_seconds', carrier=carrier, stage=stage)
+
+
+    def counter(self, name, **labels):
+        """
+        Returns:
+            int: a counter's value
+        """
+        return self._counters.get((name, _labels(labels)), 0)
+
+
+    def histogram(self, name, **labels):
+        """
+        Returns:
+            Histogram: or None if nothing's been observed
+        """
+        return self._histograms.get((name, _labels(labels)))
+
+
+    def add_collector(self, collector):
+        """
+        Add a function that reports more metrics when they're exported,
+        i.e. from another object's own statistics.
+
+        Args:
+            collector (callable): returns an iterable of
+                (name, type, labels dict, value), type being 'counter' or
+                'gauge'
+        """
+        self._collectors.append(collector)
+
+
+    def fire(self, hook, *args):
+        """
+        Call a hook's callbacks.  Their exceptions are logged, not raised.
+
+        Args:
+            hook (list): i.e. self.on_request
+            args: callback arguments
+        """
+        for callback in list(hook):
+            try:
+                callback(*args)
+            except Exception:
+                log.exception("Metrics callback %r failed", callback)
+
+
+    def render(self):
+        """
+        Returns:
+            str: all the metrics, in the Prometheus text format
+        """
+        # name -> (type, [(labels, value or Histogram)])
+        families = collections.OrderedDict()
+
+        def add(name, kind, labels, value):
+            families.setdefault(name, (kind, []))[1].append((labels, value))
+
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                add(name, 'counter', labels, value)
+            for (name, labels), histogram in self._histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+                add(name, 'histogram', labels, copy)
+
+        for collector in self._collectors:
+            try:
+                for name, kind, labels, value in collector():
+                    add(name, kind, _labels(labels), value)
+            except Exception:
+                log.exception("Metrics collector %r failed", collector)
+
+        lines = []
+        for name, (kind, samples) in families.items():
+            if name in HELP:
+                lines.append('# HELP %s %s' % (name, HELP[name]))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for labels, value in samples:
+                if kind != 'histogram':
+                    lines.append('%s%s %s' % (name, _format_labels(labels), _format_value(value)))
+                    continue
+                for bound, count in value.cumulative():
+                    lines.append('%s_bucket%s %d' % (
+                        name, _format_labels(labels, (('le', _format_value(bound)),)), count))
+                lines.append('%s_sum%s %s' % (name, _format_labels(labels), repr(value.sum)))
+                lines.append('%s_count%s %d' % (name, _format_labels(labels), value.count))
+
+        return '\n'.join(lines) + '\n'
+
+
+    def serve(self, port=9464, host='127.0.0.1'):
+        """
+        Serve the metrics at ``/metrics``, from a background thread.
+
+        Args:
+            port (int): port to listen on, 0 for any
+            host (str): address to listen on
+
+        Returns:
+            http.server.HTTPServer: the server; call ``shutdown()`` to stop it
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                log.debug("metrics: " + fmt, *args)
+
+        server = _Server((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='packagetracker-metrics',
+                         daemon=True).start()
+        log.info("Serving metrics on http://%s:%d/metrics", host, server.server_port)
+        return server
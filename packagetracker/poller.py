@@ -0,0 +1,283 @@
+"""
+Multiprocess polling of a large fleet.
+
+Parsing carrier responses is CPU-bound, so one process can't keep enough
+requests in flight to use a big carrier quota.  :class:`FleetPoller` splits
+the tracking numbers into shards and tracks them in a pool of worker
+processes, each with its own :class:`~packagetracker.PackageTracker` (and
+threads, see ``track_many()``)::
+
+    >>> with FleetPoller(processes=8) as poller:
+    ...     for num, result in poller.poll(numbers):
+    ...         ...
+    >>> poller.stats
+
+Each worker builds its tracker by calling ``factory``, which must be
+picklable: a module-level function, or a ``functools.partial`` of one.
+Nothing else is shared with the parent, and HTTP sessions and thread pools
+inherited through ``fork`` are replaced in the child before use.
+
+Results stream back as each shard finishes, packed into plain tuples
+rather than pickled objects, which is smaller and faster to move between
+processes.
+
+Rate limits, quotas and circuit breakers belong to each worker's tracker,
+so they apply per process: divide ``requests_per_second`` by the number
+of processes.
+"""
+import functools
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+
+from .           import PackageTracker
+from .data       import TrackingInfo, TrackingEvent, FULL
+from .exceptions import TrackFailed
+from .status     import Status
+
+log = logging.getLogger(__name__)
+
+
+def pack(info):
+    """
+    Pack a TrackingInfo into plain tuples.
+
+    Args:
+        info (TrackingInfo)
+
+    Returns:
+        tuple
+    """
+    return (
+        info.tracking_number,
+        info.raw_delivery_date,
+        info.status,
+        int(info.status_code),
+        info.last_update,
+        info.location,
+        info.delivery_detail,
+        info.service,
+        info.link,
+        info.detail,
+        tuple((e.date, e.location, e.detail, int(e.status_code)) for e in info.events),
+    )
+
+
+def unpack(packed):
+    """
+    Rebuild a TrackingInfo packed by pack().
+
+    Args:
+        packed (tuple)
+
+    Returns:
+        TrackingInfo
+    """
+    (num, delivery_date, status, status_code, last_update, location,
+     delivery_detail, service, link, detail, events) = packed
+
+    info = TrackingInfo(
+        tracking_number = num,
+        delivery_date   = delivery_date,
+        status          = status,
+        last_update     = last_update,
+        location        = location,
+        delivery_detail = delivery_detail,
+        service         = service,
+        link            = link,
+        detail          = detail,
+        status_code     = Status(status_code),
+    )
+    info.events = [TrackingEvent(date, loc, text, Status(code))
+                   for date, loc, text, code in events]
+    return info
+
+
+class WorkerStats:
+    """
+    Throughput of a worker process.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.shards = 0
+        self.tracked = 0
+        self.failed = 0
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+
+
+    def __repr__(self):
+        return ('<WorkerStats(pid=%r, tracked=%r, failed=%r, per_second=%.1f)>' %
+                (self.pid, self.tracked, self.failed, self.per_second))
+
+
+    @property
+    def per_second(self):
+        """
+        Returns:
+            float: packages tracked per second of the worker's time
+        """
+        return (self.tracked + self.failed) / self.seconds if self.seconds else 0.0
+
+
+# each worker process's tracker
+_tracker = None
+
+
+def _init_worker(factory):
+    global _tracker
+    _tracker = factory()
+
+
+def _poll_shard(numbers, priority, detail, threads):
+    # track a shard in a worker, returns stats and packed results
+    started = time.perf_counter()
+    cpu = time.process_time()
+
+    results = []
+    for num, result in _tracker.track_many(numbers, priority=priority, detail=detail,
+                                           workers=threads).items():
+        if isinstance(result, TrackingInfo):
+            results.append((num, _tracker.package(num).shipper, pack(result)))
+            continue
+
+        # the exception goes back as is, if it can
+        try:
+            pickle.dumps(result)
+        except Exception:
+            result = TrackFailed(repr(result))
+        results.append((num, None, result))
+
+    return (os.getpid(), time.perf_counter() - started,
+            time.process_time() - cpu, results)
+
+
+class FleetPoller:
+    """
+    Tracks packages in a pool of worker processes.
+
+    Args:
+        config_file (str): config file for the workers' trackers
+        testing (bool): test mode for the workers' trackers
+        factory (callable): builds each worker's PackageTracker, instead of
+            config_file and testing.  It must be picklable.
+        processes (int): worker processes, default the CPU count
+        shard_size (int): tracking numbers per shard
+        threads (int): threads per worker, see ``track_many()``
+        priority (str): 'normal' or 'low', see ``track()``
+        detail (str): 'full' or 'summary', see ``track()``
+        store (ShipmentStore): if given, results are saved to it as they
+            arrive, a shard per transaction
+        start_method (str): multiprocessing start method, i.e. 'fork' or
+            'spawn', default the platform's
+    """
+
+    def __init__(self,
+                 config_file='~/.config/packagetrack',
+                 testing=False,
+                 factory=None,
+                 processes=None,
+                 shard_size=100,
+                 threads=4,
+                 priority='low',
+                 detail=FULL,
+                 store=None,
+                 start_method=None):
+
+        self.factory = factory or functools.partial(PackageTracker, config_file, testing)
+        self.processes = processes or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.threads = threads
+        self.priority = priority
+        self.detail = detail
+        self.store = store
+        self.context = multiprocessing.get_context(start_method)
+
+        # pid -> WorkerStats
+        self.stats = {}
+        self._pool = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = self.context.Pool(self.processes, initializer=_init_worker,
+                                           initargs=(self.factory,))
+        return self._pool
+
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+    def poll(self, tracking_numbers):
+        """
+        Track packages, yielding results as each shard finishes.
+
+        Args:
+            tracking_numbers (iterable): tracking numbers
+
+        Yields:
+            tuple: (tracking number, TrackingInfo or the exception raised
+            while tracking it), in no particular order
+        """
+        numbers = list(tracking_numbers)
+        shards = [numbers[i:i + self.shard_size]
+                  for i in range(0, len(numbers), self.shard_size)]
+        poll_shard = functools.partial(_poll_shard, priority=self.priority,
+                                       detail=self.detail, threads=self.threads)
+
+        for pid, seconds, cpu_seconds, results in self._get_pool().imap_unordered(poll_shard, shards):
+            stats = self.stats.get(pid)
+            if stats is None:
+                stats = self.stats[pid] = WorkerStats(pid)
+            stats.shards += 1
+            stats.seconds += seconds
+            stats.cpu_seconds += cpu_seconds
+
+            log.debug("Worker %d: %d packages in %.2fs", pid, len(results), seconds)
+
+            shard = []
+            infos = []
+            for num, shipper, result in results:
+                if shipper is None:
+                    stats.failed += 1
+                else:
+                    stats.tracked += 1
+                    result = unpack(result)
+                    infos.append((shipper, result))
+                shard.append((num, result))
+
+            if self.store is not None:
+                self.store.save_many(infos)
+
+            for item in shard:
+                yield item
+
+
+    def poll_all(self, tracking_numbers):
+        """
+        Track packages, waiting for all of them.
+
+        Args:
+            tracking_numbers (iterable): tracking numbers
+
+        Returns:
+            dict: tracking number -> TrackingInfo, or the exception raised
+            while tracking it
+        """
+        return dict(self.poll(tracking_numbers))
@@ -0,0 +1,359 @@
+"""
+Ingestion of carrier push notifications.
+
+UPS (Track Alert) and FedEx (Track API webhooks) can push tracking updates
+to a subscriber endpoint, which costs nothing per update, unlike polling.
+The ``parse_*`` functions turn their JSON payloads into the same
+:class:`~packagetracker.data.TrackingInfo` and
+:class:`~packagetracker.data.TrackingEvent` objects ``track()`` returns, and
+a :class:`PushHandler` applies them to a tracker's cache and store, and
+fires any watch callbacks::
+
+    >>> handler = PushHandler(tracker, credentials={'UPS': 'secret'})
+    >>> handler.subscribe('1Z9999999999999999')
+    >>> wsgiref.simple_server.make_server('', 8080, handler.wsgi_app).serve_forever()
+
+Subscribed packages are skipped by the watcher's polling loop, pushes
+stand in for it.
+
+A UPS push is a single activity, so it's merged with the previous result
+(from the cache or the store) to keep the event history.
+
+:class:`packagetracker.testing.push.LocalPublisher` sends payloads shaped
+like the carriers' for tests.
+"""
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+
+from .                            import interning
+from .data                        import TrackingInfo, TrackingEvent
+from .dates                       import parse_iso_local, parse_ymd, parse_ymd_hms
+from .exceptions                  import TrackFailed, UnsupportedShipper
+from .service.fedex_interface     import fedex_status, LINKROOT as FEDEX_LINKROOT
+from .service.ups_interface       import activity_status, LINKROOT as UPS_LINKROOT
+from .status                      import Status
+
+log = logging.getLogger(__name__)
+
+
+def _ups_location(loc):
+    if not loc or not loc.get('city'):
+        return None
+    return interning.join(tuple(loc[key] for key in ('city', 'stateProvince', 'country')
+                                if loc.get(key)))
+
+
+def parse_ups(payload):
+    """
+    Parse a UPS Track Alert notification.
+
+    Args:
+        payload (dict): the decoded JSON
+
+    Returns:
+        list: of TrackingInfo, with one event
+
+    Raises:
+        TrackFailed: if the payload can't be parsed
+    """
+    try:
+        num = payload['trackingNumber']
+        activity = payload['activityStatus']
+        status = {'Type': activity.get('type'),
+                  'Code': activity.get('code'),
+                  'Description': activity.get('description', '')}
+        status_code = activity_status(status)
+        when = parse_ymd_hms(payload['localActivityDate'], payload['localActivityTime'])
+
+        if payload.get('actualDeliveryDate'):
+            delivery_date = parse_ymd_hms(payload['actualDeliveryDate'],
+                                          payload.get('actualDeliveryTime') or '000000')
+        elif payload.get('scheduledDeliveryDate'):
+            delivery_date = datetime.datetime.combine(
+                parse_ymd(payload['scheduledDeliveryDate']), datetime.time())
+        else:
+            delivery_date = None
+    except (KeyError, TypeError, ValueError) as e:
+        raise TrackFailed("Bad UPS push payload: {!r}".format(e))
+
+    location = _ups_location(payload.get('activityLocation'))
+    detail = interning.intern(status['Description'])
+
+    info = TrackingInfo(
+        tracking_number = num,
+        last_update     = when,
+        delivery_date   = delivery_date,
+        status          = detail,
+        location        = location,
+        delivery_detail = detail if status_code == Status.DELIVERED else None,
+        link            = UPS_LINKROOT.format(tracknum = num),
+        status_code     = status_code,
+    )
+    info.add_event(when, location, detail, status_code)
+    return [info]
+
+
+def _fedex_location(loc):
+    if not loc or not loc.get('city'):
+        return None
+    return interning.join(tuple(loc[key] for key in ('city', 'stateOrProvinceCode', 'countryCode')
+                                if loc.get(key)))
+
+
+def _fedex_event(e):
+    return TrackingEvent(
+        date        = parse_iso_local(e['date']),
+        location    = _fedex_location(e.get('scanLocation')),
+        detail      = interning.intern(e.get('eventDescription')),
+        status_code = fedex_status(e.get('eventType')),
+    )
+
+
+def parse_fedex(payload):
+    """
+    Parse a FedEx tracking webhook notification, which holds Track API
+    ``trackResults``.
+
+    Args:
+        payload (dict): the decoded JSON
+
+    Returns:
+        list: of TrackingInfo
+
+    Raises:
+        TrackFailed: if the payload can't be parsed
+    """
+    infos = []
+    try:
+        for result in payload['trackResults']:
+            num = result['trackingNumberInfo']['trackingNumber']
+            latest = result.get('latestStatusDetail', {})
+            status_code = fedex_status(latest.get('code'))
+
+            times = {t['type']: parse_iso_local(t['dateTime'])
+                     for t in result.get('dateAndTimes', ()) if t.get('dateTime')}
+            if status_code == Status.DELIVERED:
+                delivery_date = times.get('ACTUAL_DELIVERY')
+            else:
+                delivery_date = times.get('ESTIMATED_DELIVERY')
+
+            events = result.get('scanEvents', [])
+            info = TrackingInfo(
+                tracking_number = num,
+                last_update     = parse_iso_local(events[0]['date']) if events else None,
+                delivery_date   = delivery_date,
+                status          = interning.intern(latest.get('description', 'In transit')),
+                location        = _fedex_location(latest.get('scanLocation')),
+                service         = interning.intern(result.get('serviceDetail', {}).get('description')),
+                link            = FEDEX_LINKROOT.format(tracknum = num),
+                status_code     = status_code,
+            )
+            info.set_event_source(events, _fedex_event)
+            infos.append(info)
+
+            # catch bad events now, rather than when they're used
+            info.events
+    except (KeyError, TypeError, ValueError) as e:
+        raise TrackFailed("Bad FedEx push payload: {!r}".format(e))
+
+    return infos
+
+
+PARSERS = {
+    'UPS': parse_ups,
+    'FedEx': parse_fedex,
+}
+
+
+def merge(old, new):
+    """
+    Merge a pushed result with the previous one, keeping the previous
+    events that aren't in the new result.
+
+    Args:
+        old (TrackingInfo): the previous result, or None
+        new (TrackingInfo): the pushed result
+
+    Returns:
+        TrackingInfo: a new result, with the status of the newer of the
+        two and the merged events, newest first.  Neither argument is
+        changed, the previous one may be cached or watched.
+    """
+    if old is None:
+        return new
+
+    # notifications can arrive out of order, keep the newest status
+    if old.last_update and new.last_update and new.last_update < old.last_update:
+        old, new = new, old
+
+    seen = {(e.date, e.location, e.detail) for e in new.events}
+    events = new.events + [e for e in old.events if (e.date, e.location, e.detail) not in seen]
+    events.sort(key=lambda e: e.date or datetime.datetime.min, reverse=True)
+
+    # pushes leave out some things.  The delivery_date property falls back
+    # to the last event, so look at what the carrier actually sent.
+    delivery_date = new.raw_delivery_date
+    if delivery_date is None:
+        delivery_date = old.raw_delivery_date
+
+    merged = TrackingInfo(
+        tracking_number = new.tracking_number,
+        delivery_date   = delivery_date,
+        status          = new.status,
+        last_update     = new.last_update,
+        location        = new.location,
+        delivery_detail = new.delivery_detail,
+        service         = new.service if new.service is not None else old.service,
+        link            = new.link,
+        detail          = new.detail,
+        status_code     = new.status_code,
+    )
+    merged.events = events
+    return merged
+
+
+class PushHandler:
+    """
+    Applies carrier push notifications to a tracker.
+
+    Results go into the tracker's cache and store, and the watcher is told
+    about them, just as if they'd been polled.
+
+    Args:
+        tracker (PackageTracker): the tracker to update
+        credentials (dict): shipper -> the credential given when
+            subscribing.  UPS sends it in a ``credential`` header, FedEx
+            signs the body with it (``x-fedex-signature``, HMAC-SHA256).
+            Shippers without one aren't checked.
+    """
+
+    def __init__(self, tracker, credentials=None):
+        self.tracker = tracker
+        self.credentials = dict(credentials or {})
+
+
+    def subscribe(self, tracking_number):
+        """
+        Note that a package's updates will be pushed, so the watcher
+        doesn't poll it.  Call this after subscribing with the carrier.
+
+        Args:
+            tracking_number (str)
+        """
+        self.tracker.watcher.subscribe(tracking_number)
+
+
+    def unsubscribe(self, tracking_number):
+        """
+        Go back to polling a package.
+
+        Args:
+            tracking_number (str)
+        """
+        self.tracker.watcher.unsubscribe(tracking_number)
+
+
+    def _previous(self, shipper, num):
+        # the last result we have for a package
+        if self.tracker.cache is not None:
+            info = self.tracker.cache.peek((shipper, num))
+            if info is not None:
+                return info
+        if self.tracker.store is not None:
+            return self.tracker.store.info(num)
+
+
+    def handle(self, shipper, payload):
+        """
+        Apply a push notification.
+
+        Args:
+            shipper (str): 'UPS' or 'FedEx'
+            payload (dict): the decoded JSON
+
+        Returns:
+            list: of the TrackingInfo applied
+
+        Raises:
+            TrackFailed: if the payload can't be parsed
+            UnsupportedShipper
+        """
+        parse = PARSERS.get(shipper)
+        if parse is None:
+            raise UnsupportedShipper(shipper)
+
+        infos = []
+        for info in parse(payload):
+            info = merge(self._previous(shipper, info.tracking_number), info)
+            key = (shipper, info.tracking_number)
+
+            if self.tracker.cache is not None:
+                self.tracker.cache.put(key, info)
+            if self.tracker.negative_cache is not None:
+                self.tracker.negative_cache.forget(key)
+            self.tracker.watcher.push(info)
+            infos.append(info)
+
+        if self.tracker.store is not None:
+            self.tracker.store.save_many((shipper, info) for info in infos)
+
+        log.debug("Applied %d %s push results", len(infos), shipper)
+        return infos
+
+
+    def verify(self, shipper, headers, body):
+        """
+        Check a notification's credential.
+
+        Args:
+            shipper (str)
+            headers (dict): request headers, with lowercase names
+            body (bytes): the request body
+
+        Returns:
+            bool: True if it checks out, or there's no credential
+        """
+        secret = self.credentials.get(shipper)
+        if secret is None:
+            return True
+
+        if shipper == 'FedEx':
+            expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+            return hmac.compare_digest(expected, headers.get('x-fedex-signature', ''))
+        return hmac.compare_digest(secret, headers.get('credential', ''))
+
+
+    def wsgi_app(self, environ, start_response):
+        """
+        A WSGI application accepting POSTs to ``/UPS`` and ``/FedEx``.
+        """
+        shipper = environ.get('PATH_INFO', '').strip('/')
+
+        def respond(status):
+            start_response(status, [('Content-Type', 'text/plain')])
+            return [status.encode('ascii')]
+
+        if environ.get('REQUEST_METHOD') != 'POST':
+            return respond('405 Method Not Allowed')
+        if shipper not in PARSERS:
+            return respond('404 Not Found')
+
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        body = environ['wsgi.input'].read(length)
+        headers = {key[5:].replace('_', '-').lower(): value
+                   for key, value in environ.items() if key.startswith('HTTP_')}
+
+        if not self.verify(shipper, headers, body):
+            log.warning("%s push with a bad credential", shipper)
+            return respond('401 Unauthorized')
+
+        try:
+            self.handle(shipper, json.loads(body.decode('utf-8')))
+        except (ValueError, TrackFailed) as e:
+            log.warning("Bad %s push: %s", shipper, e)
+            return respond('400 Bad Request')
+
+        return respond('200 OK')
@@ -0,0 +1,297 @@
+"""
+Daily API quota accounting.
+
+Carrier contracts often cap the number of requests per day.  A
+:class:`QuotaLedger` counts every request sent, per carrier and account,
+persists the counts so they survive restarts, and compares them against
+daily budgets, which are set in the config file::
+
+    [UPS]
+    daily_budget = 20000
+
+Days are UTC days.  Counts are written every ``flush_interval`` seconds,
+and by :meth:`QuotaLedger.close`, which also runs when the interpreter
+exits.
+
+Low-priority tracking (i.e. background polling) is paced so a carrier
+doesn't use its budget faster than the day goes by: when a carrier is
+ahead of that pace, low-priority calls wait, and once the budget is spent
+they fail with :class:`~packagetracker.exceptions.QuotaExceeded`.  Normal
+priority calls are always counted, but never held back.
+
+Schedulers can use :meth:`QuotaLedger.report` and
+:meth:`QuotaLedger.allowance` to plan their sweeps.
+"""
+import atexit
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+from .exceptions import QuotaExceeded
+
+log = logging.getLogger(__name__)
+
+
+def _close_at_exit(ref):
+    ledger = ref()
+    if ledger is not None:
+        try:
+            ledger.close()
+        except OSError as e:
+            log.warning("Couldn't save the quota ledger at exit: %s", e)
+
+DAY = 86400.0
+
+LOW = 'low'
+NORMAL = 'normal'
+
+
+class QuotaLedger:
+    """
+    Counts carrier requests against daily budgets.
+
+    Args:
+        path (str): file to persist counts to, None to keep them in memory
+        budgets (dict): carrier -> daily request budget
+        flush_interval (float): seconds between writes to ``path``
+        max_delay (float): the longest a low-priority call is held back
+        clock (callable): time source, for testing
+        sleep (callable): sleep function, for testing
+    """
+
+    def __init__(self,
+                 path=None,
+                 budgets=None,
+                 flush_interval=10.0,
+                 max_delay=60.0,
+                 clock=time.time,
+                 sleep=time.sleep):
+
+        self.path = os.path.expanduser(path) if path else None
+        self.budgets = dict(budgets or {})
+        self.flush_interval = flush_interval
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+
+        # carrier -> account -> count, for self._day
+        self._day = self._today()
+        self._counts = {}
+        self._dirty = False
+        self._flushed = self.clock()
+        self._lock = threading.Lock()
+
+        self.load()
+        if self.path:
+            atexit.register(_close_at_exit, weakref.ref(self))
+
+
+    def _today(self):
+        return datetime.datetime.fromtimestamp(self.clock(), datetime.timezone.utc).date().isoformat()
+
+
+    def _elapsed(self):
+        # fraction of the current day gone by
+        return (self.clock() % DAY) / DAY
+
+
+    def _rollover(self):
+        # start fresh counts on a new day; call with the lock held
+        today = self._today()
+        if today != self._day:
+            log.info("Quota ledger: new day %s", today)
+            self._day = today
+            self._counts = {}
+            self._dirty = True
+
+
+    def set_budget(self, carrier, budget):
+        """
+        Set a carrier's daily budget.
+
+        Args:
+            carrier (str): shipper name
+            budget (int): requests per day, None for no budget
+        """
+        with self._lock:
+            if budget is None:
+                self.budgets.pop(carrier, None)
+            else:
+                self.budgets[carrier] = budget
+
+
+    def record(self, carrier, account=None, count=1):
+        """
+        Count requests sent.
+
+        Args:
+            carrier (str): shipper name
+            account (str): account name
+            count (int): number of requests
+        """
+        with self._lock:
+            self._rollover()
+            accounts = self._counts.setdefault(carrier, {})
+            accounts[account or carrier] = accounts.get(account or carrier, 0) + count
+            self._dirty = True
+
+            flush = self.path and self.clock() - self._flushed >= self.flush_interval
+
+        if flush:
+            self.save()
+
+
+    def usage(self, carrier, account=None):
+        """
+        Returns:
+            int: requests sent today by the carrier, or one of its accounts
+        """
+        with self._lock:
+            self._rollover()
+            accounts = self._counts.get(carrier, {})
+            if account is not None:
+                return accounts.get(account, 0)
+            return sum(accounts.values())
+
+
+    def remaining(self, carrier):
+        """
+        Returns:
+            int: requests left in today's budget, None if there's no budget
+        """
+        budget = self.budgets.get(carrier)
+        if budget is None:
+            return None
+        return max(0, budget - self.usage(carrier))
+
+
+    def projected(self, carrier):
+        """
+        Returns:
+            float: projected requests by the end of the day, at today's rate
+        """
+        used = self.usage(carrier)
+        elapsed = self._elapsed()
+        if not elapsed:
+            return float(used)
+        return used / elapsed
+
+
+    def allowance(self, carrier):
+        """
+        How many requests can be made right now without getting ahead of
+        the budget's pace.
+
+        Returns:
+            int: number of requests, None if there's no budget
+        """
+        budget = self.budgets.get(carrier)
+        if budget is None:
+            return None
+        return max(0, int(budget * self._elapsed()) - self.usage(carrier))
+
+
+    def delay(self, carrier):
+        """
+        Returns:
+            float: seconds until the carrier is back on its budget's pace,
+            0 if it's not ahead of it.
+        """
+        budget = self.budgets.get(carrier)
+        if not budget:
+            return 0.0
+
+        used = self.usage(carrier)
+        on_pace_at = used / budget * DAY
+        return max(0.0, on_pace_at - self.clock() % DAY)
+
+
+    def throttle(self, carrier, priority=NORMAL):
+        """
+        Hold back a call, according to its priority.
+
+        Args:
+            carrier (str): shipper name
+            priority (str): 'low' or 'normal'
+
+        Raises:
+            QuotaExceeded: if this is a low priority call and the budget
+            is spent
+        """
+        if priority != LOW:
+            return
+
+        if self.remaining(carrier) == 0:
+            raise QuotaExceeded("{} daily budget of {} requests is spent".format(
+                                carrier, self.budgets[carrier]))
+
+        delay = min(self.delay(carrier), self.max_delay)
+        if delay:
+            log.debug("%s is over its budget pace, delaying low priority call %.1fs",
+                      carrier, delay)
+            self.sleep(delay)
+
+
+    def report(self):
+        """
+        Returns:
+            dict: carrier -> usage, budget and projections for today.
+        """
+        with self._lock:
+            self._rollover()
+            carriers = set(self._counts) | set(self.budgets)
+            counts = {c: dict(self._counts.get(c, {})) for c in carriers}
+
+        return {
+            carrier: {
+                'day':          self._day,
+                'used':         sum(counts[carrier].values()),
+                'accounts':     counts[carrier],
+                'budget':       self.budgets.get(carrier),
+                'remaining':    self.remaining(carrier),
+                'allowance':    self.allowance(carrier),
+                'projected':    self.projected(carrier),
+            }
+            for carrier in carriers
+        }
+
+
+    def load(self):
+        """Load today's counts from ``path``, if it exists."""
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        with open(self.path) as fh:
+            data = json.load(fh)
+
+        with self._lock:
+            if data.get('day') == self._day:
+                self._counts = data.get('counts', {})
+
+
+    def save(self):
+        """Write the counts to ``path``."""
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({'day': self._day, 'counts': self._counts})
+            self._dirty = False
+            self._flushed = self.clock()
+
+            # write and rename, so a crash doesn't leave a broken file
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as fh:
+                fh.write(data)
+            os.replace(tmp, self.path)
+
+
+    def close(self):
+        """Write any counts not yet saved."""
+        self.save()
@@ -0,0 +1,301 @@
+"""
+Retry and request hedging for carrier API calls.
+
+Every interface sends its requests through a :class:`RetryPolicy`.
+Requests that fail with a :class:`~packagetracker.exceptions.TransientError`
+(connection problems, timeouts, 5xx responses) are retried with
+exponential backoff and full jitter.  All tracking requests are read-only,
+so retrying them is always safe.
+
+Optionally, a policy can *hedge* requests: if the first request hasn't
+answered after the 95th percentile of recently observed latencies, a
+second request is sent (possibly to an alternate endpoint), and whichever
+answers first wins.  The first request runs on a thread of its own, the
+hedges on a small shared pool; when every hedge worker is busy, i.e. with
+requests that lost a race, the request isn't hedged.
+"""
+import collections
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .exceptions import TransientError
+
+log = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """
+    A sliding window of recent request latencies.
+
+    Args:
+        size (int): number of samples to keep
+    """
+
+    def __init__(self, size=200):
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._samples)
+
+
+    def add(self, seconds):
+        """
+        Record a latency sample.
+
+        Args:
+            seconds (float): request latency
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+
+    def percentile(self, pct):
+        """
+        Args:
+            pct (float): percentile, 0-100
+
+        Returns:
+            float: the given percentile of the current samples, or None
+            if there are no samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+
+        if not samples:
+            return None
+
+        index = min(len(samples) - 1, int(len(samples) * pct / 100.0))
+        return samples[index]
+
+
+class RetryPolicy:
+    """
+    How to retry (and optionally hedge) carrier requests.
+
+    Args:
+        max_attempts (int): total attempts, including the first
+        base_delay (float): backoff base, in seconds
+        max_delay (float): backoff cap, in seconds
+        timeout (float): per-request network timeout, in seconds
+        hedge (bool): True to enable request hedging
+        hedge_percentile (float): latency percentile after which to hedge
+        hedge_min_samples (int): samples needed before the percentile is
+            trusted; until then ``hedge_delay`` is used
+        hedge_delay (float): default hedge delay, in seconds
+        hedge_workers (int): the most hedged requests in flight at once
+        sleep (callable): sleep function, for testing
+    """
+
+    def __init__(self,
+                 max_attempts=3,
+                 base_delay=0.2,
+                 max_delay=5.0,
+                 timeout=30.0,
+                 hedge=False,
+                 hedge_percentile=95,
+                 hedge_min_samples=20,
+                 hedge_delay=1.0,
+                 hedge_workers=8,
+                 sleep=time.sleep):
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_delay = hedge_delay
+        self.hedge_workers = hedge_workers
+        self.sleep = sleep
+
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        # hedged requests submitted and not finished
+        self._hedges = 0
+
+
+    def __getstate__(self):
+        # the executor's threads don't go with it
+        state = self.__dict__.copy()
+        state['_executor'] = state['_executor_pid'] = None
+        state['_hedges'] = 0
+        del state['_executor_lock']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._executor_lock = threading.Lock()
+
+
+    def backoff(self, attempt):
+        """
+        Returns the jittered delay before the given retry.
+
+        Args:
+            attempt (int): the attempt that just failed, starting at 1
+
+        Returns:
+            float: seconds to sleep
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+
+    def hedge_after(self, window):
+        """
+        Returns how long to wait for the first request before hedging.
+
+        Args:
+            window (LatencyWindow): latencies observed for this endpoint
+
+        Returns:
+            float: seconds
+        """
+        if window is None or len(window) < self.hedge_min_samples:
+            return self.hedge_delay
+        return window.percentile(self.hedge_percentile)
+
+
+    def call(self, primary, alternate=None, window=None, on_retry=None):
+        """
+        Call ``primary()``, retrying transient failures.
+
+        Args:
+            primary (callable): makes the request and returns its result
+            alternate (callable): makes the same request against an
+                alternate endpoint, used for the hedged request.  If not
+                given, ``primary`` is used again.
+            window (LatencyWindow): latency samples for this endpoint,
+                updated with each successful call
+            on_retry (callable): called as ``on_retry(exc, attempt)``
+                before each retry, i.e. to count them
+
+        Returns:
+            the result of the first successful call
+
+        Raises:
+            TransientError: if every attempt failed
+        """
+        attempt = 1
+        while True:
+            try:
+                if self.hedge:
+                    return self._call_hedged(primary, alternate or primary, window)
+                return self._call_timed(primary, window)
+
+            except TransientError as e:
+                if attempt >= self.max_attempts:
+                    log.error("Request failed after %d attempts: %s", attempt, e)
+                    raise
+
+                delay = self.backoff(attempt)
+                log.warning("Request failed (attempt %d of %d), retrying in %.2fs: %s",
+                            attempt, self.max_attempts, delay, e)
+                if on_retry is not None:
+                    on_retry(e, attempt)
+                self.sleep(delay)
+                attempt += 1
+
+
+    def _call_timed(self, func, window):
+        # call, recording the latency of a successful call
+
+        start = time.monotonic()
+        result = func()
+        if window is not None:
+            window.add(time.monotonic() - start)
+        return result
+
+
+    def _run(self, future, func, window):
+        # run a request into a future
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._call_timed(func, window))
+        except BaseException as e:
+            future.set_exception(e)
+
+
+    def _start(self, func, window):
+        # the first request, on a thread of its own so it never waits
+        # behind hedges for a worker
+        future = Future()
+        threading.Thread(target=self._run, args=(future, func, window),
+                         name='packagetracker-request', daemon=True).start()
+        return future
+
+
+    def _hedge(self, func, window):
+        # a hedged request on the pool, or None if every worker is busy
+        with self._executor_lock:
+            # a forked child has the executor, but none of its threads
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                    thread_name_prefix='packagetracker-hedge')
+                self._executor_pid = os.getpid()
+                self._hedges = 0
+
+            if self._hedges >= self.hedge_workers:
+                return None
+            self._hedges += 1
+            future = self._executor.submit(self._call_timed, func, window)
+
+        future.add_done_callback(self._hedge_done)
+        return future
+
+
+    def _hedge_done(self, future):
+        with self._executor_lock:
+            self._hedges -= 1
+
+
+    def _call_hedged(self, primary, alternate, window):
+        # send the primary request, and if it's slow, a second one;
+        # return whichever answers successfully first
+
+        pending = {self._start(primary, window)}
+
+        delay = self.hedge_after(window)
+        done, pending = wait(pending, timeout=delay)
+        if not done:
+            hedge = self._hedge(alternate, window)
+            if hedge is None:
+                log.debug("Request slower than %.2fs, not hedged, every hedge worker is busy",
+                          delay)
+            else:
+                log.debug("Request slower than %.2fs, sending hedged request", delay)
+                pending.add(hedge)
+
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    # the loser is left to finish on its own
+                    return future.result()
+                error = future.exception()
+
+            if not pending:
+                raise error
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
@@ -1,19 +1,120 @@
 
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+from ..accounts     import AccountPool
+from ..data         import FULL
+from ..exceptions   import TransientError, Throttled
+from ..metrics      import Metrics
+from ..retry        import LatencyWindow, RetryPolicy
+
+
 class BaseInterface():
     """
     Base class for tracking interfaces
 
+    Interfaces are shared by every thread using a PackageTracker, so
+    ``track()`` must be safe to call concurrently: keep per-request state
+    in local variables, and lock anything cached on the interface.
+    ``identify()`` and ``validate()`` only look at the number, and take no
+    locks.
+
     Args:
         config: ConfigParser object
         testing (bool): True to run in test-only mode, if supported
+        retry_policy (RetryPolicy): how to retry failed requests
+        metrics (Metrics): where to record request stages and retries,
+            see :mod:`packagetracker.metrics`.  A tracker gives its
+            interfaces its own.
+        payload_log (PayloadLog): keeps a sample of requests and responses,
+            see :mod:`packagetracker.logs`.  A tracker gives its interfaces
+            its own.
 
     """
     click_url = "http://invalid_url/{num}"
 
+    # config section with this carrier's accounts, see packagetracker.accounts
+    config_section = None
+
 
-    def __init__(self, config, testing=False):
+    def __init__(self, config, testing=False, retry_policy=None, metrics=None,
+                 payload_log=None):
         self.config = config
         self.testing = testing
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or Metrics()
+        self.payload_log = payload_log
+        # the carrier's name in metrics, set to the shipper name when the
+        # interface is registered
+        self.carrier = self.config_section or type(self).__name__
+        self.latency = LatencyWindow()
+        self.accounts = None
+        if self.config_section:
+            self.accounts = AccountPool(config, self.config_section)
+
+        # each thread's HTTP session, see session
+        self._local = threading.local()
+
+
+    def __getstate__(self):
+        # sessions and account state stay behind, they're rebuilt on use
+        state = self.__dict__.copy()
+        del state['_local']
+        state['accounts'] = None
+        state['metrics'] = state['payload_log'] = None
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self.metrics = Metrics()
+        if self.config_section:
+            self.accounts = AccountPool(self.config, self.config_section)
+
+
+    @property
+    def session(self):
+        """
+        The requests Session for this thread.  Sessions aren't safe to
+        share between threads, so each gets its own, with its own
+        connection pool.  A forked child gets new ones too, rather than
+        sharing the parent's connections.
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.session = requests.Session()
+            local.pid = os.getpid()
+        return local.session
+
+
+    def _config_option(self, option):
+        # an option from the carrier's config section, or None
+        if not self.config_section:
+            return None
+        return self.config.get(self.config_section, option, fallback=None)
+
+
+    def _stage(self, stage):
+        # time a stage of a request, see Metrics.stage()
+        return self.metrics.stage(self.carrier, stage)
+
+
+    def _retried(self, exc, attempt):
+        # RetryPolicy.call()'s on_retry
+        self.metrics.inc('packagetracker_retries_total', carrier=self.carrier)
+
+
+    def _capture(self, num, request, response):
+        # maybe keep a request and its response, see packagetracker.logs.
+        # The request must not include credentials.
+        payload_log = self.payload_log
+        if payload_log is not None and payload_log.sample():
+            payload_log.record(self.carrier, num, request, response)
+
 
     def cleanup_number(self, num):
         """
@@ -40,12 +141,15 @@ class BaseInterface():
         raise NotImplementedError
 
 
-    def track(self, num):
+    def track(self, num, detail=FULL):
         """
         Track a package.
 
         Args:
             num (str): Tracking number
+            detail (str): FULL for the event history, or SUMMARY for just
+                the current status, which is cheaper where the carrier
+                supports it
 
         Raises:
             InvalidTrackingNumber
@@ -66,3 +170,38 @@ class BaseInterface():
             str: a URL
         """
         return self.click_url.format(num=num)
+
+
+    def _http(self, method, url, **kwargs):
+        """
+        Make an HTTP request to the carrier.
+
+        Args:
+            method (str): HTTP method
+            url (str): URL
+
+        Returns:
+            requests.Response
+
+        Raises:
+            Throttled: on a 429 response
+            TransientError: on a connection error, timeout or 5xx response
+        """
+        # errors name only the host, USPS puts the account in the URL
+        host = urlsplit(url).netloc
+
+        kwargs.setdefault('timeout', self.retry_policy.timeout)
+        try:
+            with self._stage('network'):
+                resp = self.session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # and so do requests' own messages
+            raise TransientError("{} from {}".format(type(e).__name__, host)) from None
+
+        if resp.status_code == 429:
+            raise Throttled("HTTP 429 from {}".format(host))
+
+        if resp.status_code >= 500:
+            raise TransientError("HTTP {} from {}".format(resp.status_code, host))
+
+        return resp
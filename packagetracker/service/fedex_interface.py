@@ -1,14 +1,20 @@
+import functools
 import logging
+import threading
 
 from fedex.config import FedexConfig
 from fedex.base_service import FedexError
 from fedex.services.track_service import FedexTrackRequest, FedexInvalidTrackingNumber
 
-from ..data         import TrackingInfo
-from ..exceptions   import TrackFailed, InvalidTrackingNumber
+from ..             import interning
+from ..data         import TrackingInfo, TrackingEvent, FULL, SUMMARY
+from ..dates        import local_time, parse_iso_local
+from ..exceptions   import (TrackFailed, InvalidTrackingNumber, TrackingNotFound,
+                            TransientError, Throttled)
 from ..service      import BaseInterface
+from ..status       import Status
 
-log = logging.getLogger()
+log = logging.getLogger(__name__)
 
 # test numbers from the documentation - note that these have invalid checksums!
 TEST_NUMBERS = (
@@ -34,6 +40,138 @@ TEST_NUMBERS = (
 
 LINKROOT = "https://www.fedex.com/fedextrack/?trknbr={tracknum}"
 
+# normalized status for StatusDetail.Code and event EventType codes;
+# anything else is some flavor of in transit
+STATUS_CODES = {
+    'OC': Status.PRE_TRANSIT,       # order created
+    'OX': Status.PRE_TRANSIT,       # shipment information sent to USPS
+    'PU': Status.PICKED_UP,
+    'PX': Status.PICKED_UP,
+    'OD': Status.OUT_FOR_DELIVERY,
+    'DL': Status.DELIVERED,
+    'DE': Status.EXCEPTION,         # delivery exception
+    'SE': Status.EXCEPTION,         # shipment exception
+    'CD': Status.EXCEPTION,         # clearance delay
+    'DD': Status.EXCEPTION,         # delivery delay
+    'DY': Status.EXCEPTION,         # delay
+    'PD': Status.EXCEPTION,         # pickup delay
+    'HL': Status.EXCEPTION,         # hold at location
+    'RS': Status.RETURNED,          # return to shipper
+    'CA': Status.CANCELLED,
+}
+
+
+def fedex_status(code):
+    """
+    Normalize a FedEx status code.
+
+    Args:
+        code (str): StatusDetail.Code or EventType
+
+    Returns:
+        Status
+    """
+    if not code:
+        return Status.UNKNOWN
+    return STATUS_CODES.get(code, Status.IN_TRANSIT)
+
+
+def soap_http_status(exc):
+    """
+    The HTTP status of a failed SOAP request.  The SOAP client raises a
+    plain ``Exception((status, reason))`` for HTTP errors other than 500.
+
+    Args:
+        exc (Exception)
+
+    Returns:
+        int: the HTTP status, or None if it's not an HTTP error
+    """
+    args = getattr(exc, 'args', ())
+    if len(args) == 1 and isinstance(args[0], tuple) and len(args[0]) == 2:
+        status = args[0][0]
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def fedex_timestamp(rsp, attribute, date_type):
+    """
+    A timestamp from a TrackDetails reply.  Older API versions have
+    attributes like ``ActualDeliveryTimestamp``, newer ones list them in
+    ``DatesOrTimes`` as ISO text.
+
+    Args:
+        rsp: the TrackDetails reply
+        attribute (str): i.e. 'ActualDeliveryTimestamp'
+        date_type (str): the DatesOrTimes type, i.e. 'ACTUAL_DELIVERY'
+
+    Returns:
+        datetime.datetime: in local time, or None if it's not there
+    """
+    value = getattr(rsp, attribute, None)
+    if value is not None:
+        # suds gives these an offset, see packagetracker.dates
+        return local_time(value)
+
+    for entry in getattr(rsp, 'DatesOrTimes', None) or ():
+        if entry.Type == date_type:
+            return parse_iso_local(entry.DateOrTimestamp)
+    return None
+
+
+def express_checksum(num):
+    """
+    Calculate the checksum on a FedEx Express (12 digit) tracking number.
+
+    Args:
+        num: tracking number
+
+    Returns:
+        int: checksum
+    """
+    # the weights were meant to cycle 1, 3, 7, but the validator has always
+    # weighted every digit by 1, so that's what valid numbers look like here
+    check = sum(map(int, num[0:10])) % 11
+    if check == 10:
+        check = 0
+    return check
+
+
+def ground96_checksum(num):
+    """
+    Calculate the checksum on a FedEx Ground "96" tracking number, in the
+    15 or 22 digit form.
+
+    Args:
+        num: tracking number
+
+    Returns:
+        int: checksum, from 1 to 10.  No number with a checksum of 10 is
+        valid.
+    """
+    rev = num[::-1]
+    even = sum(map(int, rev[1:15:2]))
+    odd = sum(map(int, rev[2:15:2]))
+    return 10 - ((even * 3 + odd) % 10)
+
+
+def ssc18_checksum(num):
+    """
+    Calculate the checksum on a FedEx SSC18 (20 digit) tracking number.
+
+    Args:
+        num: tracking number
+
+    Returns:
+        int: checksum, from 1 to 10.  No number with a checksum of 10 is
+        valid.
+    """
+    rev = num[::-1]
+    even = sum(map(int, rev[1:19:2]))
+    odd = sum(map(int, rev[2:19:2]))
+    return 10 - ((even * 3 + odd) % 10)
+
 
 class FedexInterface(BaseInterface):
     """
@@ -41,11 +179,31 @@ class FedexInterface(BaseInterface):
     """
 
     click_url = 'http://www.fedex.com/Tracking?tracknumbers={num}'
+    config_section = 'FedEx'
 
     def __init__(self, *args, **kwargs):
-        self.cfg = None
+        # account name -> FedexConfig
+        self.cfg = {}
+        self._cfg_lock = threading.Lock()
         super().__init__(*args, **kwargs)
 
+        # the SOAP endpoint, if not the one in the WSDL, i.e. a stand-in
+        # server, see packagetracker.testing.servers
+        self.api_url = self._config_option('api_url')
+
+
+    def __getstate__(self):
+        # suds configs don't pickle, they're rebuilt on use
+        state = super().__getstate__()
+        state['cfg'] = {}
+        del state['_cfg_lock']
+        return state
+
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._cfg_lock = threading.Lock()
+
 
     def identify(self, num):
         """
@@ -60,12 +218,14 @@ class FedexInterface(BaseInterface):
         return num.isdigit() and (len(num) in (12, 15, 20, 22))
 
 
-    def track(self, num):
+    def track(self, num, detail=FULL):
         """
         Track a FedEx package.
 
         Args:
             num (str, int): tracking number
+            detail (str): FULL for the event history, or SUMMARY for just
+                the current status
 
         Raises:
             InvalidTrackingNumber
@@ -78,43 +238,82 @@ class FedexInterface(BaseInterface):
         #if not self.validate(num):
         #    raise InvalidTrackingNumber()
 
-        track = FedexTrackRequest(self._get_cfg())
+        response = self.retry_policy.call(functools.partial(self._send_request, num, detail),
+                                          window=self.latency, on_retry=self._retried)
 
-        # Track by Tracking Number
-        track.SelectionDetails.PackageIdentifier.Type = 'TRACKING_NUMBER_OR_DOORTAG'
-        track.SelectionDetails.PackageIdentifier.Value = num
-        #del track.SelectionDetails.OperatingCompany
+        #from fedex.tools.conversion import sobject_to_json
+        #print(sobject_to_json(response))
+
+        with self._stage('parse'):
+            return self._parse_response(response.CompletedTrackDetails[0].TrackDetails[0],
+                                        num, detail)
+
+
+    def _send_request(self, num, detail=FULL):
+        # build and send a tracking request, returns the response.
+        # A new request object each time, since hedged requests may
+        # be in flight at the same time.
 
-        track.IncludeDetailedScans = True
+        account = self.accounts.acquire()
+        with self._stage('build'):
+            track = FedexTrackRequest(self._get_cfg(account))
+            track.client.set_options(timeout=self.retry_policy.timeout)
+            if self.api_url:
+                track.client.set_options(location=self.api_url)
+
+            # Track by Tracking Number
+            track.SelectionDetails.PackageIdentifier.Type = 'TRACKING_NUMBER_OR_DOORTAG'
+            track.SelectionDetails.PackageIdentifier.Value = num
+            #del track.SelectionDetails.OperatingCompany
+
+            track.IncludeDetailedScans = (detail != SUMMARY)
 
         # Fires off the request, sets the 'response' attribute on the object.
+        # The SOAP client decodes the response too, so that's all 'network'.
         try:
-            track.send_request()
+            with self._stage('network'):
+                track.send_request()
         except FedexInvalidTrackingNumber as e:
             raise InvalidTrackingNumber(e)
         except FedexError as e:
             raise TrackFailed(e)
-
-        #from fedex.tools.conversion import sobject_to_json
-        #print(sobject_to_json(track.response))
-
-        return self._parse_response(track.response.CompletedTrackDetails[0].TrackDetails[0], num)
-
-    def _parse_response(self, rsp, tracking_number):
+        except OSError as e:
+            # connection refused, timeouts, etc.
+            raise TransientError(e)
+        except Exception as e:
+            status = soap_http_status(e)
+            if status == 429:
+                self.accounts.throttle(account)
+                raise Throttled("HTTP 429 from FedEx")
+            if status is not None and status >= 500:
+                raise TransientError("HTTP {} from FedEx".format(status))
+            raise
+
+        self._capture(num, {'TrackingNumber': num, 'IncludeDetailedScans': track.IncludeDetailedScans},
+                      track.response)
+        return track.response
+
+    def _parse_response(self, rsp, tracking_number, detail=FULL):
         """Parse the track response and return a TrackingInfo object"""
 
         if hasattr(rsp, 'Notification'):
             if rsp.Notification.Severity == 'ERROR':
-                raise TrackFailed('{}: {}'.format(
+                # 9040 is "no information for the following shipments"
+                if rsp.Notification.Code == '9040':
+                    exc = TrackingNotFound
+                else:
+                    exc = TrackFailed
+                raise exc('{}: {}'.format(
                     rsp.Notification.Code,
                     rsp.Notification.LocalizedMessage))
 
         status = 'In transit'
+        status_code = fedex_status(getattr(getattr(rsp, 'StatusDetail', None), 'Code', None))
 
         # test status code, return actual delivery time if package
         # was delivered, otherwise estimated target time
-        if hasattr(rsp, 'StatusDetail.Code') and rsp.StatusDetail.Code == 'DL':
-            delivery_date = rsp.ActualDeliveryTimestamp
+        if status_code == Status.DELIVERED:
+            delivery_date = fedex_timestamp(rsp, 'ActualDeliveryTimestamp', 'ACTUAL_DELIVERY')
 
             # this may not be present
             try:
@@ -123,11 +322,11 @@ class FedexInterface(BaseInterface):
                 delivery_detail = None
 
             last_update = delivery_date
-            location = ','.join((
-                                rsp.ActualDeliveryAddress.City,
-                                rsp.ActualDeliveryAddress.StateOrProvinceCode,
-                                rsp.ActualDeliveryAddress.CountryCode,
-                                ))
+
+            # the delivery address is optional, the last scan will do
+            location = self._format_address(getattr(rsp, 'ActualDeliveryAddress', None))
+            if location is None and getattr(rsp, 'Events', None):
+                location = self._getTrackingLocation(rsp.Events[0])
             status = 'Delivered'
 
         else:
@@ -135,17 +334,15 @@ class FedexInterface(BaseInterface):
             last_update = None
             location = None
 
-            try:
-                delivery_date = rsp.EstimatedDeliveryTimestamp
-            except AttributeError:
-                delivery_date = None
+            delivery_date = fedex_timestamp(rsp, 'EstimatedDeliveryTimestamp',
+                                            'ESTIMATED_DELIVERY')
 
             if hasattr(rsp, 'Events'):
-                last_update = rsp.Events[0].Timestamp
+                last_update = local_time(rsp.Events[0].Timestamp)
                 location = self._getTrackingLocation(rsp.Events[0])
 
             if hasattr(rsp, 'ServiceCommitMessage'):
-                status = rsp.ServiceCommitMessage
+                status = interning.intern(rsp.ServiceCommitMessage)
 
 
         # a new tracking info object
@@ -156,67 +353,89 @@ class FedexInterface(BaseInterface):
                     location        = location,
                     delivery_date   = delivery_date,
                     delivery_detail = delivery_detail,
-                    service         = rsp.Service.Type,
+                    service         = interning.intern(rsp.Service.Type),
                     link            = LINKROOT.format(tracknum = tracking_number),
+                    detail          = detail,
+                    status_code     = status_code,
                 )
 
-        # now add the events
-        if hasattr(rsp, 'Events'):
-            for e in rsp.Events:
-                trackinfo.add_event(
-                    location = self._getTrackingLocation(e),
-                    date     = e.Timestamp,
-                    detail   = e.EventDescription,
-                )
+        # now the events, which are built only if they're used
+        if detail != SUMMARY and hasattr(rsp, 'Events'):
+            trackinfo.set_event_source(rsp.Events, self._build_event)
 
         return trackinfo
 
 
+    def _build_event(self, e):
+        """Returns a TrackingEvent for a given event."""
+        return TrackingEvent(
+            location = self._getTrackingLocation(e),
+            date     = local_time(e.Timestamp),
+            detail   = interning.intern(e.EventDescription),
+            status_code = fedex_status(getattr(e, 'EventType', None)),
+        )
+
+
     def _getTrackingLocation(self, e):
         """Returns a nicely formatted location for a given event."""
+        return self._format_address(getattr(e, 'Address', None))
+
+
+    def _format_address(self, address):
+        """Returns a nicely formatted location for an address, or None."""
         try:
-            return ','.join((
-                            e.Address.City,
-                            e.Address.StateOrProvinceCode,
-                            e.Address.CountryCode,
+            return interning.join((
+                            address.City,
+                            address.StateOrProvinceCode,
+                            address.CountryCode,
                             ))
         except Exception:
             return None
 
 
-    def _get_cfg(self):
+    def _get_cfg(self, account):
         """
-        Makes and returns a FedexConfig object from the packagetrack
-        configuration.  Caches it, so it doesn't create each time.
+        Makes and returns a FedexConfig object for the given account from
+        the packagetrack configuration.  Caches them, so it doesn't create
+        each time.
         """
 
         # got one cached, so just return it
-        if self.cfg:
-            return self.cfg
-
-        self.cfg = FedexConfig(
-            key                 = self.config.get('FedEx', 'key'),
-            password            = self.config.get('FedEx', 'password'),
-            account_number      = self.config.get('FedEx', 'account_number'),
-            meter_number        = self.config.get('FedEx', 'meter_number'),
+        cfg = self.cfg.get(account.name)
+        if cfg is not None:
+            return cfg
+
+        with self._cfg_lock:
+            if account.name not in self.cfg:
+                self.cfg[account.name] = self._make_cfg(account)
+            return self.cfg[account.name]
+
+
+    def _make_cfg(self, account):
+        # make a FedexConfig for an account
+        cfg = FedexConfig(
+            key                 = account.get('key'),
+            password            = account.get('password'),
+            account_number      = account.get('account_number'),
+            meter_number        = account.get('meter_number'),
             use_test_server     = False,
             express_region_code = 'US',
         )
 
         # these are optional, and afaik, not really used for tracking
         # at all, but you can still set them, so....
-        if self.config.has_option('FedEx', 'express_region_code'):
-            self.cfg.express_region_code = self.config.get('FedEx', 'express_region_code')
+        if account.has_option('express_region_code'):
+            cfg.express_region_code = account.get('express_region_code')
 
-        if self.config.has_option('FedEx', 'integrator_id'):
-            self.cfg.integrator_id = self.config.get('FedEx', 'integrator_id')
+        if account.has_option('integrator_id'):
+            cfg.integrator_id = account.get('integrator_id')
 
         if self.testing:
-            self.cfg.use_test_server = True
-        elif self.config.has_option('FedEx', 'use_test_server'):
-            self.cfg.use_test_server = self.config.getboolean('FedEx', 'use_test_server')
+            cfg.use_test_server = True
+        elif account.has_option('use_test_server'):
+            cfg.use_test_server = account.getboolean('use_test_server')
 
-        return self.cfg
+        return cfg
 
 
     def validate(self, num):
@@ -281,17 +500,7 @@ class FedexInterface(BaseInterface):
             log.info("Tracking number %s is a test number, skipping check", num)
             return True
 
-        rev = num[::-1]
-
-        eventotal = 0
-        oddtotal = 0
-        for i in range(1, 15):
-            if i % 2:
-                eventotal += int(rev[i])
-            else:
-                oddtotal += int(rev[i])
-
-        checksum = 10 - ((eventotal * 3 + oddtotal) % 10)
+        checksum = ground96_checksum(num)
         test = int(num[-1:])
         # compare with the checksum digit, which is the last digit
         log.debug("ground96 %s: checksum: %s should be %s", num, checksum, test)
@@ -313,17 +522,7 @@ class FedexInterface(BaseInterface):
             log.info("Tracking number %s is a test number, skipping check", num)
             return True
 
-        rev = num[::-1]
-
-        eventotal = 0
-        oddtotal = 0
-        for i in range(1, 19):
-            if i % 2:
-                eventotal += int(rev[i])
-            else:
-                oddtotal += int(rev[i])
-
-        check = 10 - ((eventotal * 3 + oddtotal) % 10)
+        check = ssc18_checksum(num)
 
         # compare with the checksum digit, which is the last digit
         return check == int(num[-1:])
@@ -343,25 +542,7 @@ class FedexInterface(BaseInterface):
             log.info("Tracking number %s is a test number, skipping check", num)
             return True
 
-        basenum = num[0:10]
-
-        sums = []
-        mult = 1
-        total = 0
-        for digit in basenum[::-1]:
-            sums.append(int(digit) * mult)
-            total = total + (int(digit) * mult)
-
-            if mult == 1:
-                mult = 3
-            if mult == 3:
-                mult = 7
-            if mult == 7:
-                mult = 1
-
-        check = total % 11
-        if check == 10:
-            check = 0
+        check = express_checksum(num)
 
         # compare with the checksum digit, which is the last digit
         return check == int(num[-1:])
@@ -1,12 +1,15 @@
 
+import functools
 import json
 import logging
-import requests
-from datetime import datetime
+from datetime import datetime, time
 
-from ..data         import TrackingInfo
-from ..exceptions   import TrackFailed, InvalidTrackingNumber
+from ..             import interning
+from ..data         import TrackingInfo, TrackingEvent, FULL, SUMMARY
+from ..dates        import parse_ymd, parse_ymd_hms
+from ..exceptions   import TrackFailed, InvalidTrackingNumber, TrackingNotFound, Throttled
 from ..service      import BaseInterface
+from ..status       import Status
 
 # test numbers from the documentation - note that these have invalid checksums!
 TEST_NUMBERS = [
@@ -27,9 +30,18 @@ ACTIVITY_STATUS_TYPE = {
     'P': 'Pickup',
     'M': 'Manifest Pickup',
 }
+
+# normalized status for each activity status type
+ACTIVITY_STATUS_CODE = {
+    'I': Status.IN_TRANSIT,
+    'D': Status.DELIVERED,
+    'X': Status.EXCEPTION,
+    'P': Status.PICKED_UP,
+    'M': Status.PRE_TRANSIT,
+}
 LINKROOT = "https://www.ups.com/track?loc=en_US&requester=QUIC&tracknum={tracknum}/trackdetails"
 
-log = logging.getLogger()
+log = logging.getLogger(__name__)
 
 
 class UPSInterface(BaseInterface):
@@ -38,6 +50,7 @@ class UPSInterface(BaseInterface):
     """
 
     click_url = 'http://wwwapps.ups.com/WebTracking/processInputRequest?TypeOfInquiryNumber=T&InquiryNumber1={num}'
+    config_section = 'UPS'
 
     _api_urls = {
         "test":         'https://wwwcie.ups.com/rest/Track',
@@ -49,14 +62,17 @@ class UPSInterface(BaseInterface):
         '151018': InvalidTrackingNumber,
         '151022': InvalidTrackingNumber,
         '154010': InvalidTrackingNumber,
-        '151044': TrackFailed,
+        '151044': TrackingNotFound,
     }
 
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        if self.testing:
+        if self._config_option('api_url'):
+            # i.e. a stand-in server, see packagetracker.testing.servers
+            self.api_url = self._config_option('api_url')
+        elif self.testing:
             self.api_url = self._api_urls['test']
         else:
             self.api_url = self._api_urls['production']
@@ -105,55 +121,70 @@ class UPSInterface(BaseInterface):
         return (test == checksum)
 
 
-    def _build_access_request(self):
+    def _build_access_request(self, account):
         """Build the access portion of the request"""
 
         return {
             'UsernameToken': {
-                'Username': self.config.get('UPS', 'user_id'),
-                'Password': self.config.get('UPS', 'password'),
+                'Username': account.get('user_id'),
+                'Password': account.get('password'),
             },
             'ServiceAccessToken': {
-                'AccessLicenseNumber': self.config.get('UPS', 'license_number'),
+                'AccessLicenseNumber': account.get('license_number'),
             },
         }
 
 
-    def _build_track_request(self, tracking_number):
-        # Build the track portion of the request
+    def _build_track_request(self, tracking_number, detail=FULL):
+        # Build the track portion of the request.
+        # RequestOption 1 is all activity, 0 is just the last one
 
         return {
             'Request': {
                 'TransactionReference': {
                     'CustomerContext': 'track request',
                 },
-                'RequestOption': '1',
+                'RequestOption': '0' if detail == SUMMARY else '1',
             },
             'InquiryNumber': tracking_number
         }
 
 
-    def _build_request(self, tracking_number):
+    def _build_request(self, tracking_number, account, detail=FULL):
         # build the full tracking request
 
         return {
-            'UPSSecurity': self._build_access_request(),
-            'TrackRequest': self._build_track_request(tracking_number),
+            'UPSSecurity': self._build_access_request(account),
+            'TrackRequest': self._build_track_request(tracking_number, detail),
         }
 
 
-    def _send_request(self, tracking_number):
+    def _send_request(self, tracking_number, detail=FULL):
         # make the tracking request
 
-        body = self._build_request(tracking_number)
-        log.debug('Request: %s', json.dumps(body, indent=2))
+        account = self.accounts.acquire()
+        with self._stage('build'):
+            request = self._build_request(tracking_number, account, detail)
+            body = json.dumps(request)
+
+        # payloads are formatted only if they're logged, and without the
+        # credentials
+        context = {'carrier': self.carrier, 'tracking_number': tracking_number}
+        log.debug('Request: %s', request['TrackRequest'], extra=context)
 
         headers = {
             'Content-Type': 'application/json',
         }
-        resp = requests.post(self.api_url, data=json.dumps(body), headers=headers)
-        log.debug('Response: %s', resp.json())
-        data = resp.json()
+        try:
+            resp = self._http('POST', self.api_url, data=body, headers=headers)
+        except Throttled:
+            self.accounts.throttle(account)
+            raise
+
+        with self._stage('decode'):
+            data = resp.json()
+        log.debug('Response: %s', data, extra=context)
+        self._capture(tracking_number, request['TrackRequest'], data)
 
         # check for fatal errors now
         if 'Fault' in data:
@@ -179,7 +210,7 @@ class UPSInterface(BaseInterface):
             raise TrackFailed(error_msg)
 
 
-    def _parse_response(self, rsp, tracking_number):
+    def _parse_response(self, rsp, tracking_number, detail=FULL):
         # parse a good response
 
         root = rsp['TrackResponse']
@@ -198,6 +229,7 @@ class UPSInterface(BaseInterface):
         service_description = root['Shipment']['Service']['Description']
         if not service_description.startswith('UPS'):
             service_description = 'UPS ' + service_description
+        service_description = interning.intern(service_description)
 
 
         package = root['Shipment']['Package']
@@ -210,12 +242,11 @@ class UPSInterface(BaseInterface):
         activity = package['Activity'][0]
 
         # here's the status code, inside the Activity block
-        status = activity['Status']['Description']
+        status = interning.intern(activity['Status']['Description'])
         status_code = activity['Status']['Code']
+        normalized_status = activity_status(activity['Status'])
 
-        last_update_date = datetime.strptime(activity['Date'], "%Y%m%d").date()
-        last_update_time = datetime.strptime(activity['Time'], "%H%M%S").time()
-        last_update = datetime.combine(last_update_date, last_update_time)
+        last_update = parse_ymd_hms(activity['Date'], activity['Time'])
 
         # 031 = BASIC service, delivered to local P.O., so we use the
         # ShipTo address to get the city, state, country
@@ -225,9 +256,9 @@ class UPSInterface(BaseInterface):
         # note this also has no SDD, so we just use the last update
         if service_code == '031':
             loc = root['Shipment']['ShipTo']['Address']
-            last_location = ','.join((loc['City'],
-                                      loc['StateProvinceCode'],
-                                      loc['CountryCode']))
+            last_location = interning.join((loc['City'],
+                                            loc['StateProvinceCode'],
+                                            loc['CountryCode']))
             delivery_date = last_update
 
         else:
@@ -243,7 +274,7 @@ class UPSInterface(BaseInterface):
                 for key in ('City', 'StateProvinceCode', 'CountryCode'):
                     if key in loc:
                         locvals.append(loc[key])
-                last_location = ','.join(locvals)
+                last_location = interning.join(tuple(locvals))
 
             # Delivery date is the last_update if delivered, otherwise
             # the estimated delivery date
@@ -251,18 +282,18 @@ class UPSInterface(BaseInterface):
                 delivery_date = last_update
 
             elif 'RescheduledDeliveryDate' in package:
-                delivery_date = datetime.strptime(
-                    package['RescheduledDeliveryDate'], "%Y%m%d")
+                delivery_date = datetime.combine(
+                    parse_ymd(package['RescheduledDeliveryDate']), time())
             elif 'ScheduledDeliveryDate' in root['Shipment']:
-                delivery_date = datetime.strptime(
-                    root['Shipment']['ScheduledDeliveryDate'], "%Y%m%d")
+                delivery_date = datetime.combine(
+                    parse_ymd(root['Shipment']['ScheduledDeliveryDate']), time())
             else:
                 delivery_date = None
 
 
         # Delivery detail may not always be available either
         if 'Description' in activity['ActivityLocation']:
-            delivery_detail = activity['ActivityLocation']['Description']
+            delivery_detail = interning.intern(activity['ActivityLocation']['Description'])
         else:
             delivery_detail = status
 
@@ -275,38 +306,44 @@ class UPSInterface(BaseInterface):
             delivery_detail = delivery_detail,
             service         = service_description,
             link            = LINKROOT.format(tracknum = tracking_number),
+            detail          = detail,
+            status_code     = normalized_status,
         )
 
+        # events are built only if they're used
+        if detail != SUMMARY:
+            trackinfo.set_event_source(package['Activity'], self._build_event)
 
-        # add a single event, UPS doesn't seem to support multiple?
+        return trackinfo
 
-        for e in package['Activity']:
-            location = None
-            if 'ActivityLocation' in e:
-                loc = e['ActivityLocation']['Address']
-                if 'City' in loc:
-                    location = ','.join((loc['City'],
-                                        loc['StateProvinceCode'],
-                                        loc['CountryCode']))
 
-            edate = datetime.strptime(e['Date'], "%Y%m%d").date()
-            etime = datetime.strptime(e['Time'], "%H%M%S").time()
-            timestamp = datetime.combine(edate, etime)
-            trackinfo.add_event(
-                location = location,
-                detail = e['Status']['Description'],
-                date = timestamp,
-            )
+    def _build_event(self, e):
+        # make a TrackingEvent from an Activity block
 
-        return trackinfo
+        location = None
+        if 'ActivityLocation' in e:
+            loc = e['ActivityLocation']['Address']
+            if 'City' in loc:
+                location = interning.join((loc['City'],
+                                           loc['StateProvinceCode'],
+                                           loc['CountryCode']))
+
+        return TrackingEvent(
+            location = location,
+            detail = interning.intern(e['Status']['Description']),
+            date = parse_ymd_hms(e['Date'], e['Time']),
+            status_code = activity_status(e['Status']),
+        )
 
 
-    def track(self, num):
+    def track(self, num, detail=FULL):
         """
         Track a UPS package by number
 
         Args:
             num: UPS tracking number
+            detail (str): FULL for the event history, or SUMMARY for just
+                the last activity
 
         Returns:
             str: tracking info
@@ -320,8 +357,28 @@ class UPSInterface(BaseInterface):
             log.debug("Invalid tracking number: %s", num)
             raise InvalidTrackingNumber(num)
 
-        resp = self._send_request(num)
-        return self._parse_response(resp, num)
+        resp = self.retry_policy.call(functools.partial(self._send_request, num, detail),
+                                      window=self.latency, on_retry=self._retried)
+        with self._stage('parse'):
+            return self._parse_response(resp, num, detail)
+
+
+def activity_status(status):
+    """
+    Normalize an activity's status.
+
+    Args:
+        status (dict): the activity's Status block
+
+    Returns:
+        Status
+    """
+    code = ACTIVITY_STATUS_CODE.get(status.get('Type') or status.get('Code'), Status.UNKNOWN)
+
+    # there's no type for this, it's just in transit
+    if code == Status.IN_TRANSIT and 'OUT FOR DELIVERY' in status.get('Description', '').upper():
+        return Status.OUT_FOR_DELIVERY
+    return code
 
 
 def calculate_checksum(num):
@@ -1,14 +1,42 @@
+import functools
 import logging
-import requests
 from urllib.parse import quote as urlquote
 from datetime import datetime
 
-from ..data         import TrackingInfo
+from ..             import interning
+from ..data         import TrackingInfo, TrackingEvent, FULL, SUMMARY
+from ..dates        import parse_month_day_year, parse_clock_time
 from ..service      import BaseInterface
-from ..exceptions   import TrackFailed, InvalidTrackingNumber
+from ..status       import Status
+from ..exceptions   import TrackFailed, InvalidTrackingNumber, TrackingNotFound, Throttled
 from ..xml_dict     import xml_to_dict
 
-log = logging.getLogger()
+log = logging.getLogger(__name__)
+
+# normalized status for the event codes we're sure of
+EVENT_CODES = {
+    'MA': Status.PRE_TRANSIT,       # pre-shipment info sent to USPS
+    'GX': Status.CANCELLED,         # shipping label cancelled
+    '03': Status.PICKED_UP,         # accepted at USPS origin facility
+    'OA': Status.PICKED_UP,         # accepted at USPS origin facility
+    'OF': Status.OUT_FOR_DELIVERY,
+    '01': Status.DELIVERED,
+    '09': Status.RETURNED,          # return to sender
+}
+
+# otherwise, look at the event text; first match wins
+EVENT_TEXT = (
+    ('DELIVERED',               Status.DELIVERED),
+    ('OUT FOR DELIVERY',        Status.OUT_FOR_DELIVERY),
+    ('RETURN TO SENDER',        Status.RETURNED),
+    ('PRE-SHIPMENT',            Status.PRE_TRANSIT),
+    ('LABEL CREATED',           Status.PRE_TRANSIT),
+    ('ACCEPT',                  Status.PICKED_UP),
+    ('PICKED UP',               Status.PICKED_UP),
+    ('NOTICE LEFT',             Status.EXCEPTION),
+    ('UNDELIVERABLE',           Status.EXCEPTION),
+    ('ALERT',                   Status.EXCEPTION),
+)
 
 
 class USPSInterface(BaseInterface):
@@ -17,6 +45,7 @@ class USPSInterface(BaseInterface):
     """
 
     click_url = 'http://trkcnfrm1.smi.usps.com/PTSInternetWeb/InterLabelInquiry.do?origTrackNum={num}'
+    config_section = 'USPS'
 
     _api_urls = {
         'secure_test': 'https://secure.shippingapis.com/ShippingAPITest.dll?API=TrackV2&XML=',
@@ -39,10 +68,16 @@ class USPSInterface(BaseInterface):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        if self.testing:
+        if self._config_option('api_url'):
+            # i.e. a stand-in server, see packagetracker.testing.servers
+            self.api_url = self._config_option('api_url')
+            self.alternate_url = self._config_option('alternate_url') or self.api_url
+        elif self.testing:
             self.api_url = self._api_urls['test']
+            self.alternate_url = self._api_urls['secure_test']
         else:
             self.api_url = self._api_urls['production']
+            self.alternate_url = self._api_urls['secure']
 
 
     def identify(self, num):
@@ -100,12 +135,15 @@ class USPSInterface(BaseInterface):
         return True
 
 
-    def track(self, num):
+    def track(self, num, detail=FULL):
         """
         Track a USPS package.
 
         Args:
             num (str): Tracking number
+            detail (str): FULL for the event history, or SUMMARY for just
+                the current status.  USPS always sends the history, but
+                it isn't parsed for SUMMARY.
 
         Raises:
             InvalidTrackingNumber
@@ -115,22 +153,31 @@ class USPSInterface(BaseInterface):
             log.debug("Invalid tracking number: %s", num)
             raise InvalidTrackingNumber(num)
 
-        resp = self._send_request(num)
-        return self._parse_response(resp, num)
+        # the secure endpoint serves the same data, so it's a fine
+        # place to send a hedged request
+        resp = self.retry_policy.call(
+                    functools.partial(self._send_request, num),
+                    alternate = functools.partial(self._send_request, num,
+                                                  baseurl=self.alternate_url),
+                    window = self.latency,
+                    on_retry = self._retried)
+        with self._stage('parse'):
+            return self._parse_response(resp, num, detail)
 
 
-    def _build_request(self, num):
+    def _build_request(self, num, account):
         # Build a request
 
         return '<TrackFieldRequest USERID="%s"><TrackID ID="%s"/></TrackFieldRequest>' % (
-                self.config.get('USPS', 'userid'), num)
+                account.get('userid'), num)
 
 
-    def _parse_response(self, raw, num):
+    def _parse_response(self, raw, num, detail=FULL):
         # parse the response, this is all XML.
 
-        log.debug(raw)
-        rsp = xml_to_dict(raw)
+        log.debug('Response: %s', raw, extra={'carrier': self.carrier, 'tracking_number': num})
+        with self._stage('decode'):
+            rsp = xml_to_dict(raw)
 
         # this is a system error
         if 'Error' in rsp:
@@ -140,7 +187,7 @@ class USPSInterface(BaseInterface):
         # this is a result with an error, like "no such package"
         if 'Error' in rsp['TrackResponse']['TrackInfo']:
             error = rsp['TrackResponse']['TrackInfo']['Error']['Description']
-            raise TrackFailed(error)
+            raise TrackingNotFound(error)
 
         # make sure the events list is a list
         # note that sometimes there's no TrackDetail
@@ -155,7 +202,9 @@ class USPSInterface(BaseInterface):
         last_location = self._getTrackingLocation(summary)
 
         # status is the first event's status
-        status = summary['Event']
+        status = interning.intern(summary['Event'])
+
+        status_code = usps_status(summary)
 
         # USPS doesn't return this, so we work it out from the tracking number
         service_code = num[0:2]
@@ -169,38 +218,57 @@ class USPSInterface(BaseInterface):
                             location        = last_location,
                             delivery_detail = None,
                             service         = service_description,
+                            detail          = detail,
+                            status_code     = status_code,
                     )
 
+        if detail == SUMMARY:
+            return trackinfo
+
         # add the last event if delivered, USPS doesn't duplicate
         # the final event in the event log, but we want it there
-        if status == 'DELIVERED':
-            trackinfo.add_event(
-                location = last_location,
-                detail = status,
-                date = last_update,
-            )
+        if status_code == Status.DELIVERED:
+            events = [summary] + events
 
-        for e in events:
-            trackinfo.add_event(
-                location = self._getTrackingLocation(e),
-                date     = self._getTrackingDate(e),
-                detail   = e['Event'],
-            )
+        # events are built only if they're used
+        trackinfo.set_event_source(events, self._build_event)
 
         return trackinfo
 
 
-    def _send_request(self, num):
+    def _build_event(self, e):
+        """Returns a TrackingEvent for the given <TrackDetail> or
+        <TrackSummary> node"""
+
+        return TrackingEvent(
+            location = self._getTrackingLocation(e),
+            date     = self._getTrackingDate(e),
+            detail   = interning.intern(e['Event']),
+            status_code = usps_status(e),
+        )
+
+
+    def _send_request(self, num, baseurl=None):
         # Send the right request
 
         # pick the USPS API server, if in the config file
-        if self.config.has_option('USPS', 'server'):
-            baseurl = self._api_urls[self.config.get('USPS', 'server')]
-        else:
-            baseurl = self.api_url
-
-        url = "%s%s" % (baseurl, urlquote(self._build_request(num)))
-        resp = requests.get(url)
+        if baseurl is None:
+            if self.accounts.has_option('server') and not self.accounts.has_option('api_url'):
+                baseurl = self._api_urls[self.accounts.get('server')]
+            else:
+                baseurl = self.api_url
+
+        account = self.accounts.acquire()
+        with self._stage('build'):
+            url = "%s%s" % (baseurl, urlquote(self._build_request(num, account)))
+        try:
+            resp = self._http('GET', url)
+        except Throttled:
+            self.accounts.throttle(account)
+            raise
+
+        # the request has the user ID in it, so just the number is kept
+        self._capture(num, {'TrackID': num}, resp.text)
         return resp.text
 
 
@@ -210,12 +278,12 @@ class USPSInterface(BaseInterface):
 
         if node.get('EventTime') and node.get('EventDate'):
             return datetime.combine(
-                        datetime.strptime(node['EventDate'], '%B %d, %Y').date(),
-                        datetime.strptime(node['EventTime'], '%I:%M %p').time())
+                        parse_month_day_year(node['EventDate']),
+                        parse_clock_time(node['EventTime']))
 
         # in some cases, there's no time, like in "shipping info received"
         elif node.get('EventDate'):
-            return datetime.strptime(node['EventDate'], '%B %d, %Y').date()
+            return parse_month_day_year(node['EventDate'])
 
         # in some cases... nothing!
 
@@ -224,13 +292,37 @@ class USPSInterface(BaseInterface):
         """Returns a location given a node that has
             EventCity, EventState, EventCountry elements"""
 
-        return ','.join((
+        return interning.join((
                 node['EventCity'],
                 node['EventState'],
                 node['EventCountry'] or 'US'
         ))
 
 
+def usps_status(node):
+    """
+    Normalize the status of a <TrackSummary> or <TrackDetail> node.
+
+    Args:
+        node (dict): the node
+
+    Returns:
+        Status
+    """
+    code = EVENT_CODES.get(node.get('EventCode'))
+    if code is not None:
+        return code
+
+    text = (node.get('Event') or '').upper()
+    if not text:
+        return Status.UNKNOWN
+
+    for match, code in EVENT_TEXT:
+        if match in text:
+            return code
+    return Status.IN_TRANSIT
+
+
 def calculate_checksum(num):
     """
     Calculate the checksum on a USPS tracking number.
@@ -0,0 +1,36 @@
+"""
+Normalized tracking status codes.
+
+Each carrier describes status its own way, in free text and in its own
+codes.  The interfaces translate their carrier's native codes to a
+:class:`Status`, available as ``TrackingInfo.status_code`` and
+``TrackingEvent.status_code``, so results from every carrier can be
+compared, stored compactly, and filtered quickly.  The carrier's own text
+is still available as ``status``.
+"""
+import enum
+
+
+class Status(enum.IntEnum):
+    """A carrier-independent tracking status."""
+
+    UNKNOWN = 0
+    PRE_TRANSIT = 1         # label created, carrier has shipment info
+    PICKED_UP = 2
+    IN_TRANSIT = 3
+    OUT_FOR_DELIVERY = 4
+    DELIVERED = 5
+    EXCEPTION = 6           # delayed, undeliverable, held, etc.
+    RETURNED = 7            # returned to the shipper
+    CANCELLED = 8
+
+    @property
+    def is_terminal(self):
+        """
+        Returns:
+            bool: True if this status won't change any more.
+        """
+        return self in TERMINAL
+
+
+TERMINAL = frozenset((Status.DELIVERED, Status.RETURNED, Status.CANCELLED))
@@ -0,0 +1,375 @@
+"""
+A local SQLite store of shipments.
+
+Keeping a fleet's latest tracking results in SQLite, rather than as
+pickled :class:`~packagetracker.data.TrackingInfo` objects, means
+questions like "all FedEx in transit with an ETA today" or "everything
+not updated in 48 hours" are indexed queries instead of a scan::
+
+    >>> store = ShipmentStore('~/.cache/packagetrack.db')
+    >>> tracker = PackageTracker(store=store)
+    >>> tracker.track_many(numbers)
+    >>> store.due_on(datetime.date.today(), shipper='FedEx')
+    >>> store.stale(datetime.timedelta(hours=48))
+
+When a tracker has a store, every ``track()`` result is saved to it, and
+``track_many()`` saves its results in a single transaction.
+
+Queries return :class:`Shipment` and :class:`Event` rows, which are plain
+named tuples.
+"""
+import collections
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .data   import TrackingInfo, TrackingEvent, SUMMARY
+from .status import Status, TERMINAL
+
+log = logging.getLogger(__name__)
+
+Shipment = collections.namedtuple('Shipment', (
+    'tracking_number',
+    'shipper',
+    'status',
+    'status_code',
+    'delivery_date',
+    'last_update',
+    'location',
+    'service',
+    'delivery_detail',
+    'link',
+    'checked',          # when we last tracked it, a time.time() timestamp
+))
+
+Event = collections.namedtuple('Event', ('date', 'location', 'detail', 'status_code'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shipments (
+    tracking_number TEXT PRIMARY KEY,
+    shipper         TEXT NOT NULL,
+    status          TEXT,
+    status_code     INTEGER NOT NULL,
+    delivery_date   TEXT,
+    last_update     TEXT,
+    location        TEXT,
+    service         TEXT,
+    delivery_detail TEXT,
+    link            TEXT,
+    checked         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shipments_shipper ON shipments (shipper, status_code);
+CREATE INDEX IF NOT EXISTS shipments_status ON shipments (status_code);
+CREATE INDEX IF NOT EXISTS shipments_delivery_date ON shipments (delivery_date);
+CREATE INDEX IF NOT EXISTS shipments_last_update ON shipments (last_update);
+
+CREATE TABLE IF NOT EXISTS events (
+    tracking_number TEXT NOT NULL,
+    seq             INTEGER NOT NULL,
+    date            TEXT,
+    location        TEXT,
+    detail          TEXT,
+    status_code     INTEGER NOT NULL,
+    PRIMARY KEY (tracking_number, seq)
+);
+"""
+
+UPSERT = """
+INSERT OR REPLACE INTO shipments
+    (tracking_number, shipper, status, status_code, delivery_date, last_update,
+     location, service, delivery_detail, link, checked)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+COLUMNS = ', '.join(Shipment._fields)
+
+# dates are stored as ISO text, which sorts (and so compares) correctly
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def to_text(value):
+    """
+    Args:
+        value (datetime.date): a date or datetime, or None
+
+    Returns:
+        str: ISO text for the database
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value.strftime(DATE_FORMAT)
+
+
+def from_text(text):
+    """
+    Args:
+        text (str): ISO text from the database, or None
+
+    Returns:
+        datetime.date: a date, or a datetime if there's a time
+    """
+    if text is None:
+        return None
+    if len(text) == 10:
+        return datetime.datetime.strptime(text, DATE_FORMAT).date()
+    return datetime.datetime.strptime(text, DATETIME_FORMAT)
+
+
+class ShipmentStore:
+    """
+    Stores the latest tracking result for each shipment, with its events.
+
+    The connection is shared between threads, each operation holds a lock.
+
+    Args:
+        path (str): database file, or ':memory:'
+        clock (callable): time source, for testing
+    """
+
+    def __init__(self, path=':memory:', clock=time.time):
+        self.path = path if path == ':memory:' else os.path.expanduser(path)
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM shipments').fetchone()[0]
+
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+
+    def save(self, shipper, info):
+        """
+        Insert or update a tracking result.
+
+        Args:
+            shipper (str): the shipper name, i.e. 'UPS'
+            info (TrackingInfo): the result to store
+        """
+        self.save_many([(shipper, info)])
+
+
+    def save_many(self, results):
+        """
+        Insert or update many tracking results, in one transaction.
+
+        Summary results (which have no events) replace the shipment's
+        status, but keep its stored events.
+
+        Args:
+            results (iterable): (shipper, TrackingInfo) pairs
+        """
+        now = self.clock()
+        shipments = []
+        replaced = []
+        events = []
+        for shipper, info in results:
+            num = info.tracking_number
+            # not the delivery_date property, which falls back to the last
+            # event's date when there's no delivery date or ETA
+            shipments.append((
+                num,
+                shipper,
+                info.status,
+                int(info.status_code),
+                to_text(info.raw_delivery_date),
+                to_text(info.last_update),
+                info.location,
+                info.service,
+                info.delivery_detail,
+                info.link,
+                now,
+            ))
+
+            if info.detail != SUMMARY:
+                replaced.append((num,))
+                events.extend(
+                    (num, seq, to_text(e.date), e.location, e.detail, int(e.status_code))
+                    for seq, e in enumerate(info.events)
+                )
+
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, shipments)
+            self._conn.executemany('DELETE FROM events WHERE tracking_number = ?', replaced)
+            self._conn.executemany('INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)', events)
+
+        log.debug("Stored %d shipments, %d events", len(shipments), len(events))
+
+
+    def delete(self, tracking_number):
+        """
+        Remove a shipment and its events.
+
+        Args:
+            tracking_number (str)
+        """
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM shipments WHERE tracking_number = ?', (tracking_number,))
+            self._conn.execute('DELETE FROM events WHERE tracking_number = ?', (tracking_number,))
+
+
+    def get(self, tracking_number):
+        """
+        Args:
+            tracking_number (str)
+
+        Returns:
+            Shipment: or None if it's not stored
+        """
+        rows = self._select('WHERE tracking_number = ?', (tracking_number,))
+        return rows[0] if rows else None
+
+
+    def events(self, tracking_number):
+        """
+        Args:
+            tracking_number (str)
+
+        Returns:
+            list: of Event rows, in the order the carrier sent them
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT date, location, detail, status_code FROM events '
+                'WHERE tracking_number = ? ORDER BY seq', (tracking_number,)).fetchall()
+
+        return [Event(from_text(date), location, detail, Status(code))
+                for date, location, detail, code in rows]
+
+
+    def info(self, tracking_number):
+        """
+        Rebuild a stored shipment as a TrackingInfo.
+
+        Args:
+            tracking_number (str)
+
+        Returns:
+            TrackingInfo: or None if it's not stored
+        """
+        row = self.get(tracking_number)
+        if row is None:
+            return None
+
+        info = TrackingInfo(
+            tracking_number = row.tracking_number,
+            delivery_date   = row.delivery_date,
+            status          = row.status,
+            last_update     = row.last_update,
+            location        = row.location,
+            delivery_detail = row.delivery_detail,
+            service         = row.service,
+            link            = row.link,
+            status_code     = row.status_code,
+        )
+        info.events = [TrackingEvent(*e) for e in self.events(tracking_number)]
+        return info
+
+
+    def find(self,
+             shipper=None,
+             status=None,
+             delivery_after=None,
+             delivery_before=None,
+             updated_before=None,
+             limit=None):
+        """
+        Find shipments.  All the given conditions must match.
+
+        Args:
+            shipper (str): shipper name
+            status (Status): a status, or a list of them
+            delivery_after (datetime.date): delivery date on or after this
+            delivery_before (datetime.date): delivery date before this
+            updated_before (datetime.datetime): last updated before this
+            limit (int): the most rows to return
+
+        Returns:
+            list: of Shipment rows
+        """
+        where = []
+        args = []
+        if shipper is not None:
+            where.append('shipper = ?')
+            args.append(shipper)
+        if status is not None:
+            codes = [status] if isinstance(status, Status) else list(status)
+            where.append('status_code IN (%s)' % ', '.join('?' * len(codes)))
+            args.extend(int(code) for code in codes)
+        if delivery_after is not None:
+            where.append('delivery_date >= ?')
+            args.append(to_text(delivery_after))
+        if delivery_before is not None:
+            where.append('delivery_date < ?')
+            args.append(to_text(delivery_before))
+        if updated_before is not None:
+            where.append('last_update < ?')
+            args.append(to_text(updated_before))
+
+        clause = 'WHERE ' + ' AND '.join(where) if where else ''
+        if limit is not None:
+            clause += ' LIMIT %d' % limit
+        return self._select(clause, args)
+
+
+    def due_on(self, day, shipper=None):
+        """
+        Shipments expected on a day, that haven't been delivered yet.
+
+        Args:
+            day (datetime.date)
+            shipper (str): only this shipper's
+
+        Returns:
+            list: of Shipment rows
+        """
+        return self.find(shipper=shipper,
+                         status=[s for s in Status if s not in TERMINAL],
+                         delivery_after=day,
+                         delivery_before=day + datetime.timedelta(days=1))
+
+
+    def stale(self, age, now=None, shipper=None):
+        """
+        Undelivered shipments the carrier hasn't updated for a while.
+
+        Args:
+            age (datetime.timedelta): how long without an update
+            now (datetime.datetime): the current time, default now
+            shipper (str): only this shipper's
+
+        Returns:
+            list: of Shipment rows
+        """
+        now = now or datetime.datetime.now()
+        return self.find(shipper=shipper,
+                         status=[s for s in Status if s not in TERMINAL],
+                         updated_before=now - age)
+
+
+    def _select(self, clause, args):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT %s FROM shipments %s' % (COLUMNS, clause), args).fetchall()
+
+        return [
+            Shipment(num, shipper, status, Status(code), from_text(delivery_date),
+                     from_text(last_update), location, service, delivery_detail, link, checked)
+            for (num, shipper, status, code, delivery_date, last_update,
+                 location, service, delivery_detail, link, checked) in rows
+        ]
@@ -0,0 +1,4 @@
+"""
+Stand-ins for the carriers, for testing code that uses packagetracker
+without talking to the real services.
+"""
@@ -0,0 +1,111 @@
+"""
+Memory profiling of the parse paths.
+
+:func:`measure` runs a function under ``tracemalloc`` and reports the peak
+memory allocated while it ran, and the memory still held afterwards by
+what it returned.  :func:`footprint` breaks down the memory held by
+:class:`~packagetracker.data.TrackingInfo` objects and their events by
+object type::
+
+    >>> usage = measure(lambda: iface._parse_response(rsp, num).events)
+    >>> usage.peak, usage.retained
+    >>> for name, (count, size) in footprint(usage.result).items():
+    ...     print(name, count, size)
+
+``tests/test_memory.py`` holds the parsers to per-event budgets, and
+``benchmarks/memory.py`` reports on them.
+"""
+import collections
+import gc
+import sys
+import tracemalloc
+
+from ..data import TrackingInfo, TrackingEvent
+
+MemoryUsage = collections.namedtuple('MemoryUsage', ('peak', 'retained', 'result'))
+
+
+def measure(func):
+    """
+    Measure the memory a function allocates.
+
+    Args:
+        func (callable): the function to call
+
+    Returns:
+        MemoryUsage: the ``peak`` bytes allocated during the call, the
+        bytes ``retained`` after it, which are held by its result, and
+        the ``result``
+    """
+    if tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is already tracing")
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        result = func()
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return MemoryUsage(peak - start, current - start, result)
+
+
+# containers walked into by footprint(); anything else is counted as a leaf
+_CONTAINERS = (TrackingInfo, TrackingEvent, dict, list, tuple)
+
+
+def footprint(objects):
+    """
+    Break down the memory held by TrackingInfo objects, their events,
+    and what they refer to, by type.  Objects shared between them, like
+    pooled strings, are counted once.
+
+    Args:
+        objects: a TrackingInfo, or a list of them
+
+    Returns:
+        dict: type name -> (object count, bytes), largest first.  The
+        bytes for TrackingInfo and TrackingEvent include their attribute
+        dicts.
+    """
+    totals = collections.defaultdict(lambda: [0, 0])
+    seen = set()
+    stack = [objects]
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        size = sys.getsizeof(obj)
+        if isinstance(obj, (TrackingInfo, TrackingEvent)):
+            # the instance dict is part of the object
+            seen.add(id(obj.__dict__))
+            size += sys.getsizeof(obj.__dict__)
+            stack.extend(obj.__dict__.values())
+            stack.extend(dict.values(obj))
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, _CONTAINERS):
+            stack.extend(obj)
+
+        entry = totals[type(obj).__name__]
+        entry[0] += 1
+        entry[1] += size
+
+    # the list passed in isn't part of the footprint
+    if not isinstance(objects, TrackingInfo):
+        entry = totals['list']
+        entry[0] -= 1
+        entry[1] -= sys.getsizeof(objects)
+        if not entry[0]:
+            del totals['list']
+
+    return collections.OrderedDict(
+        (name, tuple(entry))
+        for name, entry in sorted(totals.items(), key=lambda item: -item[1][1]))
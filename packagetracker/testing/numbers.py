@@ -0,0 +1,292 @@
+"""
+Made-up tracking numbers with valid checksums, for load tests and
+benchmarks.
+
+:func:`generate` streams numbers of a mix of kinds, using only the standard
+library::
+
+    >>> numbers = generate(MIX, seed=1)
+    >>> tracker.track_many(itertools.islice(numbers, 100000), workers=32)
+
+and :func:`generate_batch` makes a list of them with NumPy, many times
+faster, for when millions are needed::
+
+    >>> numbers = generate_batch(1000000, {'ups': 1, 'express': 1})
+
+The kinds are ``ups`` (``1Z`` numbers), ``usps`` (22 digits), and FedEx
+``express`` (12 digits), ``ground96`` (15 digits) and ``ssc18`` (20 digits).
+The 22 digit form of ground96 numbers isn't made, a tracker takes those for
+USPS numbers.  A mix is a dict of kind -> weight.
+
+Every number passes its carrier's ``validate()``.  The same seed gives the
+same numbers, though not the same from ``generate()`` as from
+``generate_batch()``.
+"""
+import bisect
+import itertools
+import random
+import string
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..service.fedex_interface import express_checksum, ground96_checksum, ssc18_checksum
+from ..service.ups_interface   import calculate_checksum as ups_checksum
+from ..service.usps_interface  import calculate_checksum as usps_checksum
+
+# kind -> carrier
+KINDS = {
+    'ups':      'UPS',
+    'usps':     'USPS',
+    'express':  'FedEx',
+    'ground96': 'FedEx',
+    'ssc18':    'FedEx',
+}
+
+# the same share for each carrier
+MIX = {'ups': 3, 'usps': 3, 'express': 1, 'ground96': 1, 'ssc18': 1}
+
+# UPS service codes: next day air, 2nd day air, ground, 3 day select,
+# next day air saver, ground commercial
+UPS_SERVICES = ('01', '02', '03', '12', '13', '42')
+
+# USPS service type prefixes: priority, certified, priority express,
+# first class
+USPS_PREFIXES = ('94001', '92055', '92701', '94055')
+
+_SHIPPER_CHARS = string.digits + string.ascii_uppercase
+
+
+def _digits(rng, count):
+    return '%0*d' % (count, rng.randrange(10 ** count))
+
+
+def _mod10_number(num, checksum):
+    # fill in the checksum digit.  A checksum of 10 isn't a digit, bumping
+    # the digit before last (weighted 1) makes it 9
+    check = checksum(num)
+    if check == 10:
+        num = num[:-3] + str((int(num[-3]) + 1) % 10) + num[-2:]
+        check = 9
+    return num[:-1] + str(check)
+
+
+def ups_number(rng=random):
+    """
+    Args:
+        rng (random.Random)
+
+    Returns:
+        str: a UPS 1Z tracking number
+    """
+    shipper = ''.join(rng.choice(_SHIPPER_CHARS) for _ in range(6))
+    num = '1Z%s%s%s0' % (shipper, rng.choice(UPS_SERVICES), _digits(rng, 7))
+    return num[:-1] + str(ups_checksum(num))
+
+
+def usps_number(rng=random):
+    """
+    Args:
+        rng (random.Random)
+
+    Returns:
+        str: a 22 digit USPS tracking number
+    """
+    num = rng.choice(USPS_PREFIXES) + _digits(rng, 16) + '0'
+    return num[:-1] + str(usps_checksum(num))
+
+
+def express_number(rng=random):
+    """
+    Args:
+        rng (random.Random)
+
+    Returns:
+        str: a 12 digit FedEx Express tracking number
+    """
+    num = _digits(rng, 11) + '0'
+    return num[:-1] + str(express_checksum(num))
+
+
+def ground96_number(rng=random):
+    """
+    Args:
+        rng (random.Random)
+
+    Returns:
+        str: a 15 digit FedEx Ground "96" tracking number
+    """
+    return _mod10_number(_digits(rng, 14) + '0', ground96_checksum)
+
+
+def ssc18_number(rng=random):
+    """
+    Args:
+        rng (random.Random)
+
+    Returns:
+        str: a 20 digit FedEx SSC18 tracking number
+    """
+    return _mod10_number('00' + _digits(rng, 17) + '0', ssc18_checksum)
+
+
+_NUMBERS = {
+    'ups':      ups_number,
+    'usps':     usps_number,
+    'express':  express_number,
+    'ground96': ground96_number,
+    'ssc18':    ssc18_number,
+}
+
+
+def _weights(mix):
+    mix = MIX if mix is None else mix
+    unknown = set(mix) - set(KINDS)
+    if unknown:
+        raise ValueError("Unknown tracking number kinds: %s" % ', '.join(sorted(unknown)))
+
+    kinds = [kind for kind in sorted(mix) if mix[kind] > 0]
+    if not kinds:
+        raise ValueError("The mix has no tracking number kinds")
+    return kinds, [float(mix[kind]) for kind in kinds]
+
+
+def generate(mix=None, count=None, seed=0):
+    """
+    Generate tracking numbers.
+
+    Args:
+        mix (dict): kind -> weight, default ``MIX``
+        count (int): how many, default no end
+        seed (int): random seed
+
+    Yields:
+        str: tracking numbers
+    """
+    kinds, weights = _weights(mix)
+    makers = [_NUMBERS[kind] for kind in kinds]
+    cumulative = list(itertools.accumulate(weights))
+    total = cumulative[-1]
+
+    rng = random.Random(seed)
+    counter = itertools.count() if count is None else range(count)
+    for _ in counter:
+        maker = makers[bisect.bisect(cumulative, rng.random() * total)]
+        yield maker(rng)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("generate_batch() needs numpy, install packagetracker[analytics]")
+
+
+def _to_strings(codes):
+    # rows of character codes -> array of strings
+    codes = np.ascontiguousarray(codes, dtype=np.uint8)
+    return codes.view('S%d' % codes.shape[1]).ravel().astype('U')
+
+
+def _random_digits(rng, count, width):
+    return rng.integers(0, 10, size=(count, width), dtype=np.int64)
+
+
+def _mod10_batch(digits, weight_1, weight_3, fix=False):
+    # checksum digit from the weighted sums of the given columns
+    check = 10 - ((digits[:, weight_3].sum(axis=1) * 3 + digits[:, weight_1].sum(axis=1)) % 10)
+    if fix:
+        bump = check == 10
+        digits[bump, -3] = (digits[bump, -3] + 1) % 10
+        check[bump] = 9
+    else:
+        check %= 10
+    digits[:, -1] = check
+
+
+def _ups_batch(rng, count):
+    chars = np.frombuffer(_SHIPPER_CHARS.encode('ascii'), dtype=np.uint8)
+    codes = np.empty((count, 18), dtype=np.int64)
+    codes[:, 0] = ord('1')
+    codes[:, 1] = ord('Z')
+    codes[:, 2:8] = chars[rng.integers(0, len(chars), size=(count, 6))]
+    services = np.array([[ord(c) for c in s] for s in UPS_SERVICES])
+    codes[:, 8:10] = services[rng.integers(0, len(services), size=count)]
+    codes[:, 10:17] = _random_digits(rng, count, 7) + ord('0')
+
+    # calculate_checksum(): digits count as themselves, letters as
+    # (ord - 63) % 10, every other one doubled
+    body = codes[:, 2:17]
+    values = np.where(body <= ord('9'), body - ord('0'), (body - 63) % 10)
+    total = values[:, 0::2].sum(axis=1) + values[:, 1::2].sum(axis=1) * 2
+    codes[:, 17] = (10 - total % 10) % 10 + ord('0')
+    return _to_strings(codes)
+
+
+def _usps_batch(rng, count):
+    prefixes = np.array([[int(c) for c in p] for p in USPS_PREFIXES])
+    digits = np.empty((count, 22), dtype=np.int64)
+    digits[:, :5] = prefixes[rng.integers(0, len(prefixes), size=count)]
+    digits[:, 5:21] = _random_digits(rng, count, 16)
+    _mod10_batch(digits, weight_1=slice(-3, None, -2), weight_3=slice(-2, None, -2))
+    return _to_strings(digits + ord('0'))
+
+
+def _express_batch(rng, count):
+    digits = np.zeros((count, 12), dtype=np.int64)
+    digits[:, :11] = _random_digits(rng, count, 11)
+    check = digits[:, :10].sum(axis=1) % 11
+    check[check == 10] = 0
+    digits[:, 11] = check
+    return _to_strings(digits + ord('0'))
+
+
+def _ground96_batch(rng, count):
+    digits = np.zeros((count, 15), dtype=np.int64)
+    digits[:, :14] = _random_digits(rng, count, 14)
+    # reversed positions 1-14: the odd ones weighted 3, the even ones 1
+    _mod10_batch(digits, weight_1=slice(-3, -16, -2), weight_3=slice(-2, -16, -2), fix=True)
+    return _to_strings(digits + ord('0'))
+
+
+def _ssc18_batch(rng, count):
+    digits = np.zeros((count, 20), dtype=np.int64)
+    digits[:, 2:19] = _random_digits(rng, count, 17)
+    # reversed positions 1-18
+    _mod10_batch(digits, weight_1=slice(-3, -20, -2), weight_3=slice(-2, -20, -2), fix=True)
+    return _to_strings(digits + ord('0'))
+
+
+_BATCHES = {
+    'ups':      _ups_batch,
+    'usps':     _usps_batch,
+    'express':  _express_batch,
+    'ground96': _ground96_batch,
+    'ssc18':    _ssc18_batch,
+}
+
+
+def generate_batch(count, mix=None, seed=0):
+    """
+    Generate tracking numbers with NumPy.
+
+    Args:
+        count (int): how many
+        mix (dict): kind -> weight, default ``MIX``
+        seed (int): random seed
+
+    Returns:
+        list: tracking numbers
+    """
+    _require_numpy()
+    kinds, weights = _weights(mix)
+
+    rng = np.random.default_rng(seed)
+    choice = rng.choice(len(kinds), size=count, p=np.array(weights) / sum(weights))
+
+    numbers = np.empty(count, dtype='U22')
+    for i, kind in enumerate(kinds):
+        where = np.flatnonzero(choice == i)
+        if len(where):
+            numbers[where] = _BATCHES[kind](rng, len(where))
+    return numbers.tolist()
@@ -0,0 +1,182 @@
+"""
+A local stand-in for the carriers' push notification publishers.
+
+:class:`LocalPublisher` builds payloads shaped like UPS Track Alert and
+FedEx webhook notifications, credentials included, and delivers them to a
+:class:`~packagetracker.push.PushHandler`, either directly through its WSGI
+app or by POSTing to a URL where one is served::
+
+    >>> publisher = LocalPublisher(handler, credentials={'UPS': 'secret'})
+    >>> publisher.ups('1Z9999999999999999', 'Origin Scan', city='ATLANTA', state='GA')
+    200
+"""
+import datetime
+import hashlib
+import hmac
+import io
+import json
+import urllib.error
+import urllib.request
+
+
+class LocalPublisher:
+    """
+    Publishes carrier-style push notifications.
+
+    Args:
+        target: a PushHandler, or the URL it's served at (without the
+            shipper path)
+        credentials (dict): shipper -> subscription credential
+    """
+
+    def __init__(self, target, credentials=None):
+        self.target = target
+        self.credentials = dict(credentials or {})
+
+
+    def ups(self,
+            tracking_number,
+            description,
+            status_type='I',
+            code='',
+            when=None,
+            city=None,
+            state=None,
+            country='US',
+            scheduled=None,
+            delivered=False):
+        """
+        Publish a UPS Track Alert activity.
+
+        Args:
+            tracking_number (str)
+            description (str): activity description
+            status_type (str): activity type, i.e. 'I' in transit, 'D' delivered
+            code (str): activity code
+            when (datetime.datetime): activity time, default now
+            city (str)
+            state (str)
+            country (str)
+            scheduled (datetime.date): scheduled delivery date
+            delivered (bool): True to send the activity as the delivery
+
+        Returns:
+            int: the HTTP status the handler returned
+        """
+        when = when or datetime.datetime.now()
+        payload = {
+            'trackingNumber': tracking_number,
+            'localActivityDate': when.strftime('%Y%m%d'),
+            'localActivityTime': when.strftime('%H%M%S'),
+            'scheduledDeliveryDate': scheduled.strftime('%Y%m%d') if scheduled else '',
+            'actualDeliveryDate': when.strftime('%Y%m%d') if delivered else '',
+            'actualDeliveryTime': when.strftime('%H%M%S') if delivered else '',
+            'activityLocation': {'city': city, 'stateProvince': state, 'country': country},
+            'activityStatus': {'type': status_type, 'code': code, 'description': description},
+        }
+        return self.publish('UPS', payload)
+
+
+    def fedex(self,
+              tracking_number,
+              events,
+              code='IT',
+              description='In transit',
+              service='FedEx Ground',
+              estimated=None,
+              delivered=None):
+        """
+        Publish a FedEx tracking webhook notification.
+
+        Args:
+            tracking_number (str)
+            events (list): of (datetime, event type, description, city,
+                state) tuples, newest first
+            code (str): latest status code, i.e. 'IT' or 'DL'
+            description (str): latest status description
+            service (str): service description
+            estimated (datetime.datetime): estimated delivery
+            delivered (datetime.datetime): actual delivery
+
+        Returns:
+            int: the HTTP status the handler returned
+        """
+        def location(city, state):
+            return {'city': city, 'stateOrProvinceCode': state, 'countryCode': 'US'}
+
+        times = []
+        if estimated:
+            times.append({'type': 'ESTIMATED_DELIVERY', 'dateTime': estimated.isoformat()})
+        if delivered:
+            times.append({'type': 'ACTUAL_DELIVERY', 'dateTime': delivered.isoformat()})
+
+        latest = {'code': code, 'description': description}
+        if events:
+            latest['scanLocation'] = location(*events[0][3:5])
+
+        payload = {'trackResults': [{
+            'trackingNumberInfo': {'trackingNumber': tracking_number},
+            'latestStatusDetail': latest,
+            'dateAndTimes': times,
+            'serviceDetail': {'description': service},
+            'scanEvents': [{
+                'date': when.isoformat(),
+                'eventType': event_type,
+                'eventDescription': event_description,
+                'scanLocation': location(city, state),
+            } for when, event_type, event_description, city, state in events],
+        }]}
+        return self.publish('FedEx', payload)
+
+
+    def publish(self, shipper, payload):
+        """
+        Send a payload, with the shipper's credential.
+
+        Args:
+            shipper (str): 'UPS' or 'FedEx'
+            payload (dict): the notification
+
+        Returns:
+            int: the HTTP status the handler returned
+        """
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+
+        secret = self.credentials.get(shipper)
+        if secret is not None:
+            if shipper == 'FedEx':
+                headers['x-fedex-signature'] = hmac.new(secret.encode('utf-8'), body,
+                                                        hashlib.sha256).hexdigest()
+            else:
+                headers['credential'] = secret
+
+        if isinstance(self.target, str):
+            return self._post(self.target.rstrip('/') + '/' + shipper, body, headers)
+        return self._call(shipper, body, headers)
+
+
+    def _post(self, url, body, headers):
+        request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request) as rsp:
+                return rsp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+    def _call(self, shipper, body, headers):
+        # call the handler's WSGI app directly
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/' + shipper,
+            'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': headers.pop('Content-Type'),
+            'wsgi.input': io.BytesIO(body),
+        }
+        for name, value in headers.items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        status = []
+        self.target.wsgi_app(environ, lambda s, h: status.append(s))
+        return int(status[0].split()[0])
@@ -0,0 +1,193 @@
+"""
+Carrier tracking responses, for tests and benchmarks.
+
+Each function returns a response in the form the interface's
+``_parse_response()`` takes: a decoded UPS JSON dict, USPS XML text, or a
+FedEx SOAP reply object.  With the default three events, the responses
+follow the examples in the carriers' developer guides; ask for more events
+to get the long histories some packages collect::
+
+    >>> iface._parse_response(ups_response('1Z12345E0205271688', events=5000),
+    ...                       '1Z12345E0205271688')
+
+The event histories are made up, but repeatable: the same arguments always
+give the same response.
+"""
+import datetime
+import random
+
+STATES = ('GA', 'TN', 'KY', 'CA', 'TX', 'NY', 'IL', 'OH', 'WA', 'FL')
+
+# most recent first, which is how the carriers send them
+UPS_STATUSES = (
+    ('D', 'D', 'DELIVERED'),
+    ('I', 'OT', 'OUT FOR DELIVERY TODAY'),
+    ('I', 'AR', 'ARRIVAL SCAN'),
+    ('I', 'DP', 'DEPARTURE SCAN'),
+    ('I', 'OR', 'ORIGIN SCAN'),
+    ('M', 'MP', 'ORDER PROCESSED: READY FOR UPS'),
+)
+USPS_EVENTS = (
+    ('01', 'Delivered, In/At Mailbox'),
+    ('OF', 'Out for Delivery'),
+    ('07', 'Arrived at Post Office'),
+    ('10', 'Arrived at USPS Regional Facility'),
+    ('EF', 'Departed USPS Regional Facility'),
+    ('MA', 'Shipping Label Created, USPS Awaiting Item'),
+)
+FEDEX_EVENTS = (
+    ('DL', 'Delivered'),
+    ('OD', 'On FedEx vehicle for delivery'),
+    ('AR', 'At local FedEx facility'),
+    ('DP', 'Departed FedEx location'),
+    ('PU', 'Picked up'),
+    ('OC', 'Shipment information sent to FedEx'),
+)
+
+START = datetime.datetime(2020, 6, 8, 9, 10)
+
+
+def _history(events, statuses, delivered, seed):
+    # (time, city, state, status) for each event, newest first
+    rng = random.Random(seed)
+    cities = [('CITY%03d' % ii, rng.choice(STATES)) for ii in range(200)]
+
+    history = []
+    when = START
+    for ii in range(events):
+        if ii == 0:
+            status = statuses[0 if delivered else 1]
+        elif ii == events - 1:
+            status = statuses[-1]
+        else:
+            status = statuses[2 + ii % (len(statuses) - 3)]
+        city, state = rng.choice(cities)
+        history.append((when, city, state, status))
+        when -= datetime.timedelta(minutes=rng.randint(20, 600))
+    return history
+
+
+def ups_response(tracking_number='1Z12345E0205271688', events=3, delivered=True, seed=0):
+    """
+    Args:
+        tracking_number (str)
+        events (int): the number of activities
+        delivered (bool): whether the last activity is a delivery
+        seed (int): varies the event history
+
+    Returns:
+        dict: a decoded UPS Track API response
+    """
+    activities = []
+    for when, city, state, (kind, code, description) in _history(events, UPS_STATUSES,
+                                                                 delivered, seed):
+        activity = {
+            'ActivityLocation': {
+                'Address': {'City': city, 'StateProvinceCode': state, 'CountryCode': 'US'},
+            },
+            'Status': {'Type': kind, 'Description': description, 'Code': code},
+            'Date': when.strftime('%Y%m%d'),
+            'Time': when.strftime('%H%M%S'),
+        }
+        if kind == 'D':
+            activity['ActivityLocation']['Description'] = 'FRONT DOOR'
+        activities.append(activity)
+
+    shipment = {
+        'Service': {'Code': '002', 'Description': '2ND DAY AIR'},
+        'Package': {
+            'TrackingNumber': tracking_number,
+            'Activity': activities,
+        },
+    }
+    if not delivered:
+        shipment['ScheduledDeliveryDate'] = (START + datetime.timedelta(days=1)).strftime('%Y%m%d')
+
+    return {
+        'TrackResponse': {
+            'Response': {'ResponseStatus': {'Code': '1', 'Description': 'Success'}},
+            'Shipment': shipment,
+        },
+    }
+
+
+def _usps_node(tag, when, city, state, code, event):
+    clock = when.strftime('%I:%M %p').lstrip('0').lower()
+    day = '%s %d, %d' % (when.strftime('%B'), when.day, when.year)
+    return (
+        '<{tag}><EventTime>{clock}</EventTime><EventDate>{day}</EventDate>'
+        '<Event>{event}</Event><EventCity>{city}</EventCity><EventState>{state}</EventState>'
+        '<EventZIPCode>30301</EventZIPCode><EventCountry></EventCountry>'
+        '<EventCode>{code}</EventCode></{tag}>'
+    ).format(tag=tag, clock=clock, day=day, event=event, city=city, state=state, code=code)
+
+
+def usps_response(tracking_number='9400100000000000000000', events=3, delivered=True, seed=0):
+    """
+    Args:
+        tracking_number (str)
+        events (int): the number of events, including the summary
+        delivered (bool): whether the summary is a delivery
+        seed (int): varies the event history
+
+    Returns:
+        str: a USPS TrackFieldRequest response
+    """
+    history = _history(max(events, 1), USPS_EVENTS, delivered, seed)
+    nodes = [_usps_node('TrackSummary', when, city, state, *status)
+             for when, city, state, status in history[:1]]
+    nodes.extend(_usps_node('TrackDetail', when, city, state, *status)
+                 for when, city, state, status in history[1:])
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<TrackResponse><TrackInfo ID="%s">%s</TrackInfo></TrackResponse>' % (
+                tracking_number, '\n'.join(nodes)))
+
+
+class SoapObject:
+    """
+    A stand-in for the objects the FedEx SOAP client returns: attributes,
+    which are missing rather than None when the reply leaves them out.
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+    def __repr__(self):
+        return '(%s)' % ', '.join('%s=%r' % item for item in self.__dict__.items())
+
+
+def _fedex_address(city, state):
+    return SoapObject(City=city, StateOrProvinceCode=state, CountryCode='US')
+
+
+def fedex_response(tracking_number='122816215025810', events=3, delivered=True, seed=0):
+    """
+    Args:
+        tracking_number (str)
+        events (int): the number of scan events
+        delivered (bool): whether the last event is a delivery
+        seed (int): varies the event history
+
+    Returns:
+        SoapObject: a TrackDetails reply, as passed to ``_parse_response()``
+    """
+    history = _history(events, FEDEX_EVENTS, delivered, seed)
+    scans = [SoapObject(Timestamp=when, EventType=code, EventDescription=description,
+                        Address=_fedex_address(city, state))
+             for when, city, state, (code, description) in history]
+
+    reply = SoapObject(
+        TrackingNumber  = tracking_number,
+        StatusDetail    = SoapObject(Code=history[0][3][0], Description=history[0][3][1]),
+        Service         = SoapObject(Type='FEDEX_GROUND', Description='FedEx Ground'),
+        Events          = scans,
+    )
+    if delivered:
+        when, city, state, _ = history[0]
+        reply.ActualDeliveryTimestamp = when
+        reply.ActualDeliveryAddress = _fedex_address(city, state)
+    else:
+        reply.EstimatedDeliveryTimestamp = START + datetime.timedelta(days=1)
+    return reply
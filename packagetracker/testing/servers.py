@@ -0,0 +1,494 @@
+"""
+Local stand-ins for the carriers' tracking services.
+
+:class:`FakeUPS` speaks the UPS ``rest/Track`` JSON protocol,
+:class:`FakeUSPS` the USPS ``TrackV2`` XML GET protocol, and
+:class:`FakeFedEx` the FedEx Track SOAP protocol.  Each is an HTTP server
+on a local port, answering with made-up event histories (see
+:mod:`packagetracker.testing.responses`), so trackers can be tested and
+load-tested without credentials or the carriers' rate limits.
+
+A :class:`Profile` sets how a server behaves: its latency distribution,
+the fraction of requests that fail with a 5xx or are throttled with a 429,
+the fraction of numbers that aren't found, and the length of the event
+histories.  Whether a number is found, and its history, depend only on
+the number, so tracking it again gives the same answer::
+
+    >>> profile = Profile(latency=lognormal(0.08, 0.5), error_rate=0.01,
+    ...                   throttle_rate=0.02, events=(5, 40))
+    >>> with FakeUPS(profile) as ups, FakeUSPS(profile) as usps:
+    ...     write_config('/tmp/packagetrack', ups, usps)
+    ...     tracker = PackageTracker('/tmp/packagetrack')
+    ...     tracker.track_many(ups.tracking_numbers(1000), workers=32)
+
+The trackers find the servers through the ``api_url`` config option, which
+:func:`write_config` sets.  ``benchmarks/load.py`` drives ``track_many()``
+against them and reports throughput and latency.
+"""
+import collections
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from .numbers   import generate
+from .responses import fedex_response, ups_response, usps_response
+
+
+def constant(seconds):
+    """A latency distribution: always ``seconds``."""
+    return lambda rng: seconds
+
+
+def uniform(low, high):
+    """A latency distribution: uniform between ``low`` and ``high`` seconds."""
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median, sigma=0.5):
+    """
+    A latency distribution with a long tail, like real services have.
+
+    Args:
+        median (float): the median latency, in seconds
+        sigma (float): the spread; at 0.5, one request in a hundred takes
+            over three times the median
+    """
+    return lambda rng: median * rng.lognormvariate(0, sigma)
+
+
+class Profile:
+    """
+    How a stand-in carrier behaves.
+
+    Args:
+        latency (callable): takes a ``random.Random``, returns the seconds
+            to wait before answering, see ``constant()``, ``uniform()`` and
+            ``lognormal()``.  Default no wait.
+        error_rate (float): fraction of requests answered with an HTTP 503
+        throttle_rate (float): fraction of requests answered with an HTTP 429
+        not_found_rate (float): fraction of tracking numbers the carrier
+            has no record of
+        events (tuple): (fewest, most) events in a history
+        delivered_rate (float): fraction of packages that are delivered
+        seed (int): varies the random choices
+    """
+
+    def __init__(self,
+                 latency=None,
+                 error_rate=0.0,
+                 throttle_rate=0.0,
+                 not_found_rate=0.0,
+                 events=(3, 30),
+                 delivered_rate=0.5,
+                 seed=0):
+
+        self.latency = latency or constant(0.0)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.not_found_rate = not_found_rate
+        self.events = events
+        self.delivered_rate = delivered_rate
+        self.seed = seed
+
+
+    def package(self, tracking_number):
+        """
+        What the carrier knows about a package, always the same for a
+        number.
+
+        Args:
+            tracking_number (str)
+
+        Returns:
+            tuple: (found, number of events, delivered, history seed)
+        """
+        rng = random.Random(zlib.crc32(tracking_number.encode('utf-8')) ^ self.seed)
+        found = rng.random() >= self.not_found_rate
+        return found, rng.randint(*self.events), rng.random() < self.delivered_rate, rng.getrandbits(32)
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # lots of clients connect at once under load
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # the headers and body are separate writes, don't let them wait on an ACK
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, content_type, data = self.server.fake.request(self.command, self.path, body)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeCarrier:
+    """
+    Base class for the stand-in servers.  ``start()`` serves from a
+    background thread, or use it as a context manager.
+
+    Attributes:
+        stats (collections.Counter): counts of ``requests``, ``found``,
+            ``not_found``, ``errors`` and ``throttled``
+
+    Args:
+        profile (Profile): how it behaves
+        host (str): address to listen on
+        port (int): port to listen on, default any free one
+    """
+
+    # the config section, the path requests are sent to, and the kinds of
+    # tracking number it tracks, see packagetracker.testing.numbers
+    section = None
+    path = '/'
+    kinds = ()
+
+    def __init__(self, profile=None, host='127.0.0.1', port=0):
+        self.profile = profile or Profile()
+        self.stats = collections.Counter()
+
+        self._rng = random.Random(self.profile.seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    @property
+    def url(self):
+        """The URL to send tracking requests to, the ``api_url`` option."""
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d%s' % (host, port, self.path)
+
+
+    def config(self):
+        """
+        Returns:
+            dict: config options for the carrier's section
+        """
+        return {'api_url': self.url}
+
+
+    def tracking_numbers(self, count=None, seed=0):
+        """
+        Valid tracking numbers for this carrier, of each of its kinds.
+
+        Args:
+            count (int): how many, default no end
+            seed (int): random seed
+
+        Returns:
+            iterator: of str
+        """
+        return generate(dict.fromkeys(self.kinds, 1), count=count, seed=seed)
+
+
+    def start(self):
+        """Serve from a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever,
+                                            kwargs={'poll_interval': 0.05},
+                                            name='fake-' + self.section, daemon=True)
+            self._thread.start()
+        return self
+
+
+    def stop(self):
+        """Stop serving, and close the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+    def request(self, method, path, body):
+        """
+        Answer a request, after the profile's latency, and maybe with a
+        fault.
+
+        Returns:
+            tuple: (HTTP status, content type, body bytes)
+        """
+        profile = self.profile
+        with self._lock:
+            delay = profile.latency(self._rng)
+            roll = self._rng.random()
+        if delay > 0:
+            time.sleep(delay)
+
+        self._count('requests')
+        if roll < profile.throttle_rate:
+            self._count('throttled')
+            return 429, 'text/plain', b'Too Many Requests'
+        if roll < profile.throttle_rate + profile.error_rate:
+            self._count('errors')
+            return 503, 'text/plain', b'Service Unavailable'
+
+        try:
+            num, options = self.parse_request(method, path, body)
+        except Exception:
+            return 400, 'text/plain', b'Bad Request'
+
+        found, events, delivered, seed = profile.package(num)
+        self._count('found' if found else 'not_found')
+        if not found:
+            return self.not_found(num, options)
+        return self.found(num, events, delivered, seed, options)
+
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+    def parse_request(self, method, path, body):
+        """
+        Returns:
+            tuple: (tracking number, dict of request options)
+        """
+        raise NotImplementedError
+
+
+    def found(self, num, events, delivered, seed, options):
+        """Returns the response for a package with a history."""
+        raise NotImplementedError
+
+
+    def not_found(self, num, options):
+        """Returns the response for an unknown number."""
+        raise NotImplementedError
+
+
+class FakeUPS(FakeCarrier):
+    """UPS ``rest/Track``: JSON POSTs, JSON answers."""
+
+    section = 'UPS'
+    path = '/rest/Track'
+    kinds = ('ups',)
+
+    def config(self):
+        options = super().config()
+        options.update(license_number='FAKE', user_id='fake', password='fake')
+        return options
+
+
+    def parse_request(self, method, path, body):
+        track = json.loads(body.decode('utf-8'))['TrackRequest']
+        return track['InquiryNumber'], {'summary': track['Request'].get('RequestOption') == '0'}
+
+
+    def found(self, num, events, delivered, seed, options):
+        rsp = ups_response(num, events=1 if options['summary'] else events,
+                           delivered=delivered, seed=seed)
+        return 200, 'application/json', json.dumps(rsp).encode('utf-8')
+
+
+    def not_found(self, num, options):
+        rsp = {'Fault': {
+            'faultcode': 'Client',
+            'faultstring': 'An exception has been raised as a result of client data.',
+            'detail': {'Errors': {'ErrorDetail': {
+                'Severity': 'Hard',
+                'PrimaryErrorCode': {'Code': '151044',
+                                     'Description': 'No tracking information available'},
+            }}},
+        }}
+        return 200, 'application/json', json.dumps(rsp).encode('utf-8')
+
+
+class FakeUSPS(FakeCarrier):
+    """USPS ``TrackV2``: GETs with the XML request in the query string."""
+
+    section = 'USPS'
+    path = '/ShippingAPI.dll?API=TrackV2&XML='
+    kinds = ('usps',)
+
+    def config(self):
+        options = super().config()
+        options.update(userid='FAKE', password='fake')
+        return options
+
+
+    def parse_request(self, method, path, body):
+        xml = parse_qs(urlsplit(path).query)['XML'][0]
+        return re.search(r'<TrackID ID="([^"]+)"', xml).group(1), {}
+
+
+    def found(self, num, events, delivered, seed, options):
+        rsp = usps_response(num, events=events, delivered=delivered, seed=seed)
+        return 200, 'text/xml', rsp.encode('utf-8')
+
+
+    def not_found(self, num, options):
+        rsp = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<TrackResponse><TrackInfo ID="%s"><Error><Number>-2147219302</Number>'
+               '<Description>The Postal Service could not locate the tracking information '
+               'for your request.</Description></Error></TrackInfo></TrackResponse>' % escape(num))
+        return 200, 'text/xml', rsp.encode('utf-8')
+
+
+SOAP_ENV = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+FEDEX_REPLY = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<SOAP-ENV:Envelope xmlns:SOAP-ENV="%s"><SOAP-ENV:Header/><SOAP-ENV:Body>'
+    '<TrackReply xmlns="{ns}">'
+    '<HighestSeverity>SUCCESS</HighestSeverity>'
+    '<Notifications><Severity>SUCCESS</Severity><Source>trck</Source><Code>0</Code>'
+    '<Message>Request was successfully processed.</Message>'
+    '<LocalizedMessage>Request was successfully processed.</LocalizedMessage></Notifications>'
+    '<Version><ServiceId>trck</ServiceId><Major>{major}</Major>'
+    '<Intermediate>0</Intermediate><Minor>0</Minor></Version>'
+    '<CompletedTrackDetails><HighestSeverity>{severity}</HighestSeverity>'
+    '<Notifications><Severity>SUCCESS</Severity><Source>trck</Source><Code>0</Code>'
+    '<Message>Request was successfully processed.</Message></Notifications>'
+    '<DuplicateWaybill>false</DuplicateWaybill><MoreData>false</MoreData>'
+    '<TrackDetailsCount>0</TrackDetailsCount>'
+    '<TrackDetails>{detail}</TrackDetails>'
+    '</CompletedTrackDetails></TrackReply>'
+    '</SOAP-ENV:Body></SOAP-ENV:Envelope>'
+) % SOAP_ENV
+
+
+# FedEx sends every timestamp with the UTC offset where it happened
+FEDEX_OFFSET = '-05:00'
+
+
+def _fedex_time(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S') + FEDEX_OFFSET
+
+
+def _fedex_date(date_type, value):
+    return ('<DatesOrTimes><Type>%s</Type><DateOrTimestamp>%s</DateOrTimestamp>'
+            '</DatesOrTimes>' % (date_type, _fedex_time(value)))
+
+
+def _fedex_address(address):
+    return ('<City>%s</City><StateOrProvinceCode>%s</StateOrProvinceCode>'
+            '<CountryCode>%s</CountryCode>' % (address.City, address.StateOrProvinceCode,
+                                               address.CountryCode))
+
+
+class FakeFedEx(FakeCarrier):
+    """
+    FedEx Track: SOAP POSTs.  Replies use the namespace of the request, so
+    they suit whichever Track API version the client's WSDL is.
+    """
+
+    section = 'FedEx'
+    path = '/web-services/track'
+    kinds = ('express', 'ground96', 'ssc18')
+
+    def config(self):
+        options = super().config()
+        options.update(key='FAKE', password='fake', account_number='0', meter_number='0')
+        return options
+
+
+    def parse_request(self, method, path, body):
+        root = ElementTree.fromstring(body)
+        namespace = None
+        num = None
+        for element in root.iter():
+            tag = element.tag
+            if tag.endswith('}TrackRequest'):
+                namespace = tag[1:].split('}')[0]
+            elif tag.endswith('}PackageIdentifier'):
+                for child in element:
+                    if child.tag.endswith('}Value'):
+                        num = child.text
+        return num, {'namespace': namespace}
+
+
+    def _reply(self, options, severity, detail):
+        namespace = options['namespace'] or 'http://fedex.com/ws/track/v16'
+        xml = FEDEX_REPLY.format(ns=namespace, major=namespace.rsplit('/v', 1)[-1],
+                                 severity=severity, detail=detail)
+        return 200, 'text/xml; charset=utf-8', xml.encode('utf-8')
+
+
+    def found(self, num, events, delivered, seed, options):
+        reply = fedex_response(num, events=events, delivered=delivered, seed=seed)
+
+        parts = [
+            '<Notification><Severity>SUCCESS</Severity><Source>trck</Source><Code>0</Code>'
+            '<Message>Request was successfully processed.</Message></Notification>',
+            '<TrackingNumber>%s</TrackingNumber>' % escape(num),
+            '<StatusDetail><Code>%s</Code><Description>%s</Description></StatusDetail>' % (
+                reply.StatusDetail.Code, escape(reply.StatusDetail.Description)),
+            '<Service><Type>%s</Type><Description>%s</Description></Service>' % (
+                reply.Service.Type, reply.Service.Description),
+        ]
+        if delivered:
+            parts.append(_fedex_date('ACTUAL_DELIVERY', reply.ActualDeliveryTimestamp))
+            parts.append('<ActualDeliveryAddress>%s</ActualDeliveryAddress>' %
+                         _fedex_address(reply.ActualDeliveryAddress))
+        else:
+            parts.append(_fedex_date('ESTIMATED_DELIVERY', reply.EstimatedDeliveryTimestamp))
+
+        parts.extend(
+            '<Events><Timestamp>%s</Timestamp><EventType>%s</EventType>'
+            '<EventDescription>%s</EventDescription><Address>%s</Address></Events>' % (
+                _fedex_time(e.Timestamp), e.EventType, escape(e.EventDescription),
+                _fedex_address(e.Address))
+            for e in reply.Events)
+
+        return self._reply(options, 'SUCCESS', ''.join(parts))
+
+
+    def not_found(self, num, options):
+        detail = (
+            '<Notification><Severity>ERROR</Severity><Source>trck</Source><Code>9040</Code>'
+            '<Message>This tracking number cannot be found. Please check the number or '
+            'contact the sender.</Message><LocalizedMessage>This tracking number cannot be '
+            'found. Please check the number or contact the sender.</LocalizedMessage>'
+            '</Notification><TrackingNumber>%s</TrackingNumber>' % escape(num))
+        return self._reply(options, 'SUCCESS', detail)
+
+
+def write_config(path, *servers, **options):
+    """
+    Write a config file pointing a tracker at stand-in servers.
+
+    Args:
+        path (str): the config file to write
+        servers: FakeCarrier servers
+        options: more options for every section, i.e. ``requests_per_second``
+    """
+    with open(path, 'w') as f:
+        for server in servers:
+            f.write('[%s]\n' % server.section)
+            for name, value in sorted(dict(server.config(), **options).items()):
+                f.write('%s = %s\n' % (name, value))
+            f.write('\n')
@@ -0,0 +1,324 @@
+"""
+Change notifications for watched packages.
+
+Rather than every consumer polling ``track()`` and diffing the results, a
+:class:`Watcher` polls all the watched packages in one background loop, and
+calls back only when something actually changed::
+
+    >>> def changed(tracking_number, old, new):
+    ...     print(tracking_number, new.status)
+    >>> tracker.watch('1Z9999999999999999', changed)
+
+The callback gets the previous :class:`~packagetracker.data.TrackingInfo`
+(None the first time) and the new one.  A change is a new status, delivery
+date, location, or event.  Once a package reaches a terminal state (i.e.
+delivered) its callbacks are called a last time, and it's unwatched.
+
+Packages are tracked with ``priority='low'`` through ``track_many()``, so
+the loop is paced by carriers' daily budgets, rate limits and circuit
+breakers like any other background work.  Failures are logged, and the
+package is tried again next interval.
+
+Packages whose updates the carrier pushes (see :mod:`packagetracker.push`)
+are subscribed with :meth:`Watcher.subscribe`, and aren't polled at all;
+their results arrive through :meth:`Watcher.push`.
+"""
+import logging
+import random
+import threading
+import time
+
+from .data import FULL
+
+log = logging.getLogger(__name__)
+
+
+class Watch:
+    """
+    A watched package.
+    """
+
+    def __init__(self, tracking_number, next_check):
+        self.tracking_number = tracking_number
+        self.callbacks = []
+        self.next_check = next_check
+
+        # the last result, and its fingerprint
+        self.info = None
+        self.fingerprint = None
+
+
+def fingerprint(info):
+    """
+    Args:
+        info (TrackingInfo)
+
+    Returns:
+        int: a hash of everything that counts as a change
+    """
+    return hash((
+        info.status_code,
+        info.status,
+        info.delivery_date,
+        info.location,
+        tuple((e.date, e.location, e.detail) for e in info.events),
+    ))
+
+
+class Watcher:
+    """
+    Polls watched packages, and calls back on changes.
+
+    Args:
+        tracker (PackageTracker): the tracker to poll with
+        interval (float): seconds between checks of each package
+        batch_size (int): the most packages tracked per pass
+        workers (int): threads to track with, see ``track_many()``
+        detail (str): 'full' to notice new events, or 'summary' for
+            status changes only, which is cheaper with some carriers
+        clock (callable): time source, for testing
+    """
+
+    def __init__(self,
+                 tracker,
+                 interval=900.0,
+                 batch_size=500,
+                 workers=4,
+                 detail=FULL,
+                 clock=time.time):
+
+        self.tracker = tracker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.workers = workers
+        self.detail = detail
+        self.clock = clock
+
+        self._watches = {}
+        self._subscribed = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+
+    def __len__(self):
+        return len(self._watches)
+
+
+    def __contains__(self, tracking_number):
+        return self.tracker.package(tracking_number).tracking_number in self._watches
+
+
+    def watch(self, tracking_number, callback):
+        """
+        Watch a package.  Its first check is spread over the next interval,
+        so a batch of new watches doesn't all poll at once.
+
+        Args:
+            tracking_number (str)
+            callback (callable): called as ``callback(tracking_number, old, new)``
+
+        Raises:
+            UnsupportedShipper
+        """
+        num = self.tracker.package(tracking_number).tracking_number
+        with self._lock:
+            w = self._watches.get(num)
+            if w is None:
+                w = self._watches[num] = Watch(num, self.clock() + random.uniform(0, self.interval))
+            w.callbacks.append(callback)
+        log.debug("%s: watching", num)
+
+
+    def unwatch(self, tracking_number, callback=None):
+        """
+        Stop watching a package.
+
+        Args:
+            tracking_number (str)
+            callback (callable): remove just this callback, default all
+        """
+        num = self.tracker.package(tracking_number).tracking_number
+        with self._lock:
+            w = self._watches.get(num)
+            if w is None:
+                return
+            if callback is not None and callback in w.callbacks:
+                w.callbacks.remove(callback)
+            if callback is None or not w.callbacks:
+                del self._watches[num]
+
+
+    def subscribe(self, tracking_number):
+        """
+        Stop polling a package, its updates are pushed.
+
+        Args:
+            tracking_number (str)
+        """
+        num = self.tracker.package(tracking_number).tracking_number
+        with self._lock:
+            self._subscribed.add(num)
+
+
+    def unsubscribe(self, tracking_number):
+        """
+        Go back to polling a package.
+
+        Args:
+            tracking_number (str)
+        """
+        num = self.tracker.package(tracking_number).tracking_number
+        with self._lock:
+            self._subscribed.discard(num)
+
+
+    def check_now(self, tracking_number):
+        """
+        Make a package due at the next pass, and wake the loop.
+
+        Args:
+            tracking_number (str)
+        """
+        num = self.tracker.package(tracking_number).tracking_number
+        with self._lock:
+            w = self._watches.get(num)
+            if w is not None:
+                w.next_check = self.clock()
+        self._wake.set()
+
+
+    def poll(self):
+        """
+        Track the packages that are due, and fire callbacks for changes.
+
+        Returns:
+            int: the number of packages that changed
+        """
+        now = self.clock()
+        with self._lock:
+            due = sorted((w for w in self._watches.values()
+                          if w.next_check <= now and w.tracking_number not in self._subscribed),
+                         key=lambda w: w.next_check)[:self.batch_size]
+            for w in due:
+                w.next_check = now + self.interval
+
+        if not due:
+            return 0
+
+        results = self.tracker.track_many([w.tracking_number for w in due],
+                                          priority='low', detail=self.detail,
+                                          workers=self.workers)
+        changed = 0
+        for w in due:
+            info = results[w.tracking_number]
+            if isinstance(info, Exception):
+                log.info("%s: watch check failed: %r", w.tracking_number, info)
+            elif self._apply(w, info):
+                changed += 1
+
+        return changed
+
+
+    def push(self, info):
+        """
+        Apply a pushed tracking result, firing callbacks if it's a change.
+
+        Args:
+            info (TrackingInfo)
+
+        Returns:
+            bool: True if it was a change to a watched package
+        """
+        num = info.tracking_number
+        if info.is_terminal:
+            with self._lock:
+                self._subscribed.discard(num)
+
+        w = self._watches.get(num)
+        return w is not None and self._apply(w, info)
+
+
+    def _apply(self, w, info):
+        # notify if info is a change, returns True if it was.  The check
+        # and update are under the lock, so a push and a poll with the
+        # same result don't both notify; callbacks run after it's released.
+        fp = fingerprint(info)
+        with self._lock:
+            if fp == w.fingerprint or self._watches.get(w.tracking_number) is not w:
+                return False
+
+            old, w.info, w.fingerprint = w.info, info, fp
+            if info.is_terminal:
+                log.debug("%s: %s, unwatching", w.tracking_number, info.status_code.name)
+                del self._watches[w.tracking_number]
+
+        self._notify(w, old, info)
+        return True
+
+
+    def _notify(self, w, old, new):
+        for callback in list(w.callbacks):
+            try:
+                callback(w.tracking_number, old, new)
+            except Exception:
+                log.exception("%s: watch callback %r failed", w.tracking_number, callback)
+
+
+    def next_due(self):
+        """
+        Returns:
+            float: seconds until the next package is due, None if there
+            aren't any polled
+        """
+        with self._lock:
+            # subscribed packages aren't polled, their next_check never moves
+            due = [w.next_check for num, w in self._watches.items()
+                   if num not in self._subscribed]
+        if not due:
+            return None
+        return max(0.0, min(due) - self.clock())
+
+
+    def run(self):
+        """Poll until stop() is called."""
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                log.exception("Watch poll failed")
+
+            wait = self.next_due()
+            self._wake.wait(self.interval if wait is None else min(wait, self.interval))
+            self._wake.clear()
+
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def start(self):
+        """Start polling in a background thread."""
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='packagetracker-watcher',
+                                            daemon=True)
+            self._thread.start()
+
+
+    def stop(self, timeout=None):
+        """
+        Stop the background thread.
+
+        Args:
+            timeout (float): seconds to wait for it to finish
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,353 @@
+"""
+A work queue of tracking numbers, shared by polling nodes.
+
+Several hosts can poll one fleet without hand-split lists, and without
+tracking the same package twice at once, by sharing a :class:`WorkQueue`.
+It's a SQLite database, so there's no service to run; put it on storage
+all the nodes can reach, with working file locks.  It uses SQLite's
+rollback journal, as WAL mode needs memory shared between the processes
+and doesn't work on network filesystems.  If every node runs on one host,
+``journal_mode='wal'`` lets readers and the writer overlap.
+
+Nodes *claim* numbers that are due, which leases them for ``lease_time``
+seconds.  While a lease is held, no other node can claim that number.
+When the poll is done, the node completes the lease, which schedules the
+next poll (or drops the number once it's delivered), or releases it to be
+retried.  A lease that isn't completed in time, i.e. the node died,
+expires, and the number can be claimed again::
+
+    >>> queue = WorkQueue('/shared/packagetrack-queue.db')
+    >>> queue.add(numbers)
+    >>> queue.run(tracker, interval=900)
+
+:meth:`WorkQueue.run` waits ``poll_interval`` seconds whenever there was
+nothing to track; call :meth:`WorkQueue.work` for one pass.
+
+Each lease has a token, and completing or releasing a lease that expired
+and was claimed by someone else does nothing, so a slow node can't
+overwrite a newer result's schedule.  Keep ``lease_time`` longer than a
+poll takes, or call :meth:`WorkQueue.extend`.
+"""
+import collections
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .data       import FULL
+from .exceptions import InvalidTrackingNumber, TrackingNotFound, UnsupportedShipper
+
+log = logging.getLogger(__name__)
+
+Lease = collections.namedtuple('Lease', ('tracking_number', 'token', 'expires'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    tracking_number TEXT PRIMARY KEY,
+    due             REAL NOT NULL,
+    owner           TEXT,
+    token           TEXT,
+    expires         REAL,
+    attempts        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS queue_due ON queue (due);
+CREATE INDEX IF NOT EXISTS queue_expires ON queue (expires);
+"""
+
+
+class WorkQueue:
+    """
+    A lease-based queue of tracking numbers to poll.
+
+    Args:
+        path (str): the database file, shared by all the nodes
+        node (str): this node's name, default host:pid
+        lease_time (float): seconds a claim is held
+        journal_mode (str): SQLite journal mode, 'delete' for a database
+            on shared storage, or 'wal' when all the nodes are on one host
+        clock (callable): time source, for testing
+    """
+
+    def __init__(self,
+                 path,
+                 node=None,
+                 lease_time=300.0,
+                 journal_mode='delete',
+                 clock=time.time):
+
+        if journal_mode.lower() not in ('delete', 'wal'):
+            raise ValueError("journal_mode must be 'delete' or 'wal'")
+
+        self.path = os.path.expanduser(path)
+        self.node = node or '{}:{}'.format(socket.gethostname(), os.getpid())
+        self.lease_time = lease_time
+        self.clock = clock
+
+        self._lock = threading.Lock()
+
+        # transactions are managed here, with BEGIN IMMEDIATE, so claims
+        # are atomic across processes
+        self._conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None,
+                                     check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode={}'.format(journal_mode.upper()))
+            self._conn.executescript(SCHEMA)
+
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+
+    def _transaction(self, func, *args):
+        # run func(cursor, *args) in a write transaction
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(cur, *args)
+            except BaseException:
+                cur.execute('ROLLBACK')
+                raise
+            cur.execute('COMMIT')
+            return result
+
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+
+    def add(self, tracking_numbers, due=None):
+        """
+        Add numbers to the queue.  Numbers already queued keep their
+        schedule.
+
+        Args:
+            tracking_numbers (iterable): tracking numbers
+            due (float): when to first poll them, default now
+        """
+        due = self.clock() if due is None else due
+        self._transaction(lambda cur: cur.executemany(
+            'INSERT OR IGNORE INTO queue (tracking_number, due) VALUES (?, ?)',
+            ((num, due) for num in tracking_numbers)))
+
+
+    def remove(self, tracking_numbers):
+        """
+        Remove numbers from the queue, leased or not.
+
+        Args:
+            tracking_numbers (iterable): tracking numbers
+        """
+        self._transaction(lambda cur: cur.executemany(
+            'DELETE FROM queue WHERE tracking_number = ?',
+            ((num,) for num in tracking_numbers)))
+
+
+    def claim(self, limit=100):
+        """
+        Lease up to ``limit`` numbers that are due, oldest first.  Numbers
+        whose lease expired are due again.
+
+        Args:
+            limit (int): the most to claim
+
+        Returns:
+            list: of Lease
+        """
+        def claim(cur):
+            now = self.clock()
+            expires = now + self.lease_time
+            rows = cur.execute(
+                'SELECT tracking_number FROM queue '
+                'WHERE due <= ? AND (expires IS NULL OR expires <= ?) '
+                'ORDER BY due LIMIT ?', (now, now, limit)).fetchall()
+
+            leases = [Lease(num, uuid.uuid4().hex, expires) for num, in rows]
+            cur.executemany(
+                'UPDATE queue SET owner = ?, token = ?, expires = ?, attempts = attempts + 1 '
+                'WHERE tracking_number = ?',
+                ((self.node, lease.token, expires, lease.tracking_number) for lease in leases))
+            return leases
+
+        leases = self._transaction(claim)
+        if leases:
+            log.debug("%s: claimed %d numbers", self.node, len(leases))
+        return leases
+
+
+    def _finish(self, lease, due, attempts='attempts'):
+        # end a lease, rescheduling or removing the number.  Returns False
+        # if the lease had already expired and been claimed again.
+        def finish(cur):
+            if due is None:
+                cur.execute('DELETE FROM queue WHERE tracking_number = ? AND token = ?',
+                            (lease.tracking_number, lease.token))
+            else:
+                cur.execute(
+                    'UPDATE queue SET due = ?, owner = NULL, token = NULL, expires = NULL, '
+                    'attempts = %s WHERE tracking_number = ? AND token = ?' % attempts,
+                    (due, lease.tracking_number, lease.token))
+            return cur.rowcount == 1
+
+        held = self._transaction(finish)
+        if not held:
+            log.warning("%s: lease on %s was lost", self.node, lease.tracking_number)
+        return held
+
+
+    def complete(self, lease, next_due=None):
+        """
+        Finish a successful poll.
+
+        Args:
+            lease (Lease)
+            next_due (float): when to poll again, or None to drop the
+                number, i.e. it's been delivered
+
+        Returns:
+            bool: False if the lease had been lost
+        """
+        return self._finish(lease, next_due, attempts='0')
+
+
+    def release(self, lease, delay=0.0):
+        """
+        Give a lease back without polling, i.e. after a failure.
+
+        Args:
+            lease (Lease)
+            delay (float): seconds until it's due again
+
+        Returns:
+            bool: False if the lease had been lost
+        """
+        return self._finish(lease, self.clock() + delay)
+
+
+    def extend(self, lease, seconds=None):
+        """
+        Extend a lease, for a poll that's taking a while.
+
+        Args:
+            lease (Lease)
+            seconds (float): from now, default ``lease_time``
+
+        Returns:
+            Lease: the extended lease, or None if it had been lost
+        """
+        expires = self.clock() + (self.lease_time if seconds is None else seconds)
+
+        def extend(cur):
+            cur.execute('UPDATE queue SET expires = ? WHERE tracking_number = ? AND token = ?',
+                        (expires, lease.tracking_number, lease.token))
+            return cur.rowcount == 1
+
+        if self._transaction(extend):
+            return lease._replace(expires=expires)
+
+
+    def requeue_expired(self):
+        """
+        Clear expired leases.  Claiming treats them as free anyway, this
+        is for housekeeping and monitoring.
+
+        Returns:
+            int: the number of leases cleared
+        """
+        def requeue(cur):
+            cur.execute('UPDATE queue SET owner = NULL, token = NULL, expires = NULL '
+                        'WHERE expires <= ?', (self.clock(),))
+            return cur.rowcount
+
+        count = self._transaction(requeue)
+        if count:
+            log.info("%s: re-queued %d expired leases", self.node, count)
+        return count
+
+
+    def stats(self):
+        """
+        Returns:
+            dict: counts of ``queued`` numbers, those ``due`` and unleased,
+            ``leased``, and ``expired`` leases
+        """
+        now = self.clock()
+        with self._lock:
+            queued, due, leased, expired = self._conn.execute(
+                'SELECT COUNT(*), '
+                'COALESCE(SUM(due <= ? AND expires IS NULL), 0), '
+                'COALESCE(SUM(expires > ?), 0), '
+                'COALESCE(SUM(expires <= ?), 0) FROM queue', (now, now, now)).fetchone()
+        return {'queued': queued, 'due': due, 'leased': leased, 'expired': expired}
+
+
+    def work(self, tracker, limit=100, interval=900.0, retry_delay=300.0, workers=4,
+             priority='low', detail=FULL):
+        """
+        Claim due numbers, track them, and complete or release the leases.
+        Delivered packages, and numbers that can't be tracked, leave the
+        queue.
+
+        Args:
+            tracker (PackageTracker)
+            limit (int): the most to claim
+            interval (float): seconds until a package is polled again
+            retry_delay (float): seconds until a failure is retried
+            workers (int): threads to track with
+            priority (str): see ``track()``
+            detail (str): see ``track()``
+
+        Returns:
+            int: the number of packages tracked
+        """
+        leases = self.claim(limit)
+        if not leases:
+            return 0
+
+        results = tracker.track_many([lease.tracking_number for lease in leases],
+                                     priority=priority, detail=detail, workers=workers)
+        tracked = 0
+        for lease in leases:
+            result = results[lease.tracking_number]
+            if isinstance(result, (UnsupportedShipper, InvalidTrackingNumber)):
+                log.info("%s: can't be tracked, dropping it: %r", lease.tracking_number, result)
+                self.complete(lease)
+            elif isinstance(result, TrackingNotFound):
+                # maybe the label isn't active yet
+                self.release(lease, interval)
+            elif isinstance(result, Exception):
+                self.release(lease, retry_delay)
+            else:
+                tracked += 1
+                self.complete(lease, None if result.is_terminal else self.clock() + interval)
+        return tracked
+
+
+    def run(self, tracker, poll_interval=10.0, stop=None, **kwargs):
+        """
+        Work until ``stop`` is set, waiting ``poll_interval`` seconds
+        whenever nothing was tracked, rather than asking the database
+        again right away.
+
+        Args:
+            tracker (PackageTracker)
+            poll_interval (float): seconds to wait when nothing is due
+            stop (threading.Event): set it to stop, default run forever
+            kwargs: passed to work()
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                tracked = self.work(tracker, **kwargs)
+            except Exception:
+                log.exception("Work queue pass failed")
+                tracked = 0
+
+            if not tracked:
+                stop.wait(poll_interval)
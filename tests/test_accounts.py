@@ -0,0 +1,106 @@
+import unittest
+from configparser import ConfigParser
+
+from packagetracker.accounts   import AccountPool, RateLimiter
+from packagetracker.exceptions import Throttled, TrackFailed, TransientError
+
+CONFIG = '''
+[UPS]
+license_number = BASE
+requests_per_second = 2
+
+[UPS:1]
+user_id = one
+password = pw1
+
+[UPS:2]
+user_id = two
+password = pw2
+license_number = TWO
+
+[USPS]
+userid = only
+'''
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestAccountPool(unittest.TestCase):
+
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config.read_string(CONFIG)
+        self.clock = FakeClock()
+        self.pool = AccountPool(self.config, 'UPS', clock=self.clock, sleep=self.clock.sleep)
+
+
+    def test_sections(self):
+        assert [a.name for a in self.pool] == ['UPS:1', 'UPS:2']
+
+        # a plain section is a single account
+        pool = AccountPool(self.config, 'USPS')
+        assert [a.name for a in pool] == ['USPS']
+        assert pool.acquire().get('userid') == 'only'
+
+        assert len(AccountPool(self.config, 'FedEx')) == 0
+
+
+    def test_not_configured(self):
+        # a config mistake isn't something to retry
+        with self.assertRaises(TrackFailed) as cm:
+            AccountPool(self.config, 'FedEx').acquire()
+        assert not isinstance(cm.exception, TransientError)
+
+
+    def test_inherit_options(self):
+        one, two = self.pool.accounts
+        assert one.get('license_number') == 'BASE'
+        assert two.get('license_number') == 'TWO'
+
+
+    def test_round_robin(self):
+        names = [self.pool.acquire().name for _ in range(4)]
+        assert names == ['UPS:1', 'UPS:2', 'UPS:1', 'UPS:2']
+
+
+    def test_rate_limit(self):
+        # 2 per second, per account, so 4 requests before we wait
+        for _ in range(4):
+            self.pool.acquire()
+        assert self.clock.now == 0
+
+        self.pool.acquire()
+        assert self.clock.now > 0
+
+
+    def test_throttle(self):
+        one, two = self.pool.accounts
+        self.pool.throttle(one, 30)
+        assert [self.pool.acquire().name for _ in range(2)] == ['UPS:2', 'UPS:2']
+
+        self.pool.throttle(two, 30)
+        with self.assertRaises(Throttled):
+            self.pool.acquire()
+
+        self.clock.now += 31
+        assert self.pool.acquire().name == 'UPS:1'
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_refill(self):
+        limiter = RateLimiter(1)
+        assert limiter.delay(0) == 0
+        limiter.take()
+        assert limiter.delay(0.5) == 0.5
+        assert limiter.delay(1.0) == 0
@@ -0,0 +1,154 @@
+import unittest
+
+from packagetracker            import PackageTracker
+from packagetracker.breaker    import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from packagetracker.data       import FULL
+from packagetracker.exceptions import CircuitOpen, Throttled, TransientError, TrackFailed
+from packagetracker.service    import BaseInterface
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise TransientError('HTTP 503')
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('test', window=10, min_calls=4, error_rate=0.5,
+                                      reset_timeout=30, clock=self.clock)
+
+
+    def trip(self):
+        for _ in range(4):
+            with self.assertRaises(TransientError):
+                self.breaker.call(fail)
+
+
+    def test_opens_on_errors(self):
+        assert self.breaker.state == CLOSED
+        self.trip()
+        assert self.breaker.state == OPEN
+
+        with self.assertRaises(CircuitOpen):
+            self.breaker.call(lambda: 'ok')
+        assert self.breaker.stats()['rejected'] == 1
+
+
+    def test_permanent_errors_dont_count(self):
+        def not_found():
+            raise TrackFailed('no such package')
+
+        for _ in range(10):
+            with self.assertRaises(TrackFailed):
+                self.breaker.call(not_found)
+        assert self.breaker.state == CLOSED
+
+
+    def test_opens_on_latency(self):
+        def slow():
+            self.clock.now += 20
+            return 'ok'
+
+        breaker = CircuitBreaker('test', min_calls=4, slow_call_duration=10,
+                                 slow_call_rate=0.5, clock=self.clock)
+        for _ in range(4):
+            breaker.call(slow)
+        assert breaker.state == OPEN
+
+
+    def test_half_open_recovers(self):
+        self.trip()
+        self.clock.now += 31
+        assert self.breaker.state == HALF_OPEN
+
+        assert self.breaker.call(lambda: 'ok') == 'ok'
+        assert self.breaker.state == CLOSED
+
+
+    def test_half_open_reopens(self):
+        self.trip()
+        self.clock.now += 31
+
+        with self.assertRaises(TransientError):
+            self.breaker.call(fail)
+        assert self.breaker.state == OPEN
+
+
+    def test_stale_calls_ignored(self):
+        # a call let through while closed finishes after the breaker
+        # opened and went half-open; it isn't the trial
+        def straggler():
+            self.trip()
+            self.clock.now += 31
+            assert self.breaker.state == HALF_OPEN
+            return 'ok'
+
+        assert self.breaker.call(straggler) == 'ok'
+        assert self.breaker.state == HALF_OPEN
+
+        # or finishes after the breaker was reset
+        def reset():
+            self.breaker.reset()
+            raise TransientError('HTTP 503')
+
+        with self.assertRaises(TransientError):
+            self.breaker.call(reset)
+        assert self.breaker.state == CLOSED
+        assert self.breaker.stats()['calls'] == 0
+
+        self.trip()
+        self.clock.now += 31
+        assert self.breaker.call(lambda: 'ok') == 'ok'
+        assert self.breaker.state == CLOSED
+        assert self.breaker._trials == 0
+
+
+    def test_throttled_isnt_failure(self):
+        def throttled():
+            raise Throttled('HTTP 429')
+
+        for _ in range(10):
+            with self.assertRaises(Throttled):
+                self.breaker.call(throttled)
+        assert self.breaker.state == CLOSED
+
+
+class FakeInterface(BaseInterface):
+
+    def identify(self, num):
+        return num.startswith('FAKE')
+
+    def track(self, num, detail=FULL):
+        raise TransientError('down')
+
+
+class TestTrackerBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = PackageTracker(testing=True,
+                                      breaker_options={'min_calls': 2})
+        self.tracker.register_interface('Fake', FakeInterface(self.tracker.config))
+
+
+    def test_fail_fast(self):
+        package = self.tracker.package('FAKE123')
+        for _ in range(2):
+            with self.assertRaises(TransientError):
+                package.track()
+
+        with self.assertRaises(CircuitOpen):
+            package.track()
+
+        states = self.tracker.breaker_states()
+        assert states['Fake']['state'] == OPEN
+        assert states['UPS']['state'] == CLOSED
@@ -0,0 +1,230 @@
+import threading
+import time
+import unittest
+
+from packagetracker            import PackageTracker
+from packagetracker.cache      import NegativeCache, TrackingCache
+from packagetracker.data       import FULL, TrackingInfo
+from packagetracker.exceptions import (InvalidTrackingNumber, TrackingNotFound,
+                                       TransientError, CircuitOpen)
+from packagetracker.service    import BaseInterface
+from packagetracker.status     import Status
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNegativeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = NegativeCache(base_interval=10, max_interval=35, clock=self.clock)
+
+
+    def test_miss(self):
+        self.cache.check(('UPS', '1Z'))
+
+
+    def test_hit(self):
+        self.cache.record(('UPS', '1Z'), InvalidTrackingNumber('bad'))
+        with self.assertRaises(InvalidTrackingNumber):
+            self.cache.check(('UPS', '1Z'))
+
+
+    def test_backoff(self):
+        key = ('USPS', '9400')
+
+        # 10s, then 20s, then capped at 35s
+        for interval in (10, 20, 35, 35):
+            self.cache.record(key, TrackingNotFound('no record'))
+            self.clock.now += interval - 1
+            with self.assertRaises(TrackingNotFound):
+                self.cache.check(key)
+            self.clock.now += 1
+            self.cache.check(key)
+
+
+    def test_forget(self):
+        self.cache.record('key', TrackingNotFound('no record'))
+        self.cache.forget('key')
+        self.cache.check('key')
+
+
+    def test_max_entries(self):
+        cache = NegativeCache(max_entries=2)
+        for ii in range(5):
+            cache.record(ii, TrackingNotFound())
+        assert len(cache) == 2
+
+
+class NotFoundInterface(BaseInterface):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def identify(self, num):
+        return num.startswith('FAKE')
+
+    def track(self, num, detail=FULL):
+        self.calls += 1
+        raise TrackingNotFound(num)
+
+
+class TestTrackerNegativeCache(unittest.TestCase):
+
+    def test_cached(self):
+        tracker = PackageTracker(testing=True, negative_cache=NegativeCache())
+        iface = NotFoundInterface(tracker.config)
+        tracker.register_interface('Fake', iface)
+
+        package = tracker.package('FAKE123')
+        for _ in range(3):
+            with self.assertRaises(TrackingNotFound):
+                package.track()
+        assert iface.calls == 1
+
+
+class TestTrackingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TrackingCache(soft_ttl=10, hard_ttl=100, clock=self.clock)
+        self.calls = []
+
+
+    def tearDown(self):
+        self.cache.close()
+
+
+    def fetch(self):
+        self.calls.append(1)
+        return len(self.calls)
+
+
+    def test_fresh(self):
+        assert self.cache.get('key', self.fetch) == 1
+        self.clock.now += 5
+        assert self.cache.get('key', self.fetch) == 1
+        assert len(self.calls) == 1
+
+
+    def test_stale_while_revalidate(self):
+        self.cache.get('key', self.fetch)
+        self.clock.now += 50
+
+        # stale value returned immediately, refreshed in the background
+        assert self.cache.get('key', self.fetch) == 1
+        self.cache.close()
+        assert self.cache.peek('key') == 2
+
+
+    def test_refresh_deduplicated(self):
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+            return self.fetch()
+
+        self.cache.put('key', 0)
+        self.clock.now += 50
+        for _ in range(5):
+            assert self.cache.get('key', slow_fetch) == 0
+
+        release.set()
+        self.cache.close()
+        assert len(self.calls) == 1
+
+
+    def test_miss_deduplicated(self):
+        # concurrent misses wait for one fetch, and share its result or error
+        for error in (None, TransientError('HTTP 503')):
+            release = threading.Event()
+
+            def slow_fetch():
+                release.wait(5)
+                if error is not None:
+                    raise error
+                return self.fetch()
+
+            self.cache.forget('key')
+            results = []
+
+            def get():
+                try:
+                    results.append(self.cache.get('key', slow_fetch))
+                except TransientError as e:
+                    results.append(e)
+
+            misses = self.cache.stats()['misses'] + 5
+            threads = [threading.Thread(target=get) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            while self.cache.stats()['misses'] < misses:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+            assert len(results) == 5
+            assert all(r is results[0] for r in results)
+        assert len(self.calls) == 1
+
+
+    def test_terminal_never_stale(self):
+        info = TrackingInfo('1Z9999999999999999', None, 'DELIVERED', None,
+                            status_code=Status.DELIVERED)
+        self.cache.put('key', info)
+        self.clock.now += 1000
+        assert self.cache.get('key', self.fetch) is info
+        assert self.calls == []
+
+
+    def test_hard_ttl(self):
+        self.cache.get('key', self.fetch)
+        self.clock.now += 101
+        assert self.cache.get('key', self.fetch) == 2
+
+
+    def test_failed_refresh_keeps_entry(self):
+        def broken():
+            raise TransientError('down')
+
+        self.cache.put('key', 0)
+        self.clock.now += 50
+        self.cache.refresh('key', broken).result()
+        assert self.cache.peek('key') == 0
+
+
+class DownInterface(BaseInterface):
+
+    def identify(self, num):
+        return num.startswith('FAKE')
+
+    def track(self, num, detail=FULL):
+        raise TransientError('down')
+
+
+class TestTrackerCache(unittest.TestCase):
+
+    def test_serve_cached_when_open(self):
+        cache = TrackingCache(soft_ttl=0, hard_ttl=0)
+        tracker = PackageTracker(testing=True, cache=cache,
+                                 breaker_options={'min_calls': 1})
+        tracker.register_interface('Fake', DownInterface(tracker.config))
+
+        package = tracker.package('FAKE123')
+        with self.assertRaises(TransientError):
+            package.track()
+        with self.assertRaises(CircuitOpen):
+            package.track()
+
+        cache.put(('Fake', 'FAKE123'), 'cached')
+        assert package.track() == 'cached'
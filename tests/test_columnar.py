@@ -0,0 +1,119 @@
+import datetime
+import unittest
+import warnings
+
+from packagetracker            import columnar
+from packagetracker.data       import TrackingInfo
+from packagetracker.exceptions import TrackingNotFound
+from packagetracker.status     import Status
+
+np = columnar.np
+
+DAY = datetime.timedelta(days=1)
+START = datetime.datetime(2020, 6, 1, 8, 0)
+
+
+def make_info(num, service, days, delivered=True, expected=None):
+    # an info with a pickup, an arrival scan 1 day later, and delivery after 'days'
+    info = TrackingInfo(num, expected, 'X', START, service=service,
+                        status_code=Status.DELIVERED if delivered else Status.IN_TRANSIT)
+    if delivered:
+        info.add_event(START + days * DAY, 'DEST,GA,US', 'DELIVERED', Status.DELIVERED)
+    info.add_event(START + DAY, 'HUB,TN,US', 'ARRIVAL SCAN', Status.IN_TRANSIT)
+    info.add_event(START, 'ORIGIN,NY,US', 'PICKUP', Status.PICKED_UP)
+    return info
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.table = columnar.to_columns([
+            make_info('A', 'Ground', 3, expected=datetime.date(2020, 6, 4)),
+            TrackingNotFound('X'),
+            make_info('B', 'Air', 2, expected=datetime.date(2020, 6, 2)),
+            make_info('C', 'Ground', 5, delivered=False, expected=datetime.date(2020, 6, 5)),
+            TrackingInfo('D', None, 'X', None),
+        ], shippers={'A': 'UPS', 'B': 'FedEx'})
+
+
+    def test_columns(self):
+        t = self.table
+        assert len(t) == 4
+        self.assertEqual(list(t.tracking_numbers), ['A', 'B', 'C', 'D'])
+        self.assertEqual(t.service_names, ['Ground', 'Air'])
+        self.assertEqual(list(t.service), [0, 1, 0, columnar.MISSING])
+        self.assertEqual(list(t.shipper), [0, 1, columnar.MISSING, columnar.MISSING])
+        self.assertEqual(list(t.status), [Status.DELIVERED, Status.DELIVERED, Status.IN_TRANSIT, 0])
+        assert np.isnat(t.delivery_date[3])
+
+        # events are in time order per package
+        self.assertEqual(list(t.package), [0, 0, 0, 1, 1, 1, 2, 2])
+        self.assertEqual(t.time[0], np.datetime64(START))
+        self.assertEqual([t.location_names[c] for c in t.location[:3]],
+                         ['ORIGIN,NY,US', 'HUB,TN,US', 'DEST,GA,US'])
+        self.assertEqual(t.event_status[2], Status.DELIVERED)
+
+
+    def test_time_to_delivery(self):
+        transit = columnar.time_to_delivery(self.table)
+        self.assertEqual(transit[0], np.timedelta64(3, 'D'))
+        self.assertEqual(transit[1], np.timedelta64(2, 'D'))
+        assert np.isnat(transit[2])
+        assert np.isnat(transit[3])
+
+
+    def test_lanes(self):
+        origin, destination = columnar.lanes(self.table)
+        names = self.table.location_names
+        self.assertEqual(names[origin[0]], 'ORIGIN,NY,US')
+        self.assertEqual(names[destination[1]], 'DEST,GA,US')
+        self.assertEqual(destination[2], columnar.MISSING)
+        self.assertEqual(origin[3], columnar.MISSING)
+
+
+    def test_dwell(self):
+        dwell = columnar.mean_dwell_by_location(self.table)
+        self.assertEqual(dwell['ORIGIN,NY,US'], np.timedelta64(1, 'D'))
+        # 2 days, 1 day; C is still there
+        self.assertEqual(dwell['HUB,TN,US'], np.timedelta64(36, 'h'))
+        assert 'DEST,GA,US' not in dwell
+
+
+    def test_on_time(self):
+        # the estimates from while they were in transit
+        earlier = columnar.to_columns([
+            make_info('B', 'Air', 2, delivered=False, expected=datetime.date(2020, 6, 2)),
+            make_info('A', 'Ground', 3, delivered=False, expected=datetime.date(2020, 6, 4)),
+        ])
+        expected = columnar.expected_dates(self.table, earlier)
+        self.assertEqual(expected[1], np.datetime64('2020-06-02'))
+        assert np.isnat(expected[2])
+
+        self.assertEqual(list(columnar.lateness(self.table, expected)[:2].astype(int)), [0, 1])
+        stats = columnar.on_time_stats(self.table, expected)
+        self.assertEqual(stats, {'delivered': 2, 'early': 0, 'on_time': 1, 'late': 1,
+                                 'on_time_rate': 0.5})
+
+
+    def test_aware(self):
+        # offsets are dropped, not converted to UTC
+        tz = datetime.timezone(datetime.timedelta(hours=-5))
+        info = make_info('A', 'Ground', 3)
+        late = START.replace(hour=22)
+        info.delivery_date = late.replace(tzinfo=tz)
+        info.events[0].date = (late + 3 * DAY).replace(tzinfo=tz)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            table = columnar.to_columns([info])
+        self.assertEqual(table.delivery_date[0], np.datetime64(late))
+        self.assertEqual(table.time[-1], np.datetime64(late + 3 * DAY))
+        self.assertEqual(int(columnar.lateness(table, table.delivery_date)[0].astype(int)), 3)
+
+
+    def test_empty(self):
+        table = columnar.to_columns([])
+        assert len(table) == 0
+        assert len(columnar.time_to_delivery(table)) == 0
+        expected = columnar.expected_dates(table, table)
+        self.assertEqual(columnar.on_time_stats(table, expected)['on_time_rate'], None)
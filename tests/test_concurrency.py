@@ -0,0 +1,178 @@
+import collections
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from packagetracker            import PackageTracker
+from packagetracker.cache      import NegativeCache, TrackingCache
+from packagetracker.exceptions import TrackingNotFound
+from packagetracker.quota      import QuotaLedger
+
+CONFIG = """
+[USPS]
+userid = stress
+password = stress
+
+[FedEx]
+password = stress
+account_number = 1
+meter_number = 1
+
+[FedEx:1]
+key = one
+
+[FedEx:2]
+key = two
+"""
+
+RESPONSE = '''<?xml version="1.0" encoding="UTF-8"?>
+<TrackResponse><TrackInfo ID="{num}">
+<TrackSummary><EventTime>9:10 am</EventTime><EventDate>June 8, 2020</EventDate>
+<Event>Arrived {num}</Event><EventCity>ANYTOWN</EventCity><EventState>GA</EventState>
+<EventZIPCode>30301</EventZIPCode><EventCountry></EventCountry></TrackSummary>
+<TrackDetail><EventTime>5:15 pm</EventTime><EventDate>June 7, 2020</EventDate>
+<Event>Departed {num}</Event><EventCity>ATLANTA</EventCity><EventState>GA</EventState>
+<EventZIPCode>30303</EventZIPCode><EventCountry></EventCountry></TrackDetail>
+</TrackInfo></TrackResponse>'''
+
+NOT_FOUND = '''<?xml version="1.0" encoding="UTF-8"?>
+<TrackResponse><TrackInfo ID="{num}"><Error><Number>-2147219283</Number>
+<Description>No record of that item</Description></Error></TrackInfo></TrackResponse>'''
+
+
+class StubUSPS(BaseHTTPRequestHandler):
+    """Answers USPS TrackV2 requests; numbers starting with EX aren't found."""
+
+    protocol_version = 'HTTP/1.1'
+    requests = collections.Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        num = re.search(r'TrackID ID="([^"]+)"', unquote(self.path)).group(1)
+        with self.lock:
+            self.requests[num] += 1
+
+        body = (NOT_FOUND if num.startswith('EX') else RESPONSE).format(num=num).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConcurrency(unittest.TestCase):
+    """Hammer one tracker from many threads."""
+
+    threads = 16
+    rounds = 40
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        config = os.path.join(self.dir.name, 'config')
+        with open(config, 'w') as f:
+            f.write(CONFIG)
+
+        StubUSPS.requests.clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubUSPS)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.cache = TrackingCache(soft_ttl=3600)
+        self.quota = QuotaLedger()
+        self.tracker = PackageTracker(config, testing=True, cache=self.cache,
+                                      negative_cache=NegativeCache(), quota=self.quota)
+        usps = self.tracker.interface('USPS')
+        usps.api_url = 'http://127.0.0.1:%d/ShippingAPI.dll?API=TrackV2&XML=' % self.server.server_port
+
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache.close()
+        self.dir.cleanup()
+
+
+    def test_track(self):
+        numbers = ['EA%07d00US' % i for i in range(60)] + ['EX%07d00US' % i for i in range(10)]
+        errors = []
+        barrier = threading.Barrier(self.threads)
+
+        def hammer(ii):
+            barrier.wait()
+            try:
+                for jj in range(self.rounds):
+                    num = numbers[(ii * 7 + jj) % len(numbers)]
+                    try:
+                        info = self.tracker.package(num).track()
+                    except TrackingNotFound:
+                        assert num.startswith('EX'), num
+                        continue
+
+                    # nobody else's result
+                    assert info.tracking_number == num
+                    assert info.status == 'Arrived ' + num, info.status
+                    assert [e.detail for e in info.events] == ['Departed ' + num]
+
+                if ii % 4 == 0:
+                    results = self.tracker.track_many(numbers[:20], workers=4)
+                    assert all(r.tracking_number == n for n, r in results.items())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=hammer, args=(ii,)) for ii in range(self.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == [], errors[:3]
+
+        # every number was tracked, and the quota ledger counted every request
+        assert set(StubUSPS.requests) == set(numbers)
+        self.assertEqual(self.quota.usage('USPS'), sum(StubUSPS.requests.values()))
+
+        # bad numbers are remembered, so they're only sent once or so each
+        assert all(StubUSPS.requests[n] <= self.threads for n in numbers if n.startswith('EX'))
+
+
+    def test_fedex_config(self):
+        fedex = self.tracker.interface('FedEx')
+        barrier = threading.Barrier(self.threads)
+        configs = []
+
+        def get_cfg():
+            barrier.wait()
+            for account in fedex.accounts:
+                configs.append((account.name, id(fedex._get_cfg(account))))
+
+        threads = [threading.Thread(target=get_cfg) for ii in range(self.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # one config per account, however many threads asked at once
+        self.assertEqual(len(set(configs)), 2)
+
+
+    def test_sessions(self):
+        usps = self.tracker.interface('USPS')
+        sessions = []
+
+        def get_session():
+            sessions.append(usps.session)
+            assert usps.session is sessions[-1]
+
+        threads = [threading.Thread(target=get_session) for ii in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(set(map(id, sessions))) == 4
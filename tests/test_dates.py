@@ -0,0 +1,90 @@
+import datetime
+import unittest
+
+from packagetracker import dates
+
+MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December')
+
+
+def strptime_or_error(s, fmt):
+    # the result of strptime, or the exception class it raises
+    try:
+        return datetime.datetime.strptime(s, fmt)
+    except ValueError:
+        return ValueError
+
+
+def parse_or_error(func, s):
+    try:
+        return func(s)
+    except ValueError:
+        return ValueError
+
+
+class TestDates(unittest.TestCase):
+    """The fast parsers must match strptime exactly."""
+
+    def check(self, func, fmt, strings, convert):
+        for s in strings:
+            expected = strptime_or_error(s, fmt)
+            if expected is not ValueError:
+                expected = convert(expected)
+            self.assertEqual(parse_or_error(func, s), expected, s)
+
+
+    def test_ymd(self):
+        day = datetime.date(1999, 1, 1)
+        strings = []
+        while day.year < 2031:
+            strings.append(day.strftime('%Y%m%d'))
+            day += datetime.timedelta(days=1)
+
+        strings += ['20100230', '20101301', '20100001', '20100100', '2010061',
+                    '2010-06-19', '', 'abcdefgh', '00000101']
+        self.check(dates.parse_ymd, '%Y%m%d', strings, lambda d: d.date())
+
+
+    def test_hms(self):
+        strings = ['%02d%02d%02d' % (h, m, s)
+                   for h in range(25) for m in range(0, 61, 7) for s in range(0, 61, 13)]
+        strings += ['0054', '1234567', '', '12:30:00']
+        self.check(dates.parse_hms, '%H%M%S', strings, lambda d: d.time())
+
+
+    def test_ymd_hms(self):
+        self.assertEqual(dates.parse_ymd_hms('20100619', '005400'),
+                         datetime.datetime(2010, 6, 19, 0, 54))
+
+
+    def test_month_day_year(self):
+        strings = []
+        for month in MONTHS:
+            for day in ('0', '00', '1', '01', '9', '10', '28', '29', '30', '31', '32'):
+                for year in ('2019', '2020', '999'):
+                    strings.append('%s %s, %s' % (month, day, year))
+
+        strings += ['june 19, 2010', 'JUNE 19, 2010', 'Jun 19, 2010', 'June  19, 2010',
+                    'June 19 2010', 'June 19,2010', '', 'Smarch 1, 2010', 'June 19, 2010 ']
+        self.check(dates.parse_month_day_year, '%B %d, %Y', strings, lambda d: d.date())
+
+
+    def test_clock_time(self):
+        strings = []
+        for hour in ('0', '00', '1', '01', '9', '09', '10', '12', '13'):
+            for minute in ('0', '00', '5', '05', '30', '59', '60', '123'):
+                for ampm in ('am', 'pm', 'AM', 'PM', 'xm'):
+                    strings.append('%s:%s %s' % (hour, minute, ampm))
+
+        strings += ['12:30', '12:30pm', '12:30  pm', '', ':30 pm', '12: pm']
+        self.check(dates.parse_clock_time, '%I:%M %p', strings, lambda d: d.time())
+
+
+    def test_local_time(self):
+        tz = datetime.timezone(datetime.timedelta(hours=-4))
+        when = datetime.datetime(2020, 6, 5, 10, 15)
+        self.assertEqual(dates.local_time(when.replace(tzinfo=tz)), when)
+        assert dates.local_time(when.replace(tzinfo=tz)).tzinfo is None
+        self.assertEqual(dates.local_time(when.date()), when.date())
+        assert dates.local_time(None) is None
+        self.assertEqual(dates.parse_iso_local('2020-06-05T10:15:00-04:00'), when)
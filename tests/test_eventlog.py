@@ -0,0 +1,134 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from packagetracker.data     import TrackingInfo, TrackingEvent
+from packagetracker.eventlog import MAX_FIELD, EventLog
+from packagetracker.status   import Status
+
+NOW = datetime.datetime(2020, 6, 5, 12, 30, 15, 123)
+
+
+def make_events(n):
+    return [TrackingEvent(NOW - datetime.timedelta(hours=i), 'ANYTOWN,GA,US',
+                          'SCAN %d' % i, Status.IN_TRANSIT) for i in range(n)]
+
+
+class TestEventLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'events')
+        self.log = EventLog(self.path)
+
+
+    def tearDown(self):
+        self.log.close()
+        self.dir.cleanup()
+
+
+    def test_history(self):
+        self.log.append('A', make_events(3))
+        self.log.append('B', [TrackingEvent(datetime.date(2020, 6, 5), None, 'Ünïcode', Status.DELIVERED),
+                              TrackingEvent(None, 'X', 'no date')])
+        self.log.append('A', make_events(1))
+        assert len(self.log) == 6
+
+        history = self.log.history('A')
+        self.assertEqual([e.detail for e in history], ['SCAN 0', 'SCAN 1', 'SCAN 2', 'SCAN 0'])
+        self.assertEqual(history[0].date, NOW)
+        self.assertEqual(history[0].location, 'ANYTOWN,GA,US')
+        self.assertEqual(history[0].status_code, Status.IN_TRANSIT)
+
+        b = self.log.history('B')
+        self.assertEqual(b[0].date, datetime.date(2020, 6, 5))
+        self.assertEqual(b[0].detail, 'Ünïcode')
+        assert b[0].location is None
+        assert b[1].date is None
+        self.assertEqual(b[0].status_code, Status.DELIVERED)
+        assert self.log.history('C') == []
+
+
+    def test_scan(self):
+        info = TrackingInfo('A', None, 'IN TRANSIT', NOW)
+        info.events = make_events(2)
+        self.log.record(info)
+        self.log.append('B', make_events(1))
+
+        records = list(self.log.scan())
+        self.assertEqual([(r.tracking_number, r.detail) for r in records],
+                         [('A', 'SCAN 0'), ('A', 'SCAN 1'), ('B', 'SCAN 0')])
+
+        # appending mid-scan doesn't break it
+        scan = self.log.scan()
+        next(scan)
+        self.log.append('C', make_events(50))
+        assert len(list(scan)) == 2
+        assert len(list(self.log.scan())) == 53
+
+
+    def test_scan_compact(self):
+        # scans started before a compact, or a close, read the old log
+        for _ in range(2):
+            self.log.append('A', make_events(3))
+        scan = self.log.scan()
+        next(scan)
+        self.log.compact()
+        self.log.append('B', make_events(1))
+        assert len(list(scan)) == 5
+        assert len(list(self.log.scan())) == 4
+
+        scan = self.log.scan()
+        next(scan)
+        self.log.close()
+        assert len(list(scan)) == 3
+        assert not self.log._scans and not self.log._retired
+        self.log = EventLog(self.path)
+
+
+    def test_long_fields(self):
+        # cut to fit, on a character boundary
+        self.log.append('A', [TrackingEvent(NOW, 'x' * 70000, 'é' * 40000)])
+        e = self.log.history('A')[0]
+        self.assertEqual(e.location, 'x' * MAX_FIELD)
+        self.assertEqual(e.detail, 'é' * (MAX_FIELD // 2))
+        with self.assertRaises(ValueError):
+            self.log.append('A' * 70000, make_events(1))
+
+
+    def test_reopen(self):
+        self.log.append('A', make_events(3))
+        self.log.close()
+
+        # a torn write at the end is dropped
+        with open(self.path, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00garbage')
+
+        self.log = EventLog(self.path)
+        assert len(self.log) == 3
+        assert 'A' in self.log
+        self.log.append('A', make_events(1))
+        assert len(self.log.history('A')) == 4
+
+
+    def test_compact(self):
+        for _ in range(3):
+            self.log.append('A', make_events(3))
+            self.log.append('B', make_events(2))
+
+        self.assertEqual(self.log.compact(), 10)
+        assert len(self.log) == 5
+        self.assertEqual([e.detail for e in self.log.history('A')], ['SCAN 0', 'SCAN 1', 'SCAN 2'])
+
+        self.log.close()
+        self.log = EventLog(self.path)
+        assert len(self.log.history('B')) == 2
+
+
+    def test_not_a_log(self):
+        path = os.path.join(self.dir.name, 'other')
+        with open(path, 'wb') as f:
+            f.write(b'hello world')
+        with self.assertRaises(ValueError):
+            EventLog(path)
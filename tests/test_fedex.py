@@ -1,6 +1,13 @@
+import datetime
 import unittest
-
-from packagetracker            import PackageTracker
+from configparser import ConfigParser
+from unittest import mock
+
+from packagetracker                         import PackageTracker
+from packagetracker.exceptions              import Throttled, TransientError
+from packagetracker.service                 import fedex_interface
+from packagetracker.service.fedex_interface import FedexInterface, fedex_timestamp
+from packagetracker.testing.responses       import SoapObject, fedex_response
 #from packagetracker.exceptions import TrackFailed, InvalidTrackingNumber, UnsupportedShipper
 
 
@@ -57,6 +64,71 @@ class TestFedEx(unittest.TestCase):
         assert url.startswith('http')
 
 
+    def test_delivered_without_address(self):
+        # ActualDeliveryAddress is optional, the last scan's is used instead
+        rsp = fedex_response('568838414941', delivered=True)
+        del rsp.__dict__['ActualDeliveryAddress']
+        info = self.interface._parse_response(rsp, '568838414941')
+        assert info.status == 'Delivered'
+        assert info.location is not None
+        self.assertEqual(info.location, self.interface._getTrackingLocation(rsp.Events[0]))
+
+        del rsp.__dict__['Events']
+        info = self.interface._parse_response(rsp, '568838414941')
+        assert info.location is None
+
+
+    def test_dates_or_times(self):
+        # newer API versions list the delivery dates in DatesOrTimes
+        for delivered, date_type in ((True, 'ACTUAL_DELIVERY'), (False, 'ESTIMATED_DELIVERY')):
+            rsp = fedex_response('568838414941', delivered=delivered)
+            expected = self.interface._parse_response(rsp, '568838414941').delivery_date
+
+            del rsp.__dict__['ActualDeliveryTimestamp' if delivered else 'EstimatedDeliveryTimestamp']
+            rsp.DatesOrTimes = [
+                SoapObject(Type='SHIP', DateOrTimestamp='2020-06-01T08:00:00-05:00'),
+                SoapObject(Type=date_type,
+                           DateOrTimestamp=expected.strftime('%Y-%m-%dT%H:%M:%S-05:00')),
+            ]
+            info = self.interface._parse_response(rsp, '568838414941')
+            assert info.delivery_date == expected
+
+        assert fedex_timestamp(SoapObject(), 'ActualDeliveryTimestamp', 'ACTUAL_DELIVERY') is None
+        when = datetime.datetime(2020, 6, 8, 9, 10)
+        assert fedex_timestamp(SoapObject(ActualDeliveryTimestamp=when),
+                               'ActualDeliveryTimestamp', 'ACTUAL_DELIVERY') == when
+
+
+    def test_http_errors(self):
+        # the SOAP client raises Exception((status, reason)) for HTTP errors
+        config = ConfigParser()
+        config.read_string('[FedEx]\nkey = K\npassword = P\naccount_number = 1\nmeter_number = 1\n')
+        iface = FedexInterface(config)
+
+        def request(status):
+            class Request:
+                def __init__(self, cfg):
+                    self.client = SoapObject(set_options=lambda **options: None)
+                    self.SelectionDetails = SoapObject(PackageIdentifier=SoapObject())
+
+                def send_request(self):
+                    raise Exception((status, 'HTTP error'))
+            return Request
+
+        with mock.patch.object(fedex_interface, 'FedexTrackRequest', request(503)):
+            with self.assertRaises(TransientError):
+                iface._send_request('568838414941')
+
+        # a throttled account is taken out of rotation
+        with mock.patch.object(fedex_interface, 'FedexTrackRequest', request(429)):
+            with self.assertRaises(Throttled):
+                iface._send_request('568838414941')
+        account, = iface.accounts
+        assert account.throttled_until > 0
+        with self.assertRaises(Throttled):
+            iface.accounts.acquire()
+
+
 #    def test_track_fedex(self):
 #        if not self.tracker.config.has_section('FedEx'):
 #            return self.skipTest("No FedEx config, skipping tests")
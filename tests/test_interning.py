@@ -0,0 +1,33 @@
+import unittest
+
+from packagetracker.interning import StringPool
+
+
+class TestStringPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = StringPool(max_size=3)
+
+
+    def test_intern(self):
+        a = ''.join(('In ', 'Transit'))
+        b = ''.join(('In ', 'Transit'))
+        assert a is not b
+        assert self.pool.intern(a) is self.pool.intern(b)
+        assert self.pool.intern(None) is None
+
+
+    def test_join(self):
+        loc = self.pool.join(('MEMPHIS', 'TN', 'US'))
+        assert loc == 'MEMPHIS,TN,US'
+        assert self.pool.join(('MEMPHIS', 'TN', 'US')) is loc
+        assert self.pool.intern(','.join(('MEMPHIS', 'TN', 'US'))) is loc
+
+
+    def test_max_size(self):
+        for ii in range(10):
+            self.pool.intern(str(ii))
+        assert len(self.pool) == 3
+
+        # still works, just not pooled
+        assert self.pool.intern('new') == 'new'
@@ -0,0 +1,75 @@
+import io
+import json
+import logging
+import unittest
+
+from packagetracker      import PackageTracker
+from packagetracker.logs import JSONFormatter, PayloadLog
+
+from .test_tracker import FakeInterface
+
+
+class TestPayloadLog(unittest.TestCase):
+
+    def test_ring_buffer(self):
+        payloads = PayloadLog(size=2, sample_rate=1.0)
+        for num in ('A', 'B', 'C'):
+            payloads.record('UPS', num, {'num': num}, {'status': 'OK'})
+
+        assert len(payloads) == 2
+        assert [p.tracking_number for p in payloads.payloads()] == ['B', 'C']
+
+
+    def test_sample(self):
+        values = iter([0.5, 0.05])
+        payloads = PayloadLog(sample_rate=0.1, random=lambda: next(values))
+        assert not payloads.sample()
+        assert payloads.sample()
+
+
+    def test_dump(self):
+        class Soap:
+            def __str__(self):
+                return '(reply){ status = "OK" }'
+
+        payloads = PayloadLog(sample_rate=1.0)
+        payloads.record('UPS', '1Z', {'num': '1Z'}, {'status': 'OK'})
+        payloads.record('FedEx', '1234', None, Soap())
+
+        first, second = [json.loads(line) for line in payloads.dump()]
+        assert first['carrier'] == 'UPS'
+        assert first['response'] == {'status': 'OK'}
+        assert second['response'] == '(reply){ status = "OK" }'
+
+        out = io.StringIO()
+        payloads.dump(out)
+        assert len(out.getvalue().splitlines()) == 2
+
+        payloads.clear()
+        assert len(payloads) == 0
+
+
+    def test_tracker_interfaces(self):
+        payloads = PayloadLog(sample_rate=1.0)
+        tracker = PackageTracker(testing=True, payload_log=payloads)
+        iface = FakeInterface(tracker.config)
+        tracker.register_interface('Fake', iface)
+        assert tracker.interface('UPS').payload_log is payloads
+
+        iface._capture('FAKE1', {'num': 'FAKE1'}, '<ok/>')
+        assert payloads.payloads()[0].carrier == 'Fake'
+
+
+class TestJSONFormatter(unittest.TestCase):
+
+    def test_format(self):
+        record = logging.LogRecord('packagetracker.service.ups_interface', logging.DEBUG,
+                                   __file__, 1, 'Response: %s', ({'a': 1},), None)
+        record.carrier = 'UPS'
+        record.tracking_number = '1Z'
+
+        entry = json.loads(JSONFormatter().format(record))
+        assert entry['logger'] == 'packagetracker.service.ups_interface'
+        assert entry['message'] == "Response: {'a': 1}"
+        assert entry['carrier'] == 'UPS'
+        assert entry['tracking_number'] == '1Z'
@@ -0,0 +1,97 @@
+import unittest
+from configparser import ConfigParser
+
+from packagetracker.service.fedex_interface import FedexInterface
+from packagetracker.service.ups_interface   import UPSInterface
+from packagetracker.service.usps_interface  import USPSInterface
+from packagetracker.testing.memory          import footprint, measure
+from packagetracker.testing.responses       import fedex_response, ups_response, usps_response
+from packagetracker.xml_dict                import xml_to_dict
+
+EVENTS = 2000
+
+# bytes per event: (peak while parsing and building the events, retained
+# by the result).  About half again what CPython 3.11 uses, to allow for
+# other versions; a change that blows through these needs a look.
+BUDGETS = {
+    'UPS':      (800, 750),
+    'USPS':     (6500, 750),
+    'FedEx':    (800, 750),
+}
+
+# USPS responses are XML, which is decoded to a dict, kept until the
+# events are built
+XML_BUDGET = (6500, 1100)
+
+
+class TestParseMemory(unittest.TestCase):
+
+    def setUp(self):
+        config = ConfigParser()
+        self.cases = {
+            'UPS':      (UPSInterface(config), ups_response),
+            'USPS':     (USPSInterface(config), usps_response),
+            'FedEx':    (FedexInterface(config), fedex_response),
+        }
+
+        # fill the string pool, it's shared by everything parsed
+        for iface, response in self.cases.values():
+            iface._parse_response(response(events=EVENTS), 'X').events
+
+
+    def assertBudget(self, name, usage, budget):
+        peak, retained = budget
+        self.assertLessEqual(usage.peak / EVENTS, peak,
+                             "%s: peak %.0f bytes per event" % (name, usage.peak / EVENTS))
+        self.assertLessEqual(usage.retained / EVENTS, retained,
+                             "%s: retained %.0f bytes per event" % (name, usage.retained / EVENTS))
+
+
+    def test_parse_budgets(self):
+        for carrier, (iface, response) in self.cases.items():
+            rsp = response(events=EVENTS)
+
+            def parse():
+                info = iface._parse_response(rsp, 'X')
+                info.events
+                return info
+
+            usage = measure(parse)
+            assert len(usage.result.events) >= EVENTS - 1
+            self.assertBudget(carrier, usage, BUDGETS[carrier])
+
+
+    def test_xml_to_dict_budget(self):
+        rsp = usps_response(events=EVENTS)
+        usage = measure(lambda: xml_to_dict(rsp))
+        self.assertBudget('xml_to_dict', usage, XML_BUDGET)
+
+
+    def test_summary_holds_no_events(self):
+        # a result that's never asked for its events shouldn't cost much
+        # more than the raw response it keeps
+        iface, response = self.cases['UPS']
+        rsp = response(events=EVENTS)
+        usage = measure(lambda: iface._parse_response(rsp, 'X'))
+        self.assertLess(usage.retained, 10000)
+
+
+class TestFootprint(unittest.TestCase):
+
+    def test_footprint(self):
+        iface = UPSInterface(ConfigParser())
+        infos = [iface._parse_response(ups_response(num, events=10), num)
+                 for num in ('1Z1', '1Z2')]
+        for info in infos:
+            info.events
+
+        sizes = footprint(infos)
+        assert sizes['TrackingInfo'][0] == 2
+        assert sizes['TrackingEvent'][0] == 20
+        assert sizes['TrackingEvent'][1] > 20 * 100
+        # the events lists, not the list passed in
+        assert sizes['list'][0] == 2
+
+        single = footprint(infos[0])
+        assert single['TrackingInfo'][0] == 1
+        assert single['TrackingEvent'][0] == 10
@@ -0,0 +1,153 @@
+import unittest
+import urllib.request
+
+from packagetracker            import PackageTracker
+from packagetracker.cache      import NegativeCache, TrackingCache
+from packagetracker.exceptions import CircuitOpen, TrackingNotFound, TransientError
+from packagetracker.metrics    import Histogram, Metrics
+from packagetracker.retry      import RetryPolicy
+
+from .test_breaker import FakeInterface as DownInterface
+from .test_tracker import FakeInterface
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_cumulative(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.count == 4
+        assert histogram.sum == 2.65
+        assert histogram.cumulative() == [(0.1, 2), (1.0, 3), (float('inf'), 4)]
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_render(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.inc('packagetracker_requests_total', carrier='UPS')
+        metrics.inc('packagetracker_requests_total', carrier='UPS')
+        metrics.inc('packagetracker_errors_total', carrier='USPS', error='Say "what"')
+        metrics.observe('packagetracker_request_seconds', 0.5, carrier='UPS')
+        metrics.add_collector(lambda: [('packagetracker_breaker_open', 'gauge', {'carrier': 'UPS'}, 1)])
+
+        text = metrics.render()
+        assert '# TYPE packagetracker_requests_total counter' in text
+        assert 'packagetracker_requests_total{carrier="UPS"} 2' in text
+        assert 'packagetracker_errors_total{carrier="USPS",error="Say \\"what\\""} 1' in text
+        assert '# TYPE packagetracker_request_seconds histogram' in text
+        assert 'packagetracker_request_seconds_bucket{carrier="UPS",le="0.1"} 0' in text
+        assert 'packagetracker_request_seconds_bucket{carrier="UPS",le="+Inf"} 1' in text
+        assert 'packagetracker_request_seconds_count{carrier="UPS"} 1' in text
+        assert 'packagetracker_breaker_open{carrier="UPS"} 1' in text
+
+
+    def test_callback_errors_are_logged(self):
+        metrics = Metrics()
+        called = []
+        metrics.on_request.append(lambda *args: 1 / 0)
+        metrics.on_request.append(lambda *args: called.append(args))
+
+        with self.assertLogs(level='ERROR'):
+            metrics.fire(metrics.on_request, 'UPS', '1Z')
+        assert called == [('UPS', '1Z')]
+
+
+    def test_serve(self):
+        metrics = Metrics()
+        metrics.inc('packagetracker_requests_total', carrier='UPS')
+        server = metrics.serve(0)
+        try:
+            url = 'http://127.0.0.1:%d/metrics' % server.server_port
+            with urllib.request.urlopen(url) as resp:
+                assert resp.headers['Content-Type'].startswith('text/plain')
+                assert b'packagetracker_requests_total{carrier="UPS"} 1' in resp.read()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestTrackerMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = PackageTracker(testing=True, cache=TrackingCache(),
+                                      negative_cache=NegativeCache())
+        self.tracker.register_interface('Fake', FakeInterface(self.tracker.config))
+        self.metrics = self.tracker.metrics
+
+
+    def test_hooks(self):
+        events = []
+        self.metrics.on_request.append(lambda *args: events.append(('request',) + args))
+        self.metrics.on_response.append(lambda carrier, num, info, seconds:
+                                        events.append(('response', carrier, num, info.status)))
+        self.metrics.on_error.append(lambda carrier, num, exc, seconds:
+                                     events.append(('error', carrier, num, type(exc))))
+
+        self.tracker.package('FAKE1').track()
+        with self.assertRaises(TrackingNotFound):
+            self.tracker.package('FAKE0').track()
+
+        assert events == [
+            ('request', 'Fake', 'FAKE1'),
+            ('response', 'Fake', 'FAKE1', 'IN TRANSIT'),
+            ('request', 'Fake', 'FAKE0'),
+            ('error', 'Fake', 'FAKE0', TrackingNotFound),
+        ]
+
+
+    def test_counters(self):
+        for num in ('FAKE1', 'FAKE1', 'FAKE0', 'FAKE0'):
+            try:
+                self.tracker.package(num).track()
+            except TrackingNotFound:
+                pass
+
+        # the repeats come from the caches
+        assert self.metrics.counter('packagetracker_requests_total', carrier='Fake') == 2
+        assert self.metrics.counter('packagetracker_errors_total', carrier='Fake',
+                                    error='TrackingNotFound') == 1
+        assert self.metrics.histogram('packagetracker_request_seconds', carrier='Fake').count == 2
+
+        text = self.metrics.render()
+        assert 'packagetracker_cache_total{cache="tracking",result="hits"} 1' in text
+        assert 'packagetracker_cache_total{cache="tracking",result="misses"} 3' in text
+        assert 'packagetracker_cache_total{cache="negative",result="hits"} 1' in text
+        assert 'packagetracker_breaker_open{carrier="Fake"} 0' in text
+
+
+    def test_rejected(self):
+        # calls the breaker turns away aren't requests
+        tracker = PackageTracker(testing=True, breaker_options={'min_calls': 1})
+        tracker.register_interface('Fake', DownInterface(tracker.config))
+        metrics = tracker.metrics
+        events = []
+        metrics.on_request.append(lambda *args: events.append('request'))
+        metrics.on_error.append(lambda carrier, num, exc, seconds: events.append(type(exc)))
+
+        for error in (TransientError, CircuitOpen):
+            with self.assertRaises(error):
+                tracker.package('FAKE1').track()
+
+        assert events == ['request', TransientError, CircuitOpen]
+        assert metrics.counter('packagetracker_requests_total', carrier='Fake') == 1
+        assert metrics.counter('packagetracker_errors_total', carrier='Fake',
+                               error='CircuitOpen') == 1
+        assert metrics.histogram('packagetracker_request_seconds', carrier='Fake').count == 1
+
+
+    def test_retries(self):
+        iface = self.tracker.interface('Fake')
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise TransientError('try again')
+            return 'ok'
+
+        policy = RetryPolicy(sleep=lambda delay: None)
+        assert policy.call(flaky, on_retry=iface._retried) == 'ok'
+        assert self.metrics.counter('packagetracker_retries_total', carrier='Fake') == 2
@@ -0,0 +1,118 @@
+import collections
+import os
+import tempfile
+import unittest
+
+from packagetracker                         import PackageTracker
+from packagetracker.service.fedex_interface import (express_checksum, ground96_checksum,
+                                                    ssc18_checksum)
+from packagetracker.testing                 import numbers
+
+np = numbers.np
+
+# kind -> (carrier, length)
+SHAPES = {
+    'ups':      ('UPS', 18),
+    'usps':     ('USPS', 22),
+    'express':  ('FedEx', 12),
+    'ground96': ('FedEx', 15),
+    'ssc18':    ('FedEx', 20),
+}
+
+
+class NumbersTest(unittest.TestCase):
+
+    def setUp(self):
+        # no testing=True, so the documentation's test numbers aren't let off
+        with tempfile.NamedTemporaryFile('w', suffix='.cfg', delete=False) as f:
+            config_file = f.name
+        self.tracker = PackageTracker(config_file)
+        os.unlink(config_file)
+
+
+    def assertValid(self, nums, mix):
+        # each number goes to the right carrier and passes its checksum
+        lengths = dict((shape[1], kind) for kind, shape in SHAPES.items())
+        kinds = collections.Counter()
+        for num in nums:
+            kind = lengths[len(num)]
+            kinds[kind] += 1
+            package = self.tracker.package(num)
+            assert package.shipper == SHAPES[kind][0], num
+            assert package.iface.validate(num), num
+
+        assert set(kinds) == set(mix)
+        return kinds
+
+
+class TestGenerate(NumbersTest):
+
+    def test_valid(self):
+        nums = list(numbers.generate(count=5000, seed=1))
+        kinds = self.assertValid(nums, numbers.MIX)
+        # an even split between the carriers
+        assert 1500 < kinds['ups'] < 1800
+        assert 1500 < kinds['express'] + kinds['ground96'] + kinds['ssc18'] < 1800
+        assert len(set(nums)) == len(nums)
+
+
+    def test_mix(self):
+        nums = list(numbers.generate({'ground96': 1, 'ssc18': 3}, count=1000))
+        kinds = self.assertValid(nums, ('ground96', 'ssc18'))
+        assert kinds['ssc18'] > 2 * kinds['ground96']
+
+        with self.assertRaises(ValueError):
+            next(numbers.generate({'dhl': 1}))
+        with self.assertRaises(ValueError):
+            next(numbers.generate({'ups': 0}))
+
+
+    def test_repeatable(self):
+        first = list(numbers.generate(count=100, seed=5))
+        assert first == list(numbers.generate(count=100, seed=5))
+        assert first != list(numbers.generate(count=100, seed=6))
+
+        # without a count, it doesn't stop
+        stream = numbers.generate(seed=5)
+        assert [next(stream) for _ in range(100)] == first
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestGenerateBatch(NumbersTest):
+
+    def test_valid(self):
+        nums = numbers.generate_batch(5000, seed=1)
+        assert len(nums) == 5000
+        assert all(isinstance(num, str) for num in nums)
+        self.assertValid(nums, numbers.MIX)
+
+
+    def test_mix(self):
+        for kind in SHAPES:
+            self.assertValid(numbers.generate_batch(500, {kind: 1}), (kind,))
+        with self.assertRaises(ValueError):
+            numbers.generate_batch(10, {'dhl': 1})
+
+
+    def test_repeatable(self):
+        assert numbers.generate_batch(100, seed=5) == numbers.generate_batch(100, seed=5)
+        assert numbers.generate_batch(100, seed=5) != numbers.generate_batch(100, seed=6)
+
+
+class TestFedExChecksums(unittest.TestCase):
+
+    def test_express(self):
+        # every digit is weighted 1, and the 11th isn't counted
+        assert express_checksum('123456789012') == 45 % 11
+        assert express_checksum('123456789092') == 45 % 11
+        # a checksum of 10 is 0
+        assert express_checksum('000000001910') == 0
+
+
+    def test_mod10(self):
+        assert ground96_checksum('019343586678996') == 6
+        # the 22 digit form has the same checksum
+        assert ground96_checksum('9611020019343586678996') == 6
+        assert ssc18_checksum('00000000000000000011') == 7
+        # 10 is never a valid checksum digit
+        assert ground96_checksum('000000000000000') == 10
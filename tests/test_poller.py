@@ -0,0 +1,73 @@
+import datetime
+import os
+import pickle
+import unittest
+
+from packagetracker            import PackageTracker
+from packagetracker.data       import TrackingInfo
+from packagetracker.exceptions import TrackingNotFound
+from packagetracker.poller     import FleetPoller, pack, unpack
+from packagetracker.status     import Status
+from packagetracker.store      import ShipmentStore
+
+from .test_tracker import FakeInterface
+
+
+def make_tracker():
+    # builds each worker's tracker
+    tracker = PackageTracker(testing=True)
+    tracker.register_interface('Fake', FakeInterface(tracker.config))
+    return tracker
+
+
+class TestPoller(unittest.TestCase):
+
+    def test_pack(self):
+        info = TrackingInfo('1Z12345E0205271688', datetime.date(2020, 6, 5), 'Delivered',
+                            datetime.datetime(2020, 6, 5, 10, 15), location='ATLANTA,GA,US',
+                            service='UPS Ground', status_code=Status.DELIVERED)
+        info.add_event(datetime.datetime(2020, 6, 5, 10, 15), 'ATLANTA,GA,US', 'Delivered',
+                       Status.DELIVERED)
+
+        copy = unpack(pickle.loads(pickle.dumps(pack(info))))
+        self.assertEqual(copy.delivery_date, info.delivery_date)
+        self.assertEqual(copy.status_code, Status.DELIVERED)
+        self.assertEqual(copy.service, 'UPS Ground')
+        self.assertEqual(copy.events[0].status_code, Status.DELIVERED)
+        self.assertEqual(copy.events[0].location, 'ATLANTA,GA,US')
+
+        info.delivery_date = None
+        assert unpack(pack(info))._delivery_date is None
+
+
+    def test_pickle_interfaces(self):
+        tracker = PackageTracker(testing=True)
+        for shipper, iface in tracker.interfaces:
+            iface.session
+            copy = pickle.loads(pickle.dumps(iface))
+            assert type(copy) is type(iface)
+            assert copy.accounts is not None
+            assert copy.session is not iface.session
+
+
+    def test_poll(self):
+        store = ShipmentStore()
+        numbers = ['FAKE%d' % i for i in range(50)] + ['14324423523']
+        with FleetPoller(factory=make_tracker, processes=2, shard_size=7, threads=2,
+                         store=store) as poller:
+            results = poller.poll_all(numbers)
+
+        self.assertEqual(sorted(results), sorted(numbers))
+        assert isinstance(results['FAKE0'], TrackingNotFound)
+        self.assertEqual(results['FAKE1'].status, 'IN TRANSIT')
+        assert len(results['FAKE2'].events) == 1
+        # FAKE9's bad reply doesn't stop its shard
+        assert isinstance(results['FAKE9'], KeyError)
+        self.assertEqual(results['FAKE10'].status, 'IN TRANSIT')
+        assert len(store) == 48
+
+        assert 1 <= len(poller.stats) <= 2
+        assert os.getpid() not in poller.stats
+        self.assertEqual(sum(s.tracked for s in poller.stats.values()), 48)
+        self.assertEqual(sum(s.failed for s in poller.stats.values()), 3)
+        self.assertEqual(sum(s.shards for s in poller.stats.values()), 8)
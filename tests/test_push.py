@@ -0,0 +1,211 @@
+import datetime
+import threading
+import unittest
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+from packagetracker               import PackageTracker
+from packagetracker.cache         import TrackingCache
+from packagetracker.exceptions    import TrackFailed
+from packagetracker.data          import TrackingInfo
+from packagetracker.push          import PushHandler, merge, parse_ups, parse_fedex
+from packagetracker.status        import Status
+from packagetracker.store         import ShipmentStore
+from packagetracker.testing.push  import LocalPublisher
+from packagetracker.testing.responses import fedex_response
+
+UPS_NUM = '1Z12345E0205271688'
+FEDEX_NUM = '122816215025810'
+WHEN = datetime.datetime(2020, 6, 5, 10, 15)
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPush(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ShipmentStore()
+        self.cache = TrackingCache()
+        self.tracker = PackageTracker(testing=True, store=self.store, cache=self.cache)
+        self.handler = PushHandler(self.tracker, credentials={'UPS': 'sekrit', 'FedEx': 'hmackey'})
+        self.publisher = LocalPublisher(self.handler, credentials=self.handler.credentials)
+
+
+    def tearDown(self):
+        self.cache.close()
+
+
+    def test_parse_ups(self):
+        payload = {
+            'trackingNumber': UPS_NUM,
+            'localActivityDate': '20200605',
+            'localActivityTime': '101500',
+            'scheduledDeliveryDate': '20200608',
+            'activityLocation': {'city': 'ATLANTA', 'stateProvince': 'GA', 'country': 'US'},
+            'activityStatus': {'type': 'I', 'code': 'OR', 'description': 'Origin Scan'},
+        }
+        info, = parse_ups(payload)
+        self.assertEqual(info.status_code, Status.IN_TRANSIT)
+        self.assertEqual(info.location, 'ATLANTA,GA,US')
+        self.assertEqual(info.delivery_date, datetime.datetime(2020, 6, 8))
+        self.assertEqual(info.last_update, WHEN)
+        self.assertEqual(info.events[0].detail, 'Origin Scan')
+
+        del payload['localActivityDate']
+        with self.assertRaises(TrackFailed):
+            parse_ups(payload)
+
+
+    def test_parse_fedex(self):
+        payload = {'trackResults': [{
+            'trackingNumberInfo': {'trackingNumber': FEDEX_NUM},
+            'latestStatusDetail': {'code': 'DL', 'description': 'Delivered',
+                                   'scanLocation': {'city': 'MEMPHIS', 'stateOrProvinceCode': 'TN',
+                                                    'countryCode': 'US'}},
+            'dateAndTimes': [{'type': 'ACTUAL_DELIVERY', 'dateTime': '2020-06-05T10:15:00-05:00'}],
+            'serviceDetail': {'description': 'FedEx Ground'},
+            'scanEvents': [
+                {'date': '2020-06-05T10:15:00-05:00', 'eventType': 'DL',
+                 'eventDescription': 'Delivered', 'scanLocation': {'city': 'MEMPHIS'}},
+                {'date': '2020-06-04T08:00:00-05:00', 'eventType': 'PU',
+                 'eventDescription': 'Picked up', 'scanLocation': {}},
+            ],
+        }]}
+        info, = parse_fedex(payload)
+        self.assertEqual(info.status_code, Status.DELIVERED)
+        self.assertEqual(info.delivery_date, WHEN)
+        self.assertEqual(info.location, 'MEMPHIS,TN,US')
+        self.assertEqual(info.service, 'FedEx Ground')
+        self.assertEqual([e.status_code for e in info.events], [Status.DELIVERED, Status.PICKED_UP])
+        assert info.events[1].location is None
+
+        payload['trackResults'][0]['scanEvents'][0]['date'] = 'yesterday'
+        with self.assertRaises(TrackFailed):
+            parse_fedex(payload)
+
+
+    def test_ups_updates(self):
+        changes = []
+        self.tracker.watcher.watch(UPS_NUM, lambda num, old, new: changes.append(new.status))
+        self.handler.subscribe(UPS_NUM)
+
+        assert self.publisher.ups(UPS_NUM, 'Origin Scan', when=WHEN, city='ATLANTA', state='GA') == 200
+        later = WHEN + datetime.timedelta(hours=5)
+        assert self.publisher.ups(UPS_NUM, 'Arrival Scan', when=later, city='MACON', state='GA') == 200
+
+        # an old notification arriving late doesn't roll back the status
+        assert self.publisher.ups(UPS_NUM, 'Departure Scan', when=WHEN + datetime.timedelta(hours=1),
+                                  city='ATLANTA', state='GA') == 200
+
+        info = self.cache.peek(('UPS', UPS_NUM))
+        self.assertEqual(info.status, 'Arrival Scan')
+        self.assertEqual([e.detail for e in info.events],
+                         ['Arrival Scan', 'Departure Scan', 'Origin Scan'])
+        self.assertEqual(self.store.get(UPS_NUM).location, 'MACON,GA,US')
+        assert len(self.store.events(UPS_NUM)) == 3
+        self.assertEqual(changes, ['Origin Scan', 'Arrival Scan', 'Arrival Scan'])
+
+        # subscribed packages aren't polled
+        self.tracker.watcher.clock = lambda: 10 ** 12
+        assert self.tracker.watcher.poll() == 0
+
+        assert self.publisher.ups(UPS_NUM, 'DELIVERED', status_type='D', when=later,
+                                  city='MACON', state='GA', delivered=True) == 200
+        assert len(self.tracker.watcher) == 0
+        self.assertEqual(self.store.get(UPS_NUM).status_code, Status.DELIVERED)
+
+
+    def test_merge(self):
+        eta = datetime.datetime(2020, 6, 8)
+        later = WHEN + datetime.timedelta(hours=1)
+        cached = TrackingInfo(UPS_NUM, eta, 'Arrival Scan', later, service='UPS Ground')
+        cached.add_event(later, 'MACON,GA,US', 'Arrival Scan')
+        pushed = TrackingInfo(UPS_NUM, None, 'Origin Scan', WHEN)
+        pushed.add_event(WHEN, 'ATLANTA,GA,US', 'Origin Scan')
+
+        # the late push adds its event, without changing either result
+        merged = merge(cached, pushed)
+        assert merged is not cached and merged is not pushed
+        self.assertEqual(merged.status, 'Arrival Scan')
+        self.assertEqual([e.detail for e in merged.events], ['Arrival Scan', 'Origin Scan'])
+        self.assertEqual(merged.service, 'UPS Ground')
+        assert len(cached.events) == 1 and len(pushed.events) == 1
+
+        # a push with no scheduled delivery date keeps the previous one
+        newer = TrackingInfo(UPS_NUM, None, 'Departure Scan', later + datetime.timedelta(hours=1))
+        newer.add_event(newer.last_update, 'MACON,GA,US', 'Departure Scan')
+        self.assertEqual(merge(cached, newer).delivery_date, eta)
+
+
+    def test_merge_from_store(self):
+        # without a cache, the history comes from the store
+        self.tracker.cache = None
+        self.publisher.ups(UPS_NUM, 'Origin Scan', when=WHEN)
+        self.publisher.ups(UPS_NUM, 'Arrival Scan', when=WHEN + datetime.timedelta(hours=1))
+        assert len(self.store.events(UPS_NUM)) == 2
+
+
+    def test_fedex_updates(self):
+        status = self.publisher.fedex(FEDEX_NUM, [
+            (WHEN, 'DL', 'Delivered', 'MEMPHIS', 'TN'),
+            (WHEN - datetime.timedelta(days=1), 'PU', 'Picked up', 'NASHVILLE', 'TN'),
+        ], code='DL', description='Delivered', delivered=WHEN)
+        assert status == 200
+
+        info = self.cache.peek(('FedEx', FEDEX_NUM))
+        self.assertEqual(info.status_code, Status.DELIVERED)
+        self.assertEqual(info.delivery_date, WHEN)
+        assert len(info.events) == 2
+
+
+    def test_fedex_after_polling(self):
+        # suds gives polled results offsets, pushes have them too
+        tz = datetime.timezone(datetime.timedelta(hours=-5))
+        rsp = fedex_response(FEDEX_NUM, events=2, delivered=False)
+        for e in rsp.Events:
+            e.Timestamp = e.Timestamp.replace(tzinfo=tz)
+        rsp.EstimatedDeliveryTimestamp = rsp.EstimatedDeliveryTimestamp.replace(tzinfo=tz)
+        polled = self.tracker.interface('FedEx')._parse_response(rsp, FEDEX_NUM)
+        self.cache.put(('FedEx', FEDEX_NUM), polled)
+
+        delivered = max(e.Timestamp for e in rsp.Events) + datetime.timedelta(hours=3)
+        status = self.publisher.fedex(FEDEX_NUM, [
+            (delivered, 'DL', 'Delivered', 'MEMPHIS', 'TN'),
+        ], code='DL', description='Delivered', delivered=delivered)
+        assert status == 200
+
+        info = self.cache.peek(('FedEx', FEDEX_NUM))
+        self.assertEqual(info.status_code, Status.DELIVERED)
+        # the wall time, without the offset
+        self.assertEqual(info.delivery_date, delivered.replace(tzinfo=None))
+        self.assertEqual([e.detail for e in info.events][0], 'Delivered')
+        assert len(info.events) == 3
+        assert all(e.date.tzinfo is None for e in info.events)
+
+
+    def test_rejected(self):
+        bad = LocalPublisher(self.handler, credentials={'UPS': 'wrong', 'FedEx': 'wrong'})
+        assert bad.ups(UPS_NUM, 'Origin Scan') == 401
+        assert bad.fedex(FEDEX_NUM, []) == 401
+        assert self.publisher.publish('UPS', {'trackingNumber': UPS_NUM}) == 400
+        assert self.publisher.publish('USPS', {}) == 404
+        assert self.store.get(UPS_NUM) is None
+
+
+    def test_http(self):
+        server = make_server('127.0.0.1', 0, self.handler.wsgi_app, handler_class=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            publisher = LocalPublisher('http://127.0.0.1:%d/' % server.server_port,
+                                       credentials={'UPS': 'sekrit'})
+            assert publisher.ups(UPS_NUM, 'Origin Scan', when=WHEN) == 200
+            assert publisher.fedex(FEDEX_NUM, []) == 401
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(self.store.get(UPS_NUM).status, 'Origin Scan')
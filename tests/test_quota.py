@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from packagetracker            import PackageTracker
+from packagetracker.exceptions import QuotaExceeded
+from packagetracker.quota      import QuotaLedger, DAY, LOW
+
+
+class FakeClock:
+
+    def __init__(self):
+        # noon UTC
+        self.now = 20000 * DAY + DAY / 2
+        self.slept = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+class TestQuotaLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.ledger = QuotaLedger(budgets={'UPS': 100}, clock=self.clock,
+                                  sleep=self.clock.sleep, max_delay=DAY)
+
+
+    def test_usage(self):
+        self.ledger.record('UPS', 'UPS:1')
+        self.ledger.record('UPS', 'UPS:2', count=2)
+        assert self.ledger.usage('UPS') == 3
+        assert self.ledger.usage('UPS', 'UPS:2') == 2
+        assert self.ledger.remaining('UPS') == 97
+        assert self.ledger.remaining('USPS') is None
+
+        # half the day is gone
+        assert self.ledger.projected('UPS') == 6
+        assert self.ledger.allowance('UPS') == 47
+
+
+    def test_rollover(self):
+        self.ledger.record('UPS', count=10)
+        self.clock.now += DAY
+        assert self.ledger.usage('UPS') == 0
+
+
+    def test_low_priority_paced(self):
+        # on pace: no delay
+        self.ledger.record('UPS', count=50)
+        self.ledger.throttle('UPS', LOW)
+        assert self.clock.slept == 0
+
+        # ahead of pace, low priority waits until back on pace
+        self.ledger.record('UPS', count=25)
+        self.ledger.throttle('UPS', LOW)
+        assert self.clock.slept == DAY / 4
+
+        # normal priority never waits
+        self.ledger.record('UPS', count=5)
+        self.ledger.throttle('UPS')
+        assert self.clock.slept == DAY / 4
+
+
+    def test_budget_spent(self):
+        self.ledger.record('UPS', count=100)
+        with self.assertRaises(QuotaExceeded):
+            self.ledger.throttle('UPS', LOW)
+
+
+    def test_persist(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'quota.json')
+            ledger = QuotaLedger(path, clock=self.clock)
+            ledger.record('FedEx', 'FedEx', count=7)
+            ledger.save()
+
+            ledger = QuotaLedger(path, clock=self.clock)
+            assert ledger.usage('FedEx') == 7
+            assert ledger.report()['FedEx']['accounts'] == {'FedEx': 7}
+
+            # a new day, old counts are ignored
+            self.clock.now += DAY
+            assert QuotaLedger(path, clock=self.clock).usage('FedEx') == 0
+
+
+    def test_close(self):
+        # counts not flushed yet are saved on close
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'quota.json')
+            ledger = QuotaLedger(path, clock=self.clock, flush_interval=3600)
+            ledger.record('UPS', count=3)
+            assert QuotaLedger(path, clock=self.clock).usage('UPS') == 0
+
+            tracker = PackageTracker(testing=True, quota=ledger)
+            tracker.close()
+            assert QuotaLedger(path, clock=self.clock).usage('UPS') == 3
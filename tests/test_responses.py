@@ -0,0 +1,35 @@
+import unittest
+from configparser import ConfigParser
+
+from packagetracker.service.fedex_interface import FedexInterface
+from packagetracker.service.ups_interface   import UPSInterface
+from packagetracker.service.usps_interface  import USPSInterface
+from packagetracker.status                  import Status
+from packagetracker.testing.responses       import fedex_response, ups_response, usps_response
+
+
+class TestResponses(unittest.TestCase):
+
+    def test_parse(self):
+        config = ConfigParser()
+        cases = (
+            (UPSInterface, ups_response, '1Z12345E0205271688'),
+            (USPSInterface, usps_response, '9400100000000000000000'),
+            (FedexInterface, fedex_response, '122816215025810'),
+        )
+        for interface, response, num in cases:
+            iface = interface(config)
+            for events in (3, 500):
+                info = iface._parse_response(response(num, events=events), num)
+                assert info.status_code == Status.DELIVERED, interface
+                assert len(info.events) == events, interface
+                assert info.last_event.status_code == Status.DELIVERED, interface
+
+            info = iface._parse_response(response(num, delivered=False), num)
+            assert info.status_code == Status.OUT_FOR_DELIVERY, interface
+
+
+    def test_repeatable(self):
+        assert ups_response(events=50) == ups_response(events=50)
+        assert ups_response(events=50) != ups_response(events=50, seed=1)
+        assert usps_response(events=50) == usps_response(events=50)
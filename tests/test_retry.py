@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from packagetracker.exceptions import TransientError, TrackFailed
+from packagetracker.retry      import LatencyWindow, RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        self.policy = RetryPolicy(max_attempts=3, sleep=self.sleeps.append)
+
+
+    def test_success(self):
+        assert self.policy.call(lambda: 'ok') == 'ok'
+        assert self.sleeps == []
+
+
+    def test_retries_transient(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise TransientError('connection reset')
+            return 'ok'
+
+        assert self.policy.call(flaky) == 'ok'
+        assert len(calls) == 3
+        assert len(self.sleeps) == 2
+
+
+    def test_gives_up(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise TransientError('HTTP 503')
+
+        # still a TrackFailed, for existing callers
+        with self.assertRaises(TrackFailed):
+            self.policy.call(broken)
+        assert len(calls) == 3
+
+
+    def test_no_retry_on_permanent(self):
+        calls = []
+
+        def failed():
+            calls.append(1)
+            raise TrackFailed('no such package')
+
+        with self.assertRaises(TrackFailed):
+            self.policy.call(failed)
+        assert len(calls) == 1
+
+
+    def test_backoff_bounds(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=3.0)
+        for _ in range(100):
+            assert 0 <= policy.backoff(1) <= 1.0
+            assert 0 <= policy.backoff(2) <= 2.0
+            assert 0 <= policy.backoff(10) <= 3.0
+
+
+    def test_hedged_request(self):
+        policy = RetryPolicy(hedge=True, hedge_delay=0.01)
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return 'primary'
+
+        try:
+            assert policy.call(slow, alternate=lambda: 'alternate') == 'alternate'
+        finally:
+            release.set()
+
+
+    def test_hedges_bounded(self):
+        # first requests never wait for a worker; with every hedge worker
+        # busy, requests aren't hedged
+        policy = RetryPolicy(hedge=True, hedge_delay=0.01, hedge_workers=1)
+        release = threading.Event()
+        primaries = []
+        hedges = []
+
+        def slow():
+            primaries.append(1)
+            release.wait(5)
+            return 'primary'
+
+        def alternate():
+            hedges.append(1)
+            release.wait(5)
+            return 'alternate'
+
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            try:
+                futures = [executor.submit(policy.call, slow, alternate) for _ in range(50)]
+                deadline = time.monotonic() + 5
+                while len(primaries) < 50 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                time.sleep(0.1)
+                assert len(primaries) == 50
+                assert len(hedges) == 1
+            finally:
+                release.set()
+            results = [f.result() for f in futures]
+        assert sorted(set(results)) in (['primary'], ['alternate', 'primary'])
+        policy._executor.shutdown(wait=True)
+        assert policy._hedges == 0
+
+
+    def test_hedge_delay_from_window(self):
+        policy = RetryPolicy(hedge_min_samples=10, hedge_delay=9.0)
+        window = LatencyWindow()
+        assert policy.hedge_after(window) == 9.0
+
+        for ii in range(100):
+            window.add(ii / 100.0)
+        assert policy.hedge_after(window) == 0.95
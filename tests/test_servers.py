@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from packagetracker                        import PackageTracker
+from packagetracker.exceptions             import Throttled, TrackingNotFound, TransientError
+from packagetracker.retry                  import RetryPolicy
+from packagetracker.status                 import Status
+from packagetracker.testing.numbers        import generate
+from packagetracker.testing.servers        import (FakeFedEx, FakeUPS, FakeUSPS, Profile,
+                                                   constant, write_config)
+
+try:
+    import suds
+except ImportError:
+    suds = None
+
+
+UPS_NUMBERS = list(generate({'ups': 1}, count=20))
+USPS_NUMBERS = list(generate({'usps': 1}, count=20))
+
+
+class FakeCarrierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.tmpdir, 'packagetrack')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+
+    def tracker(self, *servers, **kwargs):
+        write_config(self.config_file, *servers)
+        kwargs.setdefault('retry_policy', RetryPolicy(max_attempts=1))
+        return PackageTracker(self.config_file, **kwargs)
+
+
+class TestFakeCarriers(FakeCarrierTest):
+
+    def test_track(self):
+        profile = Profile(events=(4, 4), delivered_rate=1.0)
+        with FakeUPS(profile) as ups, FakeUSPS(profile) as usps:
+            tracker = self.tracker(ups, usps)
+            for num in (UPS_NUMBERS[1], USPS_NUMBERS[1]):
+                info = tracker.package(num).track()
+                assert info.status_code == Status.DELIVERED
+                assert len(info.events) == 4
+
+            assert ups.stats['found'] == 1
+            assert usps.stats['found'] == 1
+
+
+    def test_repeatable(self):
+        # a number gets the same answer every time, and from a new server
+        profile = Profile(events=(2, 20), not_found_rate=0.5)
+        nums = UPS_NUMBERS
+        with FakeUPS(profile) as ups:
+            first = self.tracker(ups).track_many(nums)
+            second = self.tracker(ups).track_many(nums)
+        with FakeUPS(profile) as ups:
+            third = self.tracker(ups).track_many(nums)
+
+        for num in nums:
+            results = (first[num], second[num], third[num])
+            if isinstance(results[0], TrackingNotFound):
+                assert all(isinstance(r, TrackingNotFound) for r in results)
+            else:
+                assert len(set(len(r.events) for r in results)) == 1
+                assert len(set(r.last_event.date for r in results)) == 1
+
+        found = sum(not isinstance(r, Exception) for r in first.values())
+        assert 0 < found < len(nums)
+
+
+    def test_not_found(self):
+        profile = Profile(not_found_rate=1.0)
+        with FakeUPS(profile) as ups, FakeUSPS(profile) as usps:
+            tracker = self.tracker(ups, usps)
+            for num in (UPS_NUMBERS[2], USPS_NUMBERS[2]):
+                with self.assertRaises(TrackingNotFound):
+                    tracker.package(num).track()
+            assert ups.stats['not_found'] == 1
+            assert usps.stats['not_found'] == 1
+
+
+    def test_faults(self):
+        # the USPS account is in the request URL, but not in the errors
+        with FakeUSPS(Profile(throttle_rate=1.0)) as usps:
+            with self.assertRaises(Throttled) as cm:
+                self.tracker(usps).package(USPS_NUMBERS[3]).track()
+            assert usps.stats['throttled'] == 1
+            assert 'FAKE' not in str(cm.exception)
+
+        with FakeUSPS(Profile(error_rate=1.0)) as usps:
+            with self.assertRaises(TransientError) as cm:
+                self.tracker(usps).package(USPS_NUMBERS[3]).track()
+            assert usps.stats['errors'] == 1
+            assert not usps.stats['found']
+            assert 'FAKE' not in str(cm.exception)
+
+        # nothing listening
+        usps = FakeUSPS()
+        tracker = self.tracker(usps)
+        usps.stop()
+        with self.assertRaises(TransientError) as cm:
+            tracker.package(USPS_NUMBERS[3]).track()
+        assert 'FAKE' not in str(cm.exception)
+
+
+    def test_retried(self):
+        # half the requests fail; retries get through
+        profile = Profile(error_rate=0.5, seed=3)
+        policy = RetryPolicy(max_attempts=10, base_delay=0, max_delay=0)
+        with FakeUSPS(profile) as usps:
+            tracker = self.tracker(usps, retry_policy=policy,
+                                   breaker_options={'error_rate': 1.1})
+            results = tracker.track_many(USPS_NUMBERS, workers=4)
+            assert not [r for r in results.values() if isinstance(r, Exception)]
+            assert usps.stats['errors'] > 0
+            assert usps.stats['requests'] == usps.stats['errors'] + 20
+
+
+    def test_summary(self):
+        profile = Profile(events=(10, 10))
+        with FakeUPS(profile) as ups:
+            info = self.tracker(ups).package(UPS_NUMBERS[4]).track(detail='summary')
+            assert info.status_code in (Status.DELIVERED, Status.OUT_FOR_DELIVERY)
+            assert not info.events
+
+
+    def test_latency(self):
+        profile = Profile(latency=constant(0.05))
+        with FakeUSPS(profile) as usps:
+            tracker = self.tracker(usps)
+            tracker.package(USPS_NUMBERS[5]).track()
+            seconds = tracker.metrics.histogram('packagetracker_request_seconds',
+                                                carrier='USPS')
+            assert seconds.sum >= 0.05
+
+
+    @unittest.skipIf(suds is None, "needs the fedex library and suds")
+    def test_fedex(self):
+        profile = Profile(events=(5, 5), not_found_rate=0.5)
+        with FakeFedEx(profile) as fedex:
+            tracker = self.tracker(fedex)
+            nums = list(fedex.tracking_numbers(6))
+            results = tracker.track_many(nums)
+
+            for num, result in results.items():
+                if not isinstance(result, Exception):
+                    assert len(result.events) == 5
+                    assert result.delivery_date is not None
+                    # the replies have offsets, the results are local time
+                    dates = [result.delivery_date, result.last_update]
+                    dates += [e.date for e in result.events]
+                    assert all(d.tzinfo is None for d in dates if d is not None)
+                else:
+                    assert isinstance(result, TrackingNotFound)
+            assert fedex.stats['requests'] == len(nums)
+            assert fedex.stats['found'] and fedex.stats['not_found']
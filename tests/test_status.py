@@ -0,0 +1,29 @@
+import unittest
+
+from packagetracker.status                   import Status
+from packagetracker.service.fedex_interface  import fedex_status
+from packagetracker.service.ups_interface    import activity_status
+
+
+class TestStatus(unittest.TestCase):
+
+    def test_terminal(self):
+        assert Status.DELIVERED.is_terminal
+        assert Status.RETURNED.is_terminal
+        assert not Status.IN_TRANSIT.is_terminal
+        assert not Status.UNKNOWN.is_terminal
+
+
+    def test_fedex(self):
+        self.assertEqual(fedex_status('DL'), Status.DELIVERED)
+        self.assertEqual(fedex_status('OD'), Status.OUT_FOR_DELIVERY)
+        self.assertEqual(fedex_status('AR'), Status.IN_TRANSIT)
+        self.assertEqual(fedex_status(None), Status.UNKNOWN)
+
+
+    def test_ups(self):
+        self.assertEqual(activity_status({'Type': 'D', 'Description': 'DELIVERED'}),
+                         Status.DELIVERED)
+        self.assertEqual(activity_status({'Type': 'I', 'Description': 'OUT FOR DELIVERY'}),
+                         Status.OUT_FOR_DELIVERY)
+        self.assertEqual(activity_status({}), Status.UNKNOWN)
@@ -0,0 +1,132 @@
+import datetime
+import unittest
+
+from packagetracker            import PackageTracker
+from packagetracker.cache      import TrackingCache
+from packagetracker.data       import TrackingInfo, SUMMARY
+from packagetracker.status     import Status
+from packagetracker.store      import ShipmentStore
+
+from .test_tracker import FakeInterface
+
+NOW = datetime.datetime(2020, 6, 5, 12, 0)
+TODAY = NOW.date()
+
+
+def make_info(num, status_code, delivery_date=None, last_update=NOW, detail='full'):
+    info = TrackingInfo(num, delivery_date, status_code.name, last_update,
+                        location='ANYTOWN,GA,US', detail=detail, status_code=status_code)
+    if detail != SUMMARY:
+        info.add_event(last_update, 'ANYTOWN,GA,US', 'ARRIVAL SCAN', Status.IN_TRANSIT)
+        info.add_event(last_update - datetime.timedelta(days=1), 'ATLANTA,GA,US',
+                       'ORIGIN SCAN', Status.PICKED_UP)
+    return info
+
+
+class TestShipmentStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ShipmentStore(clock=lambda: 1000.0)
+        self.store.save_many([
+            ('FedEx', make_info('F1', Status.IN_TRANSIT, delivery_date=TODAY)),
+            ('FedEx', make_info('F2', Status.IN_TRANSIT, delivery_date=NOW + datetime.timedelta(days=1))),
+            ('FedEx', make_info('F3', Status.DELIVERED, delivery_date=NOW)),
+            ('UPS', make_info('U1', Status.OUT_FOR_DELIVERY, delivery_date=NOW)),
+            ('UPS', make_info('U2', Status.IN_TRANSIT, last_update=NOW - datetime.timedelta(days=3))),
+        ])
+
+
+    def tearDown(self):
+        self.store.close()
+
+
+    def test_get(self):
+        row = self.store.get('F1')
+        self.assertEqual(row.shipper, 'FedEx')
+        self.assertEqual(row.status_code, Status.IN_TRANSIT)
+        self.assertEqual(row.delivery_date, TODAY)
+        self.assertEqual(row.last_update, NOW)
+        self.assertEqual(row.checked, 1000.0)
+        assert self.store.get('nope') is None
+        assert len(self.store) == 5
+
+
+    def test_events(self):
+        events = self.store.events('F1')
+        self.assertEqual([e.detail for e in events], ['ARRIVAL SCAN', 'ORIGIN SCAN'])
+        self.assertEqual(events[1].status_code, Status.PICKED_UP)
+        self.assertEqual(events[0].date, NOW)
+
+
+    def test_upsert(self):
+        self.store.save('FedEx', make_info('F1', Status.DELIVERED, delivery_date=NOW))
+        assert len(self.store) == 5
+        self.assertEqual(self.store.get('F1').status_code, Status.DELIVERED)
+        assert len(self.store.events('F1')) == 2
+
+        # summaries keep the stored events
+        self.store.save('FedEx', make_info('F2', Status.DELIVERED, detail=SUMMARY))
+        assert len(self.store.events('F2')) == 2
+
+        self.store.delete('F2')
+        assert self.store.get('F2') is None
+        assert self.store.events('F2') == []
+
+
+    def test_find(self):
+        nums = lambda rows: sorted(row.tracking_number for row in rows)
+        self.assertEqual(nums(self.store.find(shipper='FedEx', status=Status.IN_TRANSIT)),
+                         ['F1', 'F2'])
+        self.assertEqual(nums(self.store.find(status=[Status.DELIVERED, Status.OUT_FOR_DELIVERY])),
+                         ['F3', 'U1'])
+        self.assertEqual(nums(self.store.due_on(TODAY)), ['F1', 'U1'])
+        self.assertEqual(nums(self.store.due_on(TODAY, shipper='FedEx')), ['F1'])
+        self.assertEqual(nums(self.store.stale(datetime.timedelta(hours=48), now=NOW)), ['U2'])
+        assert len(self.store.find(limit=2)) == 2
+
+        # U2 has events, but no delivery date
+        assert self.store.get('U2').delivery_date is None
+        self.assertEqual(nums(self.store.find(delivery_before=NOW)), ['F1'])
+
+
+class TestTrackerStore(unittest.TestCase):
+
+    def test_track_many(self):
+        store = ShipmentStore()
+        tracker = PackageTracker(testing=True, store=store)
+        tracker.register_interface('Fake', FakeInterface(tracker.config))
+
+        results = tracker.track_many(['FAKE0', 'FAKE1', 'FAKE2', '14324423523'], workers=2)
+        assert results['FAKE1'].status == 'IN TRANSIT'
+        assert len(store) == 2
+        self.assertEqual(store.get('FAKE1').shipper, 'Fake')
+        assert len(store.events('FAKE2')) == 1
+
+        tracker.package('FAKE3').track()
+        assert store.get('FAKE3') is not None
+
+
+    def test_cache_hits_not_saved(self):
+        saved = []
+
+        class Store(ShipmentStore):
+            def save_many(self, results):
+                results = list(results)
+                saved.extend(info.tracking_number for _, info in results)
+                super().save_many(results)
+
+        now = [0.0]
+        cache = TrackingCache(soft_ttl=10, hard_ttl=100, clock=lambda: now[0])
+        tracker = PackageTracker(testing=True, cache=cache, store=Store())
+        tracker.register_interface('Fake', FakeInterface(tracker.config))
+
+        tracker.package('FAKE1').track()
+        tracker.package('FAKE1').track()
+        tracker.track_many(['FAKE1', 'FAKE2'])
+        self.assertEqual(saved, ['FAKE1', 'FAKE2'])
+
+        # stale, refreshed and saved in the background
+        now[0] += 50
+        tracker.package('FAKE1').track()
+        cache.close()
+        self.assertEqual(saved, ['FAKE1', 'FAKE2', 'FAKE1'])
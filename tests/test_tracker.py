@@ -0,0 +1,60 @@
+import datetime
+import unittest
+
+from packagetracker            import PackageTracker, UnsupportedShipper
+from packagetracker.data       import TrackingInfo, FULL, SUMMARY
+from packagetracker.exceptions import TrackingNotFound
+from packagetracker.service    import BaseInterface
+
+
+class FakeInterface(BaseInterface):
+    """Tracks FAKE numbers; FAKE0 is never found, FAKE9 has a bad reply."""
+
+    def identify(self, num):
+        return num.startswith('FAKE')
+
+    def track(self, num, detail=FULL):
+        if num == 'FAKE0':
+            raise TrackingNotFound(num)
+        if num == 'FAKE9':
+            raise KeyError('TrackResponse')
+
+        info = TrackingInfo(num, None, 'IN TRANSIT', datetime.datetime.now(), detail=detail)
+        if detail == FULL:
+            info.add_event(datetime.datetime.now(), 'ANYTOWN,GA,US', 'ARRIVAL SCAN')
+        return info
+
+
+class TestTrackMany(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = PackageTracker(testing=True)
+        self.tracker.register_interface('Fake', FakeInterface(self.tracker.config))
+
+
+    def test_track_many(self):
+        numbers = ['FAKE0', 'FAKE1', 'FAKE2', '14324423523']
+        for workers in (1, 4):
+            results = self.tracker.track_many(numbers, workers=workers)
+            assert list(results.keys()) == numbers
+            assert isinstance(results['FAKE0'], TrackingNotFound)
+            assert isinstance(results['14324423523'], UnsupportedShipper)
+            assert results['FAKE1'].status == 'IN TRANSIT'
+            assert len(results['FAKE2'].events) == 1
+
+
+    def test_unexpected_error(self):
+        # a bug parsing one reply doesn't stop the others
+        numbers = ['FAKE1', 'FAKE9', 'FAKE2']
+        for workers in (1, 4):
+            with self.assertLogs('packagetracker', level='ERROR'):
+                results = self.tracker.track_many(numbers, workers=workers)
+            assert isinstance(results['FAKE9'], KeyError)
+            assert results['FAKE1'].status == 'IN TRANSIT'
+            assert results['FAKE2'].status == 'IN TRANSIT'
+
+
+    def test_summary(self):
+        results = self.tracker.track_many(['FAKE1'], detail=SUMMARY)
+        assert results['FAKE1'].detail == SUMMARY
+        assert results['FAKE1'].events == []
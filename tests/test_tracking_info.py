@@ -1,7 +1,9 @@
 import datetime
+import pickle
 import unittest
 
-from packagetracker.data import TrackingInfo, DATE_FORMAT
+from packagetracker.data   import TrackingInfo, TrackingEvent, DATE_FORMAT
+from packagetracker.status import Status
 
 
 class TestTrackingInfo(unittest.TestCase):
@@ -17,4 +19,55 @@ class TestTrackingInfo(unittest.TestCase):
         assert now.strftime(DATE_FORMAT) in s
         assert str(today) in s
         assert 'IN TRANSIT' in s
+        assert not info.is_terminal
 
+
+    def test_repr_delivered(self):
+        # FedEx says 'Delivered', which is fine
+        info = TrackingInfo(tracking_number='122816215025810',
+                            delivery_date=datetime.datetime.now(),
+                            status='Delivered',
+                            last_update=datetime.datetime.now(),
+                            delivery_detail='Front door',
+                            status_code=Status.DELIVERED)
+        assert 'Front door' in repr(info)
+        assert info.is_terminal
+
+
+
+    def test_raw_delivery_date(self):
+        info = TrackingInfo('1Z9999999999999999', None, 'IN TRANSIT', None)
+        assert info.raw_delivery_date is None
+        info.delivery_date = datetime.date(2020, 6, 8)
+        self.assertEqual(info.raw_delivery_date, datetime.date(2020, 6, 8))
+
+
+    def test_lazy_events(self):
+        built = []
+
+        def build(record):
+            built.append(record)
+            return TrackingEvent(datetime.datetime(2020, 1, record), 'ANYTOWN,GA,US', 'SCAN')
+
+        info = TrackingInfo('1Z9999999999999999', None, 'IN TRANSIT', None)
+        info.set_event_source([3, 1, 2], build)
+        assert built == []
+
+        assert info.last_event.date == datetime.datetime(2020, 1, 3)
+        assert built == [3, 1, 2]
+
+        # built only once
+        assert len(info.events) == 3
+        assert built == [3, 1, 2]
+
+        info.add_event(datetime.datetime(2020, 1, 4), None, 'DELIVERED')
+        assert info.last_event.detail == 'DELIVERED'
+
+
+    def test_pickle_lazy_events(self):
+        info = TrackingInfo('1Z9999999999999999', None, 'IN TRANSIT', None)
+        info.set_event_source([1], lambda r: TrackingEvent(datetime.datetime(2020, 1, r), None, 'X'))
+
+        copy = pickle.loads(pickle.dumps(info))
+        assert len(copy.events) == 1
+        assert copy.events[0].detail == 'X'
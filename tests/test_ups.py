@@ -3,7 +3,8 @@ import unittest
 
 from packagetracker            import PackageTracker
 from packagetracker.exceptions import TrackFailed, InvalidTrackingNumber
-from packagetracker.data       import TrackingEvent
+from packagetracker.data       import TrackingEvent, SUMMARY
+from packagetracker.status     import Status
 
 # number, description
 # taken from the August 2020, UPS Tracking Tracking Web Service Developer Guide, pg. 13
@@ -19,6 +20,39 @@ TEST_NUMBERS = {
 FAIL_NUMBER = '1Z12345E1505270452'  # No Tracking Information Available
 BOGUS_NUM = '1Z12345E020527079'
 
+# a trimmed-down response, for parsing tests
+RESPONSE = {
+    'TrackResponse': {
+        'Response': {'ResponseStatus': {'Code': '1', 'Description': 'Success'}},
+        'Shipment': {
+            'Service': {'Code': '002', 'Description': '2ND DAY AIR'},
+            'Package': {
+                'Activity': [
+                    {
+                        'ActivityLocation': {
+                            'Address': {'City': 'ANYTOWN', 'StateProvinceCode': 'GA',
+                                        'CountryCode': 'US'},
+                            'Description': 'BACK DOOR',
+                        },
+                        'Status': {'Type': 'D', 'Description': 'DELIVERED', 'Code': 'D'},
+                        'Date': '20100608',
+                        'Time': '123000',
+                    },
+                    {
+                        'ActivityLocation': {
+                            'Address': {'City': 'ATLANTA', 'StateProvinceCode': 'GA',
+                                        'CountryCode': 'US'},
+                        },
+                        'Status': {'Type': 'I', 'Description': 'ARRIVAL SCAN', 'Code': 'AR'},
+                        'Date': '20100607',
+                        'Time': '051500',
+                    },
+                ],
+            },
+        },
+    },
+}
+
 
 class TestUPS(unittest.TestCase):
 
@@ -119,3 +153,35 @@ class TestUPS(unittest.TestCase):
         """In which we test a bogus tracking number."""
         with self.assertRaises(InvalidTrackingNumber):
             self.interface.track(BOGUS_NUM)
+
+
+    def test_parse_response(self):
+        info = self.interface._parse_response(RESPONSE, '1Z12345E0205271688')
+        self.assertEqual(info.status, 'DELIVERED')
+        self.assertEqual(info.service, 'UPS 2ND DAY AIR')
+        self.assertEqual(info.location, 'ANYTOWN,GA,US')
+        self.assertEqual(info.delivery_detail, 'BACK DOOR')
+        self.assertEqual(info.last_update, datetime.datetime(2010, 6, 8, 12, 30))
+        self.assertEqual(len(info.events), 2)
+        self.assertEqual(info.events[1].location, 'ATLANTA,GA,US')
+        self.assertEqual(info.events[1].date, datetime.datetime(2010, 6, 7, 5, 15))
+        self.assertEqual(info.status_code, Status.DELIVERED)
+        self.assertEqual(info.events[1].status_code, Status.IN_TRANSIT)
+
+
+    def test_parse_shares_strings(self):
+        one = self.interface._parse_response(RESPONSE, '1Z12345E0205271688')
+        two = self.interface._parse_response(RESPONSE, '1Z12345E0205271688')
+        self.assertIs(one.location, two.location)
+        self.assertIs(one.events[1].location, two.events[1].location)
+
+
+    def test_parse_summary(self):
+        info = self.interface._parse_response(RESPONSE, '1Z12345E0205271688', SUMMARY)
+        self.assertEqual(info.status, 'DELIVERED')
+        self.assertEqual(info.delivery_date, datetime.datetime(2010, 6, 8, 12, 30))
+        self.assertEqual(info.detail, SUMMARY)
+        self.assertEqual(info.events, [])
+
+        request = self.interface._build_track_request('1Z12345E0205271688', SUMMARY)
+        self.assertEqual(request['Request']['RequestOption'], '0')
@@ -4,6 +4,7 @@ import unittest
 
 from packagetracker            import PackageTracker
 from packagetracker.exceptions import TrackFailed, InvalidTrackingNumber
+from packagetracker.status     import Status
 
 TEST_NUMBERS = {
     '9400100000000000000000':               'USPS Tracking',
@@ -16,6 +17,20 @@ REAL_PACKAGES = [
     'LM181476342CA',
 ]
 
+# a trimmed-down response, for parsing tests
+RESPONSE = '''<?xml version="1.0" encoding="UTF-8"?>
+<TrackResponse><TrackInfo ID="9400100000000000000000">
+<TrackSummary><EventTime>9:10 am</EventTime><EventDate>June 8, 2020</EventDate>
+<Event>DELIVERED</Event><EventCity>ANYTOWN</EventCity><EventState>GA</EventState>
+<EventZIPCode>30301</EventZIPCode><EventCountry></EventCountry></TrackSummary>
+<TrackDetail><EventTime>5:15 pm</EventTime><EventDate>June 7, 2020</EventDate>
+<Event>Arrived at Post Office</Event><EventCity>ATLANTA</EventCity><EventState>GA</EventState>
+<EventZIPCode>30303</EventZIPCode><EventCountry></EventCountry></TrackDetail>
+<TrackDetail><EventTime></EventTime><EventDate>June 5, 2020</EventDate>
+<Event>Shipping Label Created</Event><EventCity>ATLANTA</EventCity><EventState>GA</EventState>
+<EventZIPCode>30303</EventZIPCode><EventCountry></EventCountry></TrackDetail>
+</TrackInfo></TrackResponse>'''
+
 class TestUSPS(unittest.TestCase):
 
     def setUp(self):
@@ -54,6 +69,23 @@ class TestUSPS(unittest.TestCase):
             self.interface.track(BOGUS_NUM)
 
 
+    def test_parse_response(self):
+        info = self.interface._parse_response(RESPONSE, '9400100000000000000000')
+        self.assertEqual(info.status, 'DELIVERED')
+        self.assertEqual(info.location, 'ANYTOWN,GA,US')
+        self.assertEqual(info.last_update, datetime.datetime(2020, 6, 8, 9, 10))
+
+        # the delivery is added to the events
+        self.assertEqual([e.detail for e in info.events],
+                         ['DELIVERED', 'Arrived at Post Office', 'Shipping Label Created'])
+        self.assertEqual(info.events[1].date, datetime.datetime(2020, 6, 7, 17, 15))
+        self.assertEqual(info.events[2].date, datetime.date(2020, 6, 5))
+
+        self.assertEqual(info.status_code, Status.DELIVERED)
+        self.assertEqual([e.status_code for e in info.events],
+                         [Status.DELIVERED, Status.IN_TRANSIT, Status.PRE_TRANSIT])
+
+
     @pytest.mark.skip(reason="no valid numbers")
     def test_track_delivered(self):
         """
@@ -0,0 +1,210 @@
+import datetime
+import sys
+import threading
+import unittest
+
+from packagetracker            import PackageTracker
+from packagetracker.data       import TrackingInfo, FULL
+from packagetracker.exceptions import TrackFailed
+from packagetracker.service    import BaseInterface
+from packagetracker.status     import Status
+from packagetracker.watcher    import Watcher
+
+
+class ScriptedInterface(BaseInterface):
+    """Returns whatever state the test sets for each WATCH number."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.states = {}
+        self.calls = 0
+
+    def identify(self, num):
+        return num.startswith('WATCH')
+
+    def track(self, num, detail=FULL):
+        self.calls += 1
+        status, events = self.states.get(num, (Status.PRE_TRANSIT, ()))
+        if status is None:
+            raise TrackFailed('carrier is down')
+
+        info = TrackingInfo(num, None, status.name, datetime.datetime(2020, 6, 5),
+                            status_code=status)
+        for detail in events:
+            info.add_event(datetime.datetime(2020, 6, 5), 'ANYTOWN,GA,US', detail)
+        return info
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = PackageTracker(testing=True)
+        self.iface = ScriptedInterface(self.tracker.config)
+        self.tracker.register_interface('Fake', self.iface)
+        self.clock = FakeClock()
+        self.watcher = Watcher(self.tracker, interval=60, workers=1, clock=self.clock)
+        self.changes = []
+
+
+    def callback(self, num, old, new):
+        self.changes.append((num, old.status if old is not None else None, new.status))
+
+
+    def poll(self):
+        # move past everything's next check, and poll
+        self.clock.now += 61
+        return self.watcher.poll()
+
+
+    def test_changes(self):
+        self.watcher.watch('watch 1', self.callback)
+        assert 'WATCH1' in self.watcher
+        self.poll()
+        self.assertEqual(self.changes, [('WATCH1', None, 'PRE_TRANSIT')])
+
+        # nothing changed
+        self.poll()
+        assert len(self.changes) == 1
+
+        # a new event is a change
+        self.iface.states['WATCH1'] = (Status.PRE_TRANSIT, ('LABEL CREATED',))
+        self.poll()
+        assert len(self.changes) == 2
+
+        # failures are skipped
+        self.iface.states['WATCH1'] = (None, ())
+        self.poll()
+        assert len(self.changes) == 2
+
+        self.iface.states['WATCH1'] = (Status.IN_TRANSIT, ('LABEL CREATED',))
+        self.poll()
+        self.assertEqual(self.changes[-1], ('WATCH1', 'PRE_TRANSIT', 'IN_TRANSIT'))
+
+        # delivery is the last callback
+        self.iface.states['WATCH1'] = (Status.DELIVERED, ('LABEL CREATED', 'DELIVERED'))
+        self.poll()
+        self.assertEqual(self.changes[-1], ('WATCH1', 'IN_TRANSIT', 'DELIVERED'))
+        assert 'WATCH1' not in self.watcher
+        assert len(self.watcher) == 0
+
+
+    def test_interval(self):
+        self.watcher.watch('WATCH1', self.callback)
+        self.poll()
+        calls = self.iface.calls
+
+        # not due yet
+        self.clock.now += 30
+        self.watcher.poll()
+        assert self.iface.calls == calls
+        self.watcher.check_now('WATCH1')
+        self.watcher.poll()
+        assert self.iface.calls == calls + 1
+
+
+    def test_unwatch(self):
+        other = []
+        self.watcher.watch('WATCH1', self.callback)
+        self.watcher.watch('WATCH1', lambda *args: other.append(args))
+        self.watcher.watch('WATCH2', self.callback)
+
+        self.watcher.unwatch('WATCH1', self.callback)
+        self.watcher.unwatch('WATCH2')
+        assert len(self.watcher) == 1
+
+        self.poll()
+        assert self.changes == []
+        assert len(other) == 1
+
+
+    def test_bad_callback(self):
+        def broken(*args):
+            raise ValueError('oops')
+
+        self.watcher.watch('WATCH1', broken)
+        self.watcher.watch('WATCH1', self.callback)
+        with self.assertLogs(level='ERROR'):
+            self.poll()
+        assert len(self.changes) == 1
+
+
+    def test_concurrent_changes(self):
+        # the same change from several threads at once, i.e. a push and a
+        # poll, is one callback
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for i in range(50):
+                num = 'WATCH%d' % i
+                self.watcher.watch(num, self.callback)
+                info = self.iface.track(num)
+                barrier = threading.Barrier(8)
+
+                def push():
+                    barrier.wait()
+                    self.watcher.push(info)
+
+                threads = [threading.Thread(target=push) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        assert len(self.changes) == 50
+
+
+    def test_next_due_subscribed(self):
+        self.watcher.watch('WATCH1', self.callback)
+        self.watcher.watch('WATCH2', self.callback)
+        self.watcher.subscribe('WATCH1')
+        self.clock.now += 61
+
+        # WATCH1 is overdue, but it's not polled
+        assert self.watcher.next_due() == 0.0
+        self.watcher.poll()
+        assert self.watcher.next_due() > 0
+
+        self.watcher.unwatch('WATCH2')
+        assert self.watcher.next_due() is None
+
+
+    def test_run_subscribed(self):
+        # with only subscribed watches, run() waits out the interval
+        # rather than spinning
+        watcher = Watcher(self.tracker, interval=0.2, workers=1)
+        watcher.watch('WATCH1', self.callback)
+        watcher.subscribe('WATCH1')
+        watcher._watches['WATCH1'].next_check = 0
+
+        polls = []
+        poll = watcher.poll
+        watcher.poll = lambda: polls.append(poll())
+        watcher.start()
+        try:
+            threading.Event().wait(0.3)
+        finally:
+            watcher.stop(5)
+        assert 1 <= len(polls) <= 3
+        assert not self.iface.calls
+
+
+    def test_background(self):
+        delivered = threading.Event()
+        self.iface.states['WATCH1'] = (Status.DELIVERED, ())
+        self.tracker.watcher = Watcher(self.tracker, interval=0.01, workers=1)
+        self.tracker.watch('WATCH1', lambda num, old, new: delivered.set())
+        try:
+            assert delivered.wait(5)
+        finally:
+            self.tracker.watcher.stop(5)
+        assert not self.tracker.watcher.running
@@ -0,0 +1,176 @@
+import datetime
+import os
+import tempfile
+import threading
+import unittest
+
+from packagetracker            import PackageTracker
+from packagetracker.data       import TrackingInfo, FULL
+from packagetracker.status     import Status
+from packagetracker.workqueue  import WorkQueue
+
+from .test_tracker import FakeInterface
+
+
+class DeliveringInterface(FakeInterface):
+    """FAKE numbers ending in 9 are delivered."""
+
+    def track(self, num, detail=FULL):
+        if num.endswith('9'):
+            return TrackingInfo(num, None, 'DELIVERED', datetime.datetime.now(),
+                                status_code=Status.DELIVERED)
+        return super().track(num, detail)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'queue.db')
+        self.clock = FakeClock()
+        self.a = WorkQueue(self.path, node='a', lease_time=60, clock=self.clock)
+        self.b = WorkQueue(self.path, node='b', lease_time=60, clock=self.clock)
+
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+        self.dir.cleanup()
+
+
+    def test_journal_mode(self):
+        # the rollback journal by default, it's safe on network filesystems
+        mode, = self.a._conn.execute('PRAGMA journal_mode').fetchone()
+        self.assertEqual(mode, 'delete')
+
+        path = os.path.join(self.dir.name, 'local.db')
+        queue = WorkQueue(path, journal_mode='wal')
+        mode, = queue._conn.execute('PRAGMA journal_mode').fetchone()
+        self.assertEqual(mode, 'wal')
+        queue.close()
+
+        with self.assertRaises(ValueError):
+            WorkQueue(path, journal_mode='memory')
+
+
+    def test_claim(self):
+        self.a.add(['N1', 'N2', 'N3'])
+        self.a.add(['N4'], due=self.clock.now + 100)
+        self.a.add(['N1'], due=self.clock.now + 100)
+        assert len(self.a) == 4
+
+        leases = self.a.claim(limit=2)
+        self.assertEqual([l.tracking_number for l in leases], ['N1', 'N2'])
+
+        # the other node only gets what's left
+        self.assertEqual([l.tracking_number for l in self.b.claim()], ['N3'])
+        assert self.a.claim() == []
+        self.assertEqual(self.a.stats(), {'queued': 4, 'due': 0, 'leased': 3, 'expired': 0})
+
+
+    def test_complete(self):
+        self.a.add(['N1', 'N2', 'N3'])
+        l1, l2, l3 = self.a.claim()
+
+        assert self.a.complete(l1, next_due=self.clock.now + 10)
+        assert self.a.complete(l2)
+        assert self.a.release(l3, delay=5)
+        assert len(self.a) == 2
+
+        self.clock.now += 5
+        self.assertEqual([l.tracking_number for l in self.b.claim()], ['N3'])
+        self.clock.now += 5
+        self.assertEqual([l.tracking_number for l in self.b.claim()], ['N1'])
+
+
+    def test_expired(self):
+        self.a.add(['N1'])
+        lease, = self.a.claim()
+
+        # a's lease runs out, b takes over
+        self.clock.now += 30
+        lease = self.a.extend(lease)
+        self.clock.now += 61
+        self.assertEqual(self.a.stats()['expired'], 1)
+        assert self.b.requeue_expired() == 1
+        stolen, = self.b.claim()
+        assert stolen.tracking_number == 'N1'
+
+        # and a's late result doesn't count
+        assert not self.a.complete(lease, next_due=self.clock.now + 1000)
+        assert self.a.extend(lease) is None
+        assert self.b.complete(stolen, next_due=self.clock.now + 10)
+
+
+    def test_concurrent(self):
+        # nodes claiming at once never get the same number
+        numbers = ['N%d' % i for i in range(500)]
+        self.a.add(numbers)
+        claimed = []
+
+        def node(name):
+            queue = WorkQueue(self.path, node=name, clock=self.clock)
+            while True:
+                leases = queue.claim(limit=7)
+                if not leases:
+                    break
+                claimed.extend(l.tracking_number for l in leases)
+            queue.close()
+
+        threads = [threading.Thread(target=node, args=(str(i),)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(claimed), sorted(numbers))
+
+
+    def test_work(self):
+        tracker = PackageTracker(testing=True)
+        tracker.register_interface('Fake', DeliveringInterface(tracker.config))
+        self.a.add(['FAKE0', 'FAKE1', 'FAKE9', 'BOGUS'])
+
+        assert self.a.work(tracker, interval=100, workers=1) == 2
+        # delivered and untrackable numbers are gone, FAKE0 isn't found yet
+        assert len(self.a) == 2
+        assert self.a.claim() == []
+        self.clock.now += 100
+        self.assertEqual(sorted(l.tracking_number for l in self.a.claim()), ['FAKE0', 'FAKE1'])
+
+
+    def test_run(self):
+        tracker = PackageTracker(testing=True)
+        tracker.register_interface('Fake', DeliveringInterface(tracker.config))
+        self.a.add(['FAKE1'])
+        waits = []
+
+        class Stop(threading.Event):
+            def wait(self, timeout=None):
+                waits.append(timeout)
+                self.set()
+                return True
+
+        # straight on after tracking FAKE1, then nothing's due, so it waits
+        self.a.run(tracker, poll_interval=5, stop=Stop(), interval=100, workers=1)
+        assert waits == [5]
+
+
+    def test_work_unexpected_error(self):
+        # a bad reply releases that lease for a retry, the rest are tracked
+        tracker = PackageTracker(testing=True)
+        tracker.register_interface('Fake', FakeInterface(tracker.config))
+        self.a.add(['FAKE1', 'FAKE9'])
+
+        with self.assertLogs('packagetracker', level='ERROR'):
+            assert self.a.work(tracker, interval=100, retry_delay=10, workers=1) == 1
+        self.clock.now += 10
+        self.assertEqual([l.tracking_number for l in self.a.claim()], ['FAKE9'])